@@ -2,8 +2,26 @@
 GoBuddy AI Agents
 Multi-agent travel assistance system
 """
-from .trip_planner import trip_planner_team
-from .support_bot import support_agent
-from .recommender import recommender_agent
+import os
+import importlib
+
+# agno reports every run to its analytics API by default, building a new TLS
+# client on the event loop each time (~50 ms of blocking). Opt in explicitly.
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+# Re-exported lazily so importing a light submodule (e.g. agents.admission)
+# does not pull in every agent module.
+_EXPORTS = {
+    "trip_planner_team": "agents.trip_planner",
+    "support_agent": "agents.support_bot",
+    "recommender_agent": "agents.recommender",
+}
 
 __all__ = ["trip_planner_team", "support_agent", "recommender_agent"]
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module), name)
@@ -0,0 +1,186 @@
+"""
+Per-model admission control for LLM calls.
+Caps concurrent agent runs per model with a bounded wait queue, so traffic
+spikes are shed with a fast 503 instead of turning into upstream 429s.
+"""
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+logger = logging.getLogger("gobuddy.admission")
+
+
+class AdmissionRejected(Exception):
+    """The model's wait queue is full (or the wait timed out); retry after `retry_after` seconds."""
+
+    def __init__(self, model: str, retry_after: int):
+        super().__init__(f"{model} is at capacity; retry after {retry_after}s")
+        self.model = model
+        self.retry_after = retry_after
+
+
+class ModelGate:
+    """
+    Concurrency gate for one model.
+
+    Up to `max_concurrent` runs proceed; up to `max_queue` more wait in FIFO
+    order for at most `max_wait_seconds`. Anything beyond is rejected at once.
+    Waiters are plain futures created on the running loop, so one gate can be
+    shared safely for the life of the process.
+    """
+
+    def __init__(self, model: str, max_concurrent: int, max_queue: int, max_wait_seconds: float):
+        self.model = model
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._hold_ewma = 5.0  # seconds; seeds the Retry-After estimate
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _retry_after(self) -> int:
+        """Rough time until a queue slot frees: average hold time per position in line."""
+        return max(1, math.ceil(self._hold_ewma * (len(self._waiters) + 1) / self.max_concurrent))
+
+    def _reject(self) -> AdmissionRejected:
+        self.rejected += 1
+        return AdmissionRejected(self.model, self._retry_after())
+
+    async def acquire(self) -> None:
+        started = time.monotonic()
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+        else:
+            if len(self._waiters) >= self.max_queue:
+                raise self._reject()
+
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, timeout=self.max_wait_seconds)
+            except asyncio.TimeoutError:
+                self._discard(waiter)
+                self.timed_out += 1
+                raise self._reject()
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was handed to us just as we were cancelled
+                    self.release()
+                else:
+                    self._discard(waiter)
+                raise
+
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self) -> None:
+        # Hand the slot straight to the next live waiter, if any
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def record_hold(self, seconds: float) -> None:
+        self._hold_ewma = 0.8 * self._hold_ewma + 0.2 * seconds
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "waiting": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(self._wait_total / self.admitted * 1000, 1) if self.admitted else 0.0,
+            "max_wait_ms": round(self._wait_max * 1000, 1),
+            "avg_hold_s": round(self._hold_ewma, 2),
+        }
+
+
+def _parse_overrides(value: str) -> dict[str, int]:
+    """Parse "gpt-4o=8,gpt-4o-mini=32" into {model: int}."""
+    overrides = {}
+    for item in value.split(","):
+        if "=" in item:
+            model, _, limit = item.partition("=")
+            overrides[model.strip()] = int(limit)
+    return overrides
+
+
+class AdmissionController:
+    """Holds one ModelGate per model id, created on first use."""
+
+    def __init__(
+        self,
+        default_concurrency: int = 8,
+        default_queue: int = 32,
+        max_wait_seconds: float = 30,
+        concurrency_overrides: Optional[dict[str, int]] = None,
+        queue_overrides: Optional[dict[str, int]] = None,
+    ):
+        self.default_concurrency = default_concurrency
+        self.default_queue = default_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.concurrency_overrides = concurrency_overrides or {}
+        self.queue_overrides = queue_overrides or {}
+        self._gates: dict[str, ModelGate] = {}
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            default_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+            default_queue=int(os.getenv("LLM_MAX_QUEUE", "32")),
+            max_wait_seconds=float(os.getenv("LLM_MAX_WAIT_SECONDS", "30")),
+            concurrency_overrides=_parse_overrides(os.getenv("LLM_MODEL_CONCURRENCY", "")),
+            queue_overrides=_parse_overrides(os.getenv("LLM_MODEL_QUEUE", "")),
+        )
+
+    def gate_for(self, model: str) -> ModelGate:
+        gate = self._gates.get(model)
+        if gate is None:
+            gate = self._gates[model] = ModelGate(
+                model,
+                max_concurrent=self.concurrency_overrides.get(model, self.default_concurrency),
+                max_queue=self.queue_overrides.get(model, self.default_queue),
+                max_wait_seconds=self.max_wait_seconds,
+            )
+        return gate
+
+    @asynccontextmanager
+    async def admit(self, model: str) -> AsyncIterator[None]:
+        """Hold a slot for `model` for the duration of the block."""
+        gate = self.gate_for(model)
+        await gate.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            gate.record_hold(time.monotonic() - started)
+            gate.release()
+
+    def stats(self) -> dict:
+        return {model: gate.stats() for model, gate in self._gates.items()}
+
+
+admission = AdmissionController.from_env()
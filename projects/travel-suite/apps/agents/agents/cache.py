@@ -0,0 +1,122 @@
+"""
+In-process result cache for expensive agent runs.
+"""
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class SingleFlightCache:
+    """
+    LRU cache with per-entry TTL and single-flight computation.
+
+    Concurrent `get_or_compute` calls for the same key share one in-flight
+    computation instead of each starting their own. The computation runs as
+    its own task, so a caller that disconnects does not cancel it for the
+    others. Failed computations are never cached.
+    """
+
+    def __init__(self, max_entries: int = 500, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a fresh cached value without computing (counts as hit or miss)."""
+        value = self._lookup(key)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Return the cached value for `key`, computing it at most once at a time.
+
+        Args:
+            key: Normalized cache key
+            compute: Coroutine factory producing the value on a miss
+            cacheable: Optional predicate; results it rejects are returned but not stored
+        """
+        value = self._lookup(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t, cacheable))
+        return await asyncio.shield(task)
+
+    def _on_done(
+        self,
+        key: Hashable,
+        task: asyncio.Future,
+        cacheable: Optional[Callable[[Any], bool]],
+    ) -> None:
+        self._inflight.pop(key, None)
+        # Always retrieve the exception so an unawaited failure is not logged as lost
+        if task.cancelled() or task.exception() is not None:
+            return
+        result = task.result()
+        if cacheable is None or cacheable(result):
+            self.set(key, result)
+
+    def _lookup(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def evict(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every cached entry whose key matches; returns how many were dropped."""
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            # Coalesced callers also avoided a run, so they count toward the hit rate
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+        }
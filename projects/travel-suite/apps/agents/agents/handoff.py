@@ -0,0 +1,144 @@
+"""
+Token-budgeted context handoff between team members.
+A downstream agent gets an extract of its inputs rather than the full upstream
+transcripts: the lines most relevant to its job and the user's request, kept
+in their original order and capped at a token budget.
+"""
+import os
+import re
+import math
+from dataclasses import dataclass, field
+from typing import Optional
+
+HANDOFF_TOKEN_BUDGET = int(os.getenv("HANDOFF_TOKEN_BUDGET", "1500"))
+
+_WORD = re.compile(r"[$€£¥]?[a-z0-9]+")
+_HEADING = re.compile(r"^\s*(#{1,6}\s|\*\*[^*]+\*\*:?\s*$|[A-Z][^.!?]{0,60}:\s*$)")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9*\"'(])")
+# Lines longer than this are split into sentences so one paragraph cannot eat the budget
+_MAX_UNIT_CHARS = 400
+
+_STOPWORDS = frozenset(
+    "plan trip days please provide detailed itinerary with activities timings cost "
+    "estimates local tips travel style total budget interests that this from into "
+    "your about have will".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for OpenAI tokenizers)."""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+@dataclass
+class _Unit:
+    position: int
+    text: str
+    tokens: int
+    heading: Optional[int]  # position of the heading this unit sits under
+    is_heading: bool = False
+    score: float = 0.0
+
+
+@dataclass
+class HandoffStats:
+    """Upstream tokens before and after the handoff, for one consumer."""
+
+    original_tokens: int = 0
+    passed_tokens: int = 0
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.passed_tokens
+
+
+def _units(text: str) -> list[_Unit]:
+    """Split a transcript into headings, lines and (for long lines) sentences."""
+    units: list[_Unit] = []
+    heading = None
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if _HEADING.match(line):
+            heading = len(units)
+            units.append(_Unit(heading, line, estimate_tokens(line) + 1, None, is_heading=True))
+            continue
+        pieces = _SENTENCE_END.split(line) if len(line) > _MAX_UNIT_CHARS else [line]
+        for piece in pieces:
+            units.append(_Unit(len(units), piece, estimate_tokens(piece) + 1, heading))
+    return units
+
+
+def _terms(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+
+def extract(text: str, token_budget: int, focus: tuple[str, ...] = (), query: str = "") -> str:
+    """
+    Extractive compression of `text` to roughly `token_budget` tokens.
+
+    Lines are scored by hits on the consumer's `focus` keyword prefixes (double
+    weight) and on the words of the user's `query`, normalized by length. The
+    best lines are kept, together with the headings they sit under, and
+    returned in their original order. Text already within budget is returned as is.
+    """
+    if estimate_tokens(text) <= token_budget:
+        return text
+
+    query_terms = {w for w in _terms(query) if len(w) >= 4 and w not in _STOPWORDS}
+    units = _units(text)
+    body = [unit for unit in units if not unit.is_heading]
+    for unit in body:
+        words = _terms(unit.text)
+        focus_hits = sum(1 for w in words if focus and w.startswith(focus))
+        query_hits = sum(1 for w in words if w in query_terms)
+        unit.score = (2 * focus_hits + query_hits) / math.sqrt(unit.tokens)
+
+    kept: set[int] = set()
+    used = 0
+    # Highest density first; earlier lines win ties since research leads with the essentials
+    for unit in sorted(body, key=lambda u: (-u.score, u.position)):
+        cost = unit.tokens
+        if unit.heading is not None and unit.heading not in kept:
+            cost += units[unit.heading].tokens
+        if used + cost > token_budget:
+            continue
+        kept.add(unit.position)
+        if unit.heading is not None:
+            kept.add(unit.heading)
+        used += cost
+
+    return "\n".join(units[i].text for i in sorted(kept))
+
+
+@dataclass
+class ContextHandoff:
+    """
+    Decides what each team member sees of its upstream agents' output.
+
+    `focus` maps a consumer's agent name to keyword prefixes describing what it
+    needs (e.g. costs for a budgeter); consumers without an entry are ranked on
+    the user's request alone. The budget is shared fairly between upstreams:
+    short outputs pass whole and leave their unused share to longer ones.
+    """
+
+    token_budget: int = HANDOFF_TOKEN_BUDGET
+    focus: dict[str, tuple[str, ...]] = field(default_factory=dict)
+
+    def select(self, consumer: str, prompt: str, upstream: dict[str, str]) -> tuple[dict[str, str], HandoffStats]:
+        stats = HandoffStats()
+        sizes = {name: estimate_tokens(content) for name, content in upstream.items()}
+        stats.original_tokens = sum(sizes.values())
+
+        selected = {}
+        remaining = self.token_budget
+        ordered = sorted(upstream, key=sizes.__getitem__)
+        for index, name in enumerate(ordered):
+            share = remaining // (len(ordered) - index)
+            selected[name] = extract(upstream[name], share, self.focus.get(consumer, ()), prompt)
+            passed = estimate_tokens(selected[name])
+            stats.passed_tokens += passed
+            remaining -= passed
+
+        # Keep the caller's upstream order
+        return {name: selected[name] for name in upstream}, stats
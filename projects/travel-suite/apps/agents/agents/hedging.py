@@ -0,0 +1,108 @@
+"""
+Hedged agent runs.
+When an agent's primary model is slow to answer, a second request goes to a
+faster backup model and whichever answers first is used; the other run is
+cancelled. Policies are per agent and only trade extra tokens for tail
+latency on the runs that are already slow.
+"""
+import os
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from agents.lazy import LazyAgent
+
+logger = logging.getLogger("gobuddy.hedging")
+
+PRIMARY, BACKUP = "primary", "backup"
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    """
+    When to fire a backup request for an agent, and to which model.
+
+    Streamed runs hedge when the primary has not produced its first token
+    within `first_token_seconds`. Plain runs only show progress when they
+    finish, so they hedge after `response_seconds`; None leaves them alone.
+    """
+
+    backup_model: str
+    first_token_seconds: float
+    response_seconds: Optional[float] = None
+
+
+def _parse_policies(value: str) -> dict[str, HedgePolicy]:
+    """
+    Parse "planner=gpt-4o-mini:4:45,support_agent=gpt-4o-mini:3" into
+    {lazy agent name: HedgePolicy(backup, first token seconds, response seconds)}.
+    """
+    policies = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        agent, _, spec = item.partition("=")
+        parts = spec.strip().split(":")
+        # Model ids can contain ":" (fine-tunes), so thresholds are read from the end
+        numbers = []
+        while len(parts) > 1 and len(numbers) < 2 and _is_number(parts[-1]):
+            numbers.insert(0, float(parts.pop()))
+        if not numbers:
+            raise ValueError(f"hedge policy for {agent.strip()} needs a first-token threshold: {item!r}")
+        policies[agent.strip()] = HedgePolicy(":".join(parts), *numbers)
+    return policies
+
+
+def _is_number(text: str) -> bool:
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+
+# Keyed by LazyAgent name (the module-level variable, e.g. "planner"). Off unless configured:
+# a hedge can double the LLM spend of a slow run.
+hedge_policies: dict[str, HedgePolicy] = _parse_policies(os.getenv("AGENT_HEDGE_POLICIES", ""))
+
+
+def policy_for(agent: Any) -> Optional[HedgePolicy]:
+    """The agent's hedge policy, if it has one and can be rebuilt on the backup model."""
+    if not isinstance(agent, LazyAgent):
+        return None
+    policy = hedge_policies.get(agent.lazy_name)
+    if policy is None or getattr(agent.model, "id", None) == policy.backup_model:
+        return None
+    return policy
+
+
+async def first_success(runs: dict[str, asyncio.Future]) -> tuple[str, Any]:
+    """
+    Wait for the first run to succeed and return (label, result).
+
+    A run that fails only loses the race; the primary's error is raised once
+    every run has failed. Ties go to the run listed first.
+    """
+    pending = set(runs.values())
+    errors: dict[str, BaseException] = {}
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for label, run in runs.items():
+            if run not in done:
+                continue
+            if run.cancelled():
+                errors[label] = asyncio.CancelledError()
+                continue
+            if run.exception() is None:
+                return label, run.result()
+            errors[label] = run.exception()
+    raise errors.get(PRIMARY) or next(iter(errors.values()))
+
+
+async def cancel_runs(runs) -> None:
+    """Cancel the runs that lost and wait for them to release their admission slots."""
+    pending = [run for run in runs if not run.done()]
+    for run in pending:
+        run.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
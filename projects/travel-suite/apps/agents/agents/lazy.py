@@ -0,0 +1,169 @@
+"""
+Deferred construction for module-level agents.
+Building an agent pulls in the OpenAI client, search tools, knowledge readers
+and memory, so agents are created on first use (or by the startup warm-up)
+instead of at import time.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+import dataclasses
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+logger = logging.getLogger("gobuddy.lazy")
+
+# Idle per-run copies kept for reuse per agent (roughly the expected peak concurrency)
+AGENT_POOL_MAX_IDLE = int(os.getenv("AGENT_POOL_MAX_IDLE", "32"))
+
+_lazy_agents: list["LazyAgent"] = []
+_warmup_finished = False
+
+
+class LazyAgent:
+    """
+    Stand-in for a module-level agent that builds it on first attribute access.
+
+    `lazy.arun(...)`, `lazy.name` and so on are forwarded to the built object,
+    so callers (and `patch("module.agent")` in tests) treat it like the agent.
+    Construction is guarded by a lock because the warm-up runs in a thread.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], register: bool = True):
+        self._lazy_name = name
+        self._factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+        self._lazy_build_ms: Optional[float] = None
+        self._lazy_error: Optional[str] = None
+        self._lazy_idle: list[Any] = []
+        self._lazy_variants: dict[str, "LazyAgent"] = {}
+        if register:
+            _lazy_agents.append(self)
+
+    @property
+    def lazy_name(self) -> str:
+        return self._lazy_name
+
+    @property
+    def built(self) -> bool:
+        return self._value is not None
+
+    def get(self) -> Any:
+        """Return the agent, building it if needed."""
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    started = time.perf_counter()
+                    try:
+                        self._value = self._factory()
+                    except Exception as e:
+                        self._lazy_error = f"{type(e).__name__}: {e}"
+                        raise
+                    self._lazy_error = None
+                    self._lazy_build_ms = round((time.perf_counter() - started) * 1000, 1)
+                    logger.info("Built %s in %.0f ms", self._lazy_name, self._lazy_build_ms)
+        return self._value
+
+    @contextmanager
+    def lease(self) -> Iterator[Any]:
+        """
+        An instance of the agent for one run, not shared with concurrent runs.
+
+        agno agents keep per-run state on the instance (`run_response`, and a
+        `stream` flag that stays set once any call has streamed), so concurrent
+        runs on one object can fail or read each other's responses. Runs get
+        an idle copy from a small pool instead, created with `deep_copy` and
+        sharing the original's memory and knowledge base. Objects without
+        `deep_copy` (test doubles) are handed out as-is.
+        """
+        agent = self.get()
+        if not hasattr(type(agent), "deep_copy"):
+            yield agent
+            return
+
+        try:
+            copy = self._lazy_idle.pop()
+        except IndexError:
+            copy = agent.deep_copy(update={
+                "memory": agent.memory,
+                "knowledge": agent.knowledge,
+                "telemetry": os.getenv("AGNO_TELEMETRY", "false").lower() == "true",
+            })
+        copy.stream = False
+        try:
+            yield copy
+        finally:
+            if len(self._lazy_idle) < AGENT_POOL_MAX_IDLE:
+                self._lazy_idle.append(copy)
+
+    def on_model(self, model: str) -> "LazyAgent":
+        """
+        This agent running on another model id (e.g. a faster backup for hedged
+        runs), with the same instructions, tools, memory and knowledge.
+
+        Built on first use from the original and leased from its own pool. Not
+        registered for warm-up: most processes never need it.
+        """
+        variant = self._lazy_variants.get(model)
+        if variant is None:
+            variant = self._lazy_variants[model] = LazyAgent(
+                f"{self._lazy_name}@{model}", lambda: _with_model(self.get(), model), register=False
+            )
+        return variant
+
+    def __getattr__(self, attr: str) -> Any:
+        # Only called for attributes the proxy itself does not define
+        if attr.startswith("_lazy") or attr in {"_factory", "_value", "_lock"}:
+            raise AttributeError(attr)
+        return getattr(self.get(), attr)
+
+    def __repr__(self) -> str:
+        state = "built" if self.built else "not built"
+        return f"<LazyAgent {self._lazy_name} ({state})>"
+
+
+def _with_model(agent: Any, model: str) -> Any:
+    return agent.deep_copy(update={
+        # agno models are dataclasses; keep the original's settings (response_format etc.)
+        "model": dataclasses.replace(agent.model, id=model),
+        "memory": agent.memory,
+        "knowledge": agent.knowledge,
+    })
+
+
+def warm_up() -> None:
+    """Build every registered agent that is not built yet."""
+    for lazy in list(_lazy_agents):
+        try:
+            lazy.get()
+        except Exception as e:
+            # Left unbuilt; the first request retries and surfaces the error
+            logger.warning("Warm-up of %s failed: %s", lazy._lazy_name, e)
+
+
+async def warm_up_agents() -> None:
+    """Build agents off the event loop so startup and early requests are not blocked."""
+    global _warmup_finished
+    started = time.perf_counter()
+    await asyncio.to_thread(warm_up)
+    _warmup_finished = True
+    logger.info("Agent warm-up finished in %.0f ms", (time.perf_counter() - started) * 1000)
+
+
+def warmup_finished() -> bool:
+    return _warmup_finished
+
+
+def agent_states() -> dict:
+    """Build state of every lazy agent, for health and readiness reporting."""
+    return {
+        lazy._lazy_name: {
+            "state": "ready" if lazy.built else ("failed" if lazy._lazy_error else "not_built"),
+            "build_ms": lazy._lazy_build_ms,
+            "error": lazy._lazy_error,
+        }
+        for lazy in _lazy_agents
+    }
@@ -0,0 +1,82 @@
+"""
+Prometheus metrics for agent runs.
+Recorded by `agents.runtime` around every LLM call; exposed by `/metrics`.
+"""
+import time
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from prometheus_client import Counter, Histogram
+
+# LLM calls take seconds, not milliseconds; buckets cover fast formatters to slow team steps
+AGENT_RUN_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+AGENT_RUN_SECONDS = Histogram(
+    "gobuddy_agent_run_seconds",
+    "Agent run latency (time holding an admission slot), by agent and outcome.",
+    ["agent", "model", "outcome"],
+    buckets=AGENT_RUN_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "gobuddy_llm_tokens_total",
+    "Tokens reported by the model provider, by model and direction.",
+    ["model", "kind"],
+)
+HANDOFF_TOKENS = Counter(
+    "gobuddy_handoff_tokens_total",
+    "Upstream output tokens offered to and passed on to downstream team members.",
+    ["consumer", "kind"],
+)
+HEDGED_RUNS = Counter(
+    "gobuddy_hedged_runs_total",
+    "Runs of agents with a hedge policy, by outcome: not_fired, primary_won, backup_won or failed.",
+    ["agent", "backup_model", "outcome"],
+)
+QUICK_RESPONSE_HITS = Counter(
+    "gobuddy_quick_response_hits_total",
+    "Support questions answered from canned responses without an LLM call.",
+    ["category"],
+)
+
+_TOKEN_KINDS = ("input_tokens", "output_tokens")
+
+
+@contextmanager
+def observe_agent_run(agent: str, model: str) -> Iterator[None]:
+    """Time the block as one agent run; exceptions are recorded as outcome="error" (or "cancelled")."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    except asyncio.CancelledError:
+        # Deadlines and hedging cancel runs on purpose; keep them out of the error rate
+        outcome = "cancelled"
+        raise
+    finally:
+        AGENT_RUN_SECONDS.labels(agent, model, outcome).observe(time.perf_counter() - started)
+
+
+def token_usage(response: Any) -> dict[str, int]:
+    """Token totals ({"input": n, "output": n}) from an agno RunResponse, if it reports any."""
+    metrics = getattr(response, "metrics", None)
+    if not isinstance(metrics, dict):
+        return {}
+    usage = {}
+    for kind in _TOKEN_KINDS:
+        # agno reports one value per assistant message in the run
+        values = metrics.get(kind)
+        if isinstance(values, (int, float)):
+            values = [values]
+        if not isinstance(values, list):
+            continue
+        total = sum(v for v in values if isinstance(v, (int, float)))
+        if total:
+            usage[kind.removesuffix("_tokens")] = int(total)
+    return usage
+
+
+def record_token_usage(model: str, usage: dict[str, int]) -> None:
+    for kind, total in usage.items():
+        LLM_TOKENS.labels(model, kind).inc(total)
@@ -2,13 +2,15 @@
 Travel Recommender Agent with Learning
 Provides personalized destination recommendations based on user preferences and history
 """
-from typing import Optional
+from typing import TYPE_CHECKING, AsyncIterator, Optional
 from types import SimpleNamespace
 from pydantic import BaseModel, Field
 
-from agno.agent import Agent
-from agno.models.openai import OpenAIChat
-from agno.tools.duckduckgo import DuckDuckGoTools
+from agents.lazy import LazyAgent
+from agents.runtime import run_agent, stream_agent
+
+if TYPE_CHECKING:
+    from agno.agent import Agent
 
 
 # Structured output models
@@ -46,17 +48,20 @@ memory_config = SimpleNamespace(
     num_history_responses=5,
 )
 
-agent_memory = None
-try:
-    from agno.memory.agent import AgentMemory
 
-    agent_memory = AgentMemory(
-        create_user_memories=True,
-        update_user_memories_after_run=True,
-        create_session_summary=True,
-    )
-except Exception:
-    agent_memory = None
+def build_agent_memory():
+    """Runtime memory for the recommender, or None if this agno version lacks it."""
+    try:
+        from agno.memory.agent import AgentMemory
+
+        return AgentMemory(
+            create_user_memories=True,
+            update_user_memories_after_run=True,
+            create_session_summary=True,
+        )
+    except Exception:
+        return None
+
 
 class RecommenderAgentRuntime:
     """Compatibility wrapper exposing stable learning flags for tests/product logic."""
@@ -65,14 +70,50 @@ class RecommenderAgentRuntime:
     read_user_memories = True
     update_user_memories = True
 
-    def __init__(self, agent: Agent):
+    def __init__(self, agent: "Agent"):
         self._agent = agent
 
+    @property
+    def name(self):
+        return self._agent.name
+
+    @property
+    def model(self):
+        return self._agent.model
+
+    @property
+    def run_response(self):
+        return self._agent.run_response
+
+    @property
+    def memory(self):
+        return self._agent.memory
+
+    @property
+    def knowledge(self):
+        return self._agent.knowledge
+
+    @property
+    def stream(self):
+        return self._agent.stream
+
+    @stream.setter
+    def stream(self, value):
+        self._agent.stream = value
+
+    def deep_copy(self, *, update: Optional[dict] = None) -> "RecommenderAgentRuntime":
+        return RecommenderAgentRuntime(self._agent.deep_copy(update=update))
+
     async def arun(self, *args, **kwargs):
         return await self._agent.arun(*args, **kwargs)
 
 
 def build_recommender_agent() -> RecommenderAgentRuntime:
+    from agno.agent import Agent
+    from agno.models.openai import OpenAIChat
+    from agno.tools.duckduckgo import DuckDuckGoTools
+
+    agent_memory = build_agent_memory()
     common_kwargs = dict(
         name="TravelRecommender",
         model=OpenAIChat(id="gpt-4o"),
@@ -114,8 +155,8 @@ def build_recommender_agent() -> RecommenderAgentRuntime:
     return RecommenderAgentRuntime(agent)
 
 
-# Recommender Agent with Learning
-recommender_agent = build_recommender_agent()
+# Recommender Agent with Learning (built on first use or by the startup warm-up)
+recommender_agent = LazyAgent("recommender_agent", build_recommender_agent)
 
 
 async def get_recommendations(
@@ -136,7 +177,55 @@ async def get_recommendations(
     Returns:
         Personalized recommendations with explanations
     """
-    # Build the prompt
+    prompt = _build_recommendation_prompt(query, preferences, num_recommendations)
+
+    # Get response with user context (memory)
+    response = await run_agent(recommender_agent, prompt, user_id=user_id)
+
+    return {
+        "recommendations": response.content,
+        "user_id": user_id,
+        "personalized": True,
+        "agent": "TravelRecommender",
+    }
+
+
+async def stream_recommendations(
+    user_id: str,
+    query: Optional[str] = None,
+    preferences: Optional[dict] = None,
+    num_recommendations: int = 3,
+) -> AsyncIterator[dict]:
+    """
+    Streaming variant of `get_recommendations`.
+
+    Yields `agent_started`, `delta` events as tokens arrive, then a `result`
+    event whose `data` is the same dict `get_recommendations` returns.
+    """
+    prompt = _build_recommendation_prompt(query, preferences, num_recommendations)
+
+    yield {"event": "agent_started", "agent": "TravelRecommender"}
+    parts = []
+    async for delta in stream_agent(recommender_agent, prompt, user_id=user_id):
+        parts.append(delta)
+        yield {"event": "delta", "agent": "TravelRecommender", "content": delta}
+
+    yield {
+        "event": "result",
+        "data": {
+            "recommendations": "".join(parts),
+            "user_id": user_id,
+            "personalized": True,
+            "agent": "TravelRecommender",
+        },
+    }
+
+
+def _build_recommendation_prompt(
+    query: Optional[str],
+    preferences: Optional[dict],
+    num_recommendations: int,
+) -> str:
     prompt_parts = []
 
     if query:
@@ -165,17 +254,18 @@ async def get_recommendations(
         "explaining why each one matches my preferences."
     )
 
-    prompt = "\n".join(prompt_parts)
+    return "\n".join(prompt_parts)
 
-    # Get response with user context (memory)
-    response = await recommender_agent.arun(prompt, user_id=user_id)
 
-    return {
-        "recommendations": response.content,
-        "user_id": user_id,
-        "personalized": True,
-        "agent": "TravelRecommender",
-    }
+def build_recommendation_formatter() -> "Agent":
+    from agno.agent import Agent
+    from agno.models.openai import OpenAIChat
+
+    return Agent(
+        name="RecommendationFormatter",
+        model=OpenAIChat(id="gpt-4o"),
+        response_model=RecommendationResponse,
+    )
 
 
 async def get_structured_recommendations(
@@ -188,11 +278,7 @@ async def get_structured_recommendations(
     Get structured destination recommendations.
     """
     # Create formatter agent with structured output
-    formatter = Agent(
-        name="RecommendationFormatter",
-        model=OpenAIChat(id="gpt-4o"),
-        response_model=RecommendationResponse,
-    )
+    formatter = build_recommendation_formatter()
 
     # First get natural language recommendations
     result = await get_recommendations(
@@ -211,7 +297,7 @@ async def get_structured_recommendations(
     Extract {num_recommendations} destinations with all required fields.
     """
 
-    response = await formatter.arun(format_prompt)
+    response = await run_agent(formatter, format_prompt)
     return response.content
 
 
@@ -238,7 +324,7 @@ async def update_preferences(
     Acknowledge this update briefly.
     """
 
-    response = await recommender_agent.arun(prompt, user_id=user_id)
+    response = await run_agent(recommender_agent, prompt, user_id=user_id)
 
     return {
         "updated": True,
@@ -279,7 +365,7 @@ async def provide_feedback(
 
     prompt = " ".join(prompt_parts)
 
-    response = await recommender_agent.arun(prompt, user_id=user_id)
+    response = await run_agent(recommender_agent, prompt, user_id=user_id)
 
     return {
         "feedback_recorded": True,
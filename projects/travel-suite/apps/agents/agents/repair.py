@@ -0,0 +1,278 @@
+"""
+Local validation and repair of model-written trip itineraries.
+Fixes the small schema slips a planner makes when it writes `TripItinerary`
+JSON itself (missing defaults, "$25" costs, "2 hours" durations, day-number
+gaps), so only hard failures cost another model call. `DayStreamParser` picks
+complete days out of the JSON while it is still being streamed.
+"""
+import re
+import json
+from typing import Any, Optional
+
+_NUMBER = re.compile(r"-?\d+(?:[.,]\d+)*")
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+_HOURS = re.compile(r"(\d+(?:\.\d+)?)\s*(?:h|hr|hrs|hour|hours)\b")
+_MINUTES = re.compile(r"(\d+(?:\.\d+)?)\s*(?:m|min|mins|minute|minutes)\b")
+_FREE = ("free", "no cost", "included", "none")
+
+
+class ItineraryRepairError(ValueError):
+    """The model output cannot be turned into an itinerary locally; ask the model again."""
+
+
+def parse_json_object(text: Any) -> dict:
+    """Parse a JSON object from model output, tolerating code fences and surrounding prose."""
+    if isinstance(text, dict):
+        return text
+    if hasattr(text, "model_dump"):
+        return text.model_dump()
+    if not isinstance(text, str):
+        raise ItineraryRepairError(f"expected JSON text, got {type(text).__name__}")
+
+    body = _FENCE.sub("", text.strip())
+    try:
+        data = json.loads(body)
+    except json.JSONDecodeError:
+        start, end = body.find("{"), body.rfind("}")
+        if start == -1 or end <= start:
+            raise ItineraryRepairError("no JSON object in the reply") from None
+        try:
+            data = json.loads(body[start:end + 1])
+        except json.JSONDecodeError as exc:
+            raise ItineraryRepairError(f"invalid JSON: {exc}") from None
+    if not isinstance(data, dict):
+        raise ItineraryRepairError(f"expected a JSON object, got {type(data).__name__}")
+    return data
+
+
+def coerce_amount(value: Any) -> Optional[float]:
+    """
+    Read a cost from model output: 25, "25", "$25", "USD 1,200", "10-20" (the
+    midpoint) and "free" are all accepted. Returns None when there is no number.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    text = value.strip().lower()
+    if any(word in text for word in _FREE):
+        return 0.0
+    numbers = [float(n.replace(",", "")) for n in _NUMBER.findall(text.replace(" ", ""))]
+    numbers = [abs(n) for n in numbers]
+    if not numbers:
+        return None
+    return round(sum(numbers[:2]) / len(numbers[:2]), 2)
+
+
+def coerce_minutes(value: Any) -> Optional[int]:
+    """Read a duration in minutes: 90, "90", "90 min", "1.5 hours" and "2h 30m" are accepted."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if not isinstance(value, str):
+        return None
+    text = value.strip().lower()
+    hours, minutes = _HOURS.search(text), _MINUTES.search(text)
+    if hours or minutes:
+        total = (float(hours.group(1)) * 60 if hours else 0) + (float(minutes.group(1)) if minutes else 0)
+        return int(round(total))
+    amount = coerce_amount(text)
+    return int(amount) if amount is not None else None
+
+
+def _as_list(value: Any) -> list:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value] if value.strip() else []
+    return list(value) if isinstance(value, (list, tuple)) else []
+
+
+def _text(value: Any, default: str = "") -> str:
+    if value is None:
+        return default
+    return value if isinstance(value, str) else str(value)
+
+
+def _repair_activity(raw: Any, fixes: list[str]) -> Optional[dict]:
+    if isinstance(raw, str):
+        fixes.append("activity given as text")
+        raw = {"title": raw}
+    if not isinstance(raw, dict):
+        return None
+    title = _text(raw.get("title") or raw.get("name") or raw.get("description")).strip()
+    if not title:
+        fixes.append("dropped untitled activity")
+        return None
+
+    activity = {
+        "time": _text(raw.get("time")),
+        "title": title,
+        "description": _text(raw.get("description")),
+        "location": _text(raw.get("location")),
+    }
+    minutes = coerce_minutes(raw.get("duration_minutes"))
+    if minutes is None or not isinstance(raw.get("duration_minutes"), int):
+        fixes.append("duration_minutes")
+    activity["duration_minutes"] = minutes if minutes is not None else 60
+    cost = coerce_amount(raw.get("cost_estimate"))
+    if not isinstance(raw.get("cost_estimate"), (int, float)) or isinstance(raw.get("cost_estimate"), bool):
+        fixes.append("cost_estimate")
+    activity["cost_estimate"] = cost if cost is not None else 0.0
+    return activity
+
+
+def repair_day(raw: dict, day_number: int, fixes: list[str]) -> dict:
+    """One model-written day in `DayPlan` shape, numbered `day_number`; fixed fields are added to `fixes`."""
+    activities = []
+    for item in _as_list(raw.get("activities")):
+        activity = _repair_activity(item, fixes)
+        if activity is not None:
+            activities.append(activity)
+    if not raw.get("theme"):
+        fixes.append("theme")
+    return {
+        "day_number": day_number,
+        "date": _text(raw["date"]) if raw.get("date") else None,
+        "theme": _text(raw.get("theme"), f"Day {day_number}") or f"Day {day_number}",
+        "activities": activities,
+        "meals": [_text(meal) for meal in _as_list(raw.get("meals"))],
+        "notes": _text(raw.get("notes")),
+    }
+
+
+def repair_itinerary(
+    data: dict,
+    destination: str,
+    duration_days: int,
+    budget: Optional[float] = None,
+) -> tuple[dict, list[str]]:
+    """
+    Bring a model-written itinerary in line with the `TripItinerary` schema.
+
+    Returns the repaired dict and the fields that needed fixing. Raises
+    `ItineraryRepairError` for problems a local fix would only paper over:
+    no days at all, or fewer days than the trip is long.
+    """
+    fixes: list[str] = []
+    raw_days = data.get("days")
+    if isinstance(raw_days, dict):
+        # {"1": {...}, "2": {...}}
+        raw_days = [{"day_number": key, **day} for key, day in raw_days.items() if isinstance(day, dict)]
+        fixes.append("days given as an object")
+    raw_days = [day for day in _as_list(raw_days) if isinstance(day, dict)]
+    if not raw_days:
+        raise ItineraryRepairError("the itinerary has no days")
+    if len(raw_days) < duration_days:
+        raise ItineraryRepairError(f"expected {duration_days} days, got {len(raw_days)}")
+
+    # Order by the model's numbering (position breaks ties and fills blanks), then renumber 1..n
+    numbered = sorted(
+        enumerate(raw_days),
+        key=lambda item: (coerce_amount(item[1].get("day_number")) or item[0] + 1, item[0]),
+    )
+    if [coerce_amount(day.get("day_number")) for _, day in numbered] != list(range(1, len(numbered) + 1)):
+        fixes.append("day_number")
+    if len(numbered) > duration_days:
+        fixes.append("extra days")
+
+    days = [repair_day(raw, number, fixes) for number, (_, raw) in enumerate(numbered[:duration_days], start=1)]
+
+    total = coerce_amount(data.get("total_budget"))
+    if total is None or not isinstance(data.get("total_budget"), (int, float)):
+        fixes.append("total_budget")
+    if total is None:
+        total = budget if budget else sum(a["cost_estimate"] for day in days for a in day["activities"])
+
+    for field in ("destination", "best_time_to_visit"):
+        if not data.get(field):
+            fixes.append(field)
+    if data.get("duration_days") != duration_days:
+        fixes.append("duration_days")
+
+    repaired = {
+        "destination": _text(data.get("destination")) or destination,
+        "duration_days": duration_days,
+        "total_budget": total,
+        "currency": _text(data.get("currency")) or "USD",
+        "best_time_to_visit": _text(data.get("best_time_to_visit")),
+        "days": days,
+        "packing_tips": [_text(tip) for tip in _as_list(data.get("packing_tips"))],
+        "local_tips": [_text(tip) for tip in _as_list(data.get("local_tips"))],
+    }
+    return repaired, sorted(set(fixes))
+
+
+class DayStreamParser:
+    """
+    Incremental scanner for an itinerary JSON object arriving in pieces.
+
+    `feed` returns each object of the top-level "days" array as soon as its
+    closing brace has been fed, parsed but not repaired. Text before the
+    object (prose, a code fence) and after it is ignored. Only the day being
+    read is buffered, so feeding is linear in the length of the reply.
+    """
+
+    def __init__(self):
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string: list[str] = []
+        # Last string completed directly inside the top-level object (the key, before a value)
+        self._key: Optional[str] = None
+        self._in_days = False
+        self._day: Optional[list[str]] = None
+        self._finished = False
+
+    def feed(self, text: str) -> list[dict]:
+        days = []
+        for char in text:
+            if self._finished:
+                break
+            if self._day is not None:
+                self._day.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._key = "".join(self._string)
+                elif self._depth == 1:
+                    self._string.append(char)
+                continue
+            if self._depth == 0 and char != "{":
+                continue
+            if char == '"':
+                self._in_string = True
+                self._string = []
+            elif char in "{[":
+                self._depth += 1
+                if char == "[" and self._depth == 2 and self._key == "days":
+                    self._in_days = True
+                elif char == "{" and self._depth == 3 and self._in_days:
+                    self._day = ["{"]
+            elif char in "}]":
+                if char == "}" and self._depth == 3 and self._day is not None:
+                    day = self._parse("".join(self._day))
+                    if day is not None:
+                        days.append(day)
+                    self._day = None
+                elif char == "]" and self._depth == 2:
+                    self._in_days = False
+                self._depth -= 1
+                self._finished = self._depth == 0
+        return days
+
+    @staticmethod
+    def _parse(text: str) -> Optional[dict]:
+        try:
+            day = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        return day if isinstance(day, dict) else None
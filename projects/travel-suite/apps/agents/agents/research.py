@@ -0,0 +1,181 @@
+"""
+Shared destination research for the trip planner.
+The Researcher is prompted with only the destination and travel month, so its
+findings depend on where and when, not on who is asking, and are cached per
+(canonical destination, travel month) across users. A local copy serves repeat
+lookups without a round trip; `public.agent_research_cache` keeps entries
+across restarts and replicas when DATABASE_URL is set.
+"""
+import os
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+logger = logging.getLogger("gobuddy.research")
+
+RESEARCH_CACHE_TTL_SECONDS = float(os.getenv("RESEARCH_CACHE_TTL_SECONDS", "604800"))
+RESEARCH_CACHE_MAX_ENTRIES = int(os.getenv("RESEARCH_CACHE_MAX_ENTRIES", "1000"))
+# How long a replica trusts its local copy before re-reading the shared table,
+# which bounds how stale a copy can be after another replica refreshes it
+RESEARCH_CACHE_LOCAL_TTL_SECONDS = float(os.getenv("RESEARCH_CACHE_LOCAL_TTL_SECONDS", "300"))
+
+# travel_month for requests that do not say when
+ANY_MONTH = 0
+
+
+@dataclass
+class ResearchEntry:
+    """Cached Researcher output and when it was produced."""
+
+    content: str
+    created_at: datetime
+
+    def age_seconds(self) -> int:
+        return max(0, int((datetime.now(timezone.utc) - self.created_at).total_seconds()))
+
+
+class ResearchCache:
+    """
+    Research keyed by (canonical destination, travel month), with a TTL.
+
+    Database errors are logged and counted but never fail a plan: the lookup
+    is a miss and the write is skipped.
+    """
+
+    def __init__(
+        self,
+        table: str = "public.agent_research_cache",
+        ttl_seconds: float = RESEARCH_CACHE_TTL_SECONDS,
+        max_entries: int = RESEARCH_CACHE_MAX_ENTRIES,
+        local_ttl_seconds: float = RESEARCH_CACHE_LOCAL_TTL_SECONDS,
+    ):
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.local_ttl_seconds = local_ttl_seconds
+        self._pool = None
+        # key -> (local expiry on the monotonic clock, entry)
+        self._local: OrderedDict[tuple[str, int], tuple[float, ResearchEntry]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.failed = 0
+
+    @property
+    def persistent(self) -> bool:
+        return self._pool is not None
+
+    async def start(self, pool) -> None:
+        """Use `pool` for the shared table. Called from the app lifespan; None keeps the cache in memory."""
+        self._pool = pool
+
+    async def stop(self) -> None:
+        self._pool = None
+
+    def _expired(self, entry: ResearchEntry) -> bool:
+        return entry.age_seconds() >= self.ttl_seconds
+
+    def _remember(self, key: tuple[str, int], entry: ResearchEntry) -> None:
+        if self.max_entries <= 0:
+            return
+        expires = time.monotonic() + (self.local_ttl_seconds if self.persistent else self.ttl_seconds)
+        self._local[key] = (expires, entry)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    async def get(self, destination: str, travel_month: int = ANY_MONTH) -> Optional[ResearchEntry]:
+        """Fresh research for a canonical destination and month, or None."""
+        key = (destination, travel_month)
+        cached = self._local.get(key)
+        if cached is not None:
+            expires, entry = cached
+            if time.monotonic() < expires and not self._expired(entry):
+                self._local.move_to_end(key)
+                self.hits += 1
+                return entry
+            del self._local[key]
+
+        entry = await self._fetch(key)
+        if entry is None or self._expired(entry):
+            self.misses += 1
+            return None
+        self._remember(key, entry)
+        self.hits += 1
+        return entry
+
+    async def _fetch(self, key: tuple[str, int]) -> Optional[ResearchEntry]:
+        if not self.persistent:
+            return None
+        try:
+            row = await self._pool.fetchrow(
+                f"SELECT content, created_at FROM {self.table} "
+                "WHERE destination = $1 AND travel_month = $2 AND created_at > $3",
+                *key,
+                datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds),
+            )
+        except Exception as e:
+            self.failed += 1
+            logger.warning("Research cache lookup failed: %s", e)
+            return None
+        return ResearchEntry(row["content"], row["created_at"]) if row else None
+
+    async def put(self, destination: str, travel_month: int, content: str) -> ResearchEntry:
+        """Store fresh research, replacing any older entry for the same key."""
+        key = (destination, travel_month)
+        entry = ResearchEntry(content, datetime.now(timezone.utc))
+        self._remember(key, entry)
+        self.stored += 1
+        if self.persistent:
+            try:
+                await self._pool.execute(
+                    f"INSERT INTO {self.table} (destination, travel_month, content, created_at) "
+                    "VALUES ($1, $2, $3, $4) "
+                    "ON CONFLICT (destination, travel_month) "
+                    "DO UPDATE SET content = EXCLUDED.content, created_at = EXCLUDED.created_at",
+                    *key,
+                    content,
+                    entry.created_at,
+                )
+            except Exception as e:
+                self.failed += 1
+                logger.warning("Research cache write failed: %s", e)
+        return entry
+
+    async def invalidate(self, destination: str, travel_month: Optional[int] = None) -> None:
+        """Drop research for a destination (one month, or every month) so the next plan refreshes it."""
+        for key in [k for k in self._local if k[0] == destination]:
+            if travel_month is None or key[1] == travel_month:
+                del self._local[key]
+        if self.persistent:
+            query = f"DELETE FROM {self.table} WHERE destination = $1"
+            args = [destination]
+            if travel_month is not None:
+                query += " AND travel_month = $2"
+                args.append(travel_month)
+            try:
+                await self._pool.execute(query, *args)
+            except Exception as e:
+                self.failed += 1
+                logger.warning("Research cache invalidation failed: %s", e)
+
+    def clear(self) -> None:
+        """Forget local copies (the shared table is left alone)."""
+        self._local.clear()
+
+    def stats(self) -> dict:
+        return {
+            "persistent": self.persistent,
+            "entries": len(self._local),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "failed": self.failed,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+research_cache = ResearchCache()
@@ -0,0 +1,179 @@
+"""
+Shared helpers for running Agno agents.
+Every agent call goes through `run_agent` / `stream_agent`, which apply
+per-model admission control before anything reaches the LLM provider and
+record a trace span plus latency and token metrics for the run. Lazy agents
+run on a leased per-run copy (see `LazyAgent.lease`), and agents with a hedge
+policy race a backup model when the primary is slow (see `agents.hedging`).
+"""
+import time
+import asyncio
+import logging
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, AsyncIterator, ContextManager, Optional
+
+from opentelemetry.trace import Span
+
+from agents.admission import admission
+from agents.hedging import BACKUP, PRIMARY, HedgePolicy, cancel_runs, first_success, policy_for
+from agents.lazy import LazyAgent
+from agents.metrics import HEDGED_RUNS, observe_agent_run, record_token_usage, token_usage
+from agents.tracing import span
+
+logger = logging.getLogger("gobuddy.runtime")
+
+if TYPE_CHECKING:
+    from agno.agent import Agent
+
+
+def model_id(agent: "Agent") -> str:
+    """The model an agent calls (e.g. "gpt-4o"), used to pick its admission gate."""
+    model = getattr(agent, "model", None)
+    model_name = getattr(model, "id", None)
+    return model_name if isinstance(model_name, str) else "default"
+
+
+def agent_name(agent: "Agent") -> str:
+    name = getattr(agent, "name", None)
+    return name if isinstance(name, str) else "unknown"
+
+
+def _leased(agent: "Agent") -> ContextManager["Agent"]:
+    return agent.lease() if isinstance(agent, LazyAgent) else nullcontext(agent)
+
+
+def _span_attributes(agent: "Agent", model: str) -> dict:
+    return {"agent.name": agent_name(agent), "gen_ai.request.model": model}
+
+
+def _record_usage(run_span: Span, model: str, response: Any) -> None:
+    usage = token_usage(response)
+    record_token_usage(model, usage)
+    for kind, total in usage.items():
+        run_span.set_attribute(f"gen_ai.usage.{kind}_tokens", total)
+
+
+def _record_hedge(agent: "Agent", policy: HedgePolicy, fired: bool, winner: Optional[str]) -> None:
+    if not fired:
+        outcome = "not_fired"
+    else:
+        outcome = {PRIMARY: "primary_won", BACKUP: "backup_won"}.get(winner, "failed")
+    HEDGED_RUNS.labels(agent_name(agent), policy.backup_model, outcome).inc()
+    if outcome == "backup_won":
+        logger.info("%s answered from backup model %s", agent_name(agent), policy.backup_model)
+
+
+async def run_agent(agent: "Agent", prompt: str, **kwargs) -> Any:
+    """Run an agent once its model has a free admission slot."""
+    policy = policy_for(agent)
+    if policy is None or policy.response_seconds is None:
+        return await _run(agent, prompt, **kwargs)
+
+    runs = {PRIMARY: asyncio.ensure_future(_run(agent, prompt, **kwargs))}
+    try:
+        await asyncio.wait(runs.values(), timeout=policy.response_seconds)
+        if not runs[PRIMARY].done():
+            runs[BACKUP] = asyncio.ensure_future(_run(agent.on_model(policy.backup_model), prompt, **kwargs))
+        try:
+            winner, response = await first_success(runs)
+        except Exception:
+            _record_hedge(agent, policy, BACKUP in runs, None)
+            raise
+        _record_hedge(agent, policy, BACKUP in runs, winner)
+        return response
+    finally:
+        await cancel_runs(runs.values())
+
+
+async def _run(agent: "Agent", prompt: str, **kwargs) -> Any:
+    model = model_id(agent)
+    name = agent_name(agent)
+    with span(f"agent.run {name}", _span_attributes(agent, model)) as run_span:
+        queued_at = time.perf_counter()
+        async with admission.admit(model):
+            run_span.set_attribute("admission.wait_ms", round((time.perf_counter() - queued_at) * 1000, 1))
+            with observe_agent_run(name, model), _leased(agent) as instance:
+                response = await instance.arun(prompt, **kwargs)
+        _record_usage(run_span, model, response)
+    return response
+
+
+async def stream_agent(agent: "Agent", prompt: str, **kwargs) -> AsyncIterator[str]:
+    """
+    Yield content deltas from an agent run as the model produces them.
+
+    The admission slot is held until the stream finishes. Models that cannot
+    stream return a single response; its content is yielded as one chunk so
+    callers do not need to special-case them. A hedged stream commits to
+    whichever model yields its first delta first.
+    """
+    policy = policy_for(agent)
+    if policy is None:
+        async for delta in _stream(agent, prompt, **kwargs):
+            yield delta
+        return
+
+    streams = {PRIMARY: _stream(agent, prompt, **kwargs)}
+    firsts = {PRIMARY: asyncio.ensure_future(_next(streams[PRIMARY]))}
+    try:
+        await asyncio.wait(firsts.values(), timeout=policy.first_token_seconds)
+        if not firsts[PRIMARY].done():
+            streams[BACKUP] = _stream(agent.on_model(policy.backup_model), prompt, **kwargs)
+            firsts[BACKUP] = asyncio.ensure_future(_next(streams[BACKUP]))
+        try:
+            winner, first = await first_success(firsts)
+        except Exception:
+            _record_hedge(agent, policy, BACKUP in firsts, None)
+            raise
+        _record_hedge(agent, policy, BACKUP in firsts, winner)
+        # Free the loser's admission slot now rather than when the winner finishes
+        losers = [label for label in firsts if label != winner]
+        await cancel_runs(firsts[label] for label in losers)
+        for label in losers:
+            await streams[label].aclose()
+
+        if first is _END:
+            return
+        yield first
+        async for delta in streams[winner]:
+            yield delta
+    finally:
+        await cancel_runs(firsts.values())
+        for stream in streams.values():
+            await stream.aclose()
+
+
+_END = object()
+
+
+async def _next(stream: AsyncIterator[str]) -> Any:
+    """The stream's next delta, or _END when it finishes without one."""
+    try:
+        return await stream.__anext__()
+    except StopAsyncIteration:
+        return _END
+
+
+async def _stream(agent: "Agent", prompt: str, **kwargs) -> AsyncIterator[str]:
+    model = model_id(agent)
+    name = agent_name(agent)
+    attributes = {**_span_attributes(agent, model), "gen_ai.stream": True}
+    with span(f"agent.run {name}", attributes, current=False) as run_span:
+        queued_at = time.perf_counter()
+        async with admission.admit(model):
+            run_span.set_attribute("admission.wait_ms", round((time.perf_counter() - queued_at) * 1000, 1))
+            with observe_agent_run(name, model), _leased(agent) as instance:
+                result = await instance.arun(prompt, stream=True, **kwargs)
+                if hasattr(result, "__aiter__"):
+                    async for chunk in result:
+                        content = getattr(chunk, "content", None)
+                        if isinstance(content, str) and content:
+                            yield content
+                    # Stream chunks carry no usage; agno totals it on the agent's run_response
+                    _record_usage(run_span, model, getattr(instance, "run_response", None))
+                    return
+
+                _record_usage(run_span, model, result)
+                content = getattr(result, "content", "") if result is not None else ""
+                if content:
+                    yield str(content)
@@ -3,79 +3,192 @@ Support Bot Agent with RAG
 Answers customer questions using knowledge base of policies, FAQs, and trip information
 """
 import os
+import time
+import asyncio
 import logging
+import threading
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Optional
-
-from agno.agent import Agent
-from agno.models.openai import OpenAIChat
-try:
-    # agno < 0.2 naming
-    from agno.knowledge.text import TextKnowledge  # type: ignore
-    from agno.knowledge.combined import CombinedKnowledge  # type: ignore
-except ImportError:
-    # agno 0.1.0 naming in this repo's pinned requirements
-    from agno.knowledge.text import TextKnowledgeBase as TextKnowledge  # type: ignore
-    from agno.knowledge.combined import CombinedKnowledgeBase as CombinedKnowledge  # type: ignore
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+from agents.lazy import LazyAgent
+from agents.metrics import QUICK_RESPONSE_HITS
+from agents.runtime import run_agent, stream_agent
+
+if TYPE_CHECKING:
+    from agno.agent import Agent
 
 logger = logging.getLogger("gobuddy.support_bot")
 
 # Knowledge base paths
 KNOWLEDGE_DIR = Path(__file__).parent.parent / "knowledge"
 
-# Initialize knowledge sources
+# Knowledge sources, populated when the knowledge base is first built
 knowledge_sources = []
 
-# Add policy document if exists
-policies_path = KNOWLEDGE_DIR / "policies.md"
-if policies_path.exists():
-    knowledge_sources.append(TextKnowledge(path=str(policies_path)))
+# Combined knowledge base (in-memory for simplicity, can be pgvector in production).
+# Built on first use; stays None when there are no knowledge files.
+knowledge = None
+_knowledge_built = False
+_knowledge_lock = threading.Lock()
 
-# Add FAQ document if exists
-faq_path = KNOWLEDGE_DIR / "faq.md"
-if faq_path.exists():
-    knowledge_sources.append(TextKnowledge(path=str(faq_path)))
 
-# Add destination guides if they exist
-destinations_dir = KNOWLEDGE_DIR / "destinations"
-if destinations_dir.exists():
-    for guide in destinations_dir.glob("*.md"):
-        knowledge_sources.append(TextKnowledge(path=str(guide)))
+@dataclass
+class KnowledgeIndexStatus:
+    """Load state of the support knowledge index, reported by /readyz."""
 
+    state: str = "not_loaded"  # not_loaded -> loading -> ready | empty | failed
+    sources: int = 0
+    documents: Optional[int] = None
+    load_seconds: Optional[float] = None
+    error: Optional[str] = None
 
-# Create combined knowledge base (in-memory for simplicity, can be pgvector in production)
-knowledge = None
-if knowledge_sources:
-    knowledge = CombinedKnowledge(sources=knowledge_sources)
-
-
-# Support Bot Agent
-support_agent = Agent(
-    name="SupportBot",
-    model=OpenAIChat(id="gpt-4o"),
-    knowledge=knowledge,
-    search_knowledge=True if knowledge else False,
-    instructions=[
-        "You are a friendly and helpful travel support assistant for GoBuddy Adventures.",
-        "Answer customer questions accurately using the knowledge base when available.",
-        "Be warm, professional, and empathetic in your responses.",
-        "If you're not sure about something, say so and offer to connect with human support.",
-        "For booking or payment issues, direct users to contact support@gobuddy.com.",
-        "Always prioritize customer satisfaction and safety.",
-        "Provide practical, actionable advice when possible.",
-        "If asked about specific trips or bookings, ask for trip ID or booking reference.",
-    ],
-    markdown=True,
-    show_tool_calls=False,  # Hide internal RAG lookups from user
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+knowledge_status = KnowledgeIndexStatus()
+
+
+def knowledge_ready() -> bool:
+    """True once the index is loaded (or there was nothing to load)."""
+    return knowledge_status.state in {"ready", "empty"}
+
+
+def _answering_agent() -> Optional[LazyAgent]:
+    """
+    The agent to answer with, or None while the index is loading.
+
+    A failed load falls back to the LLM without RAG for the rest of the
+    process; before any load starts the bot answers as it always has.
+    """
+    if knowledge_status.state == "loading":
+        return None
+    if knowledge_status.state == "failed":
+        return plain_support_agent
+    return support_agent
+
+
+def _build_knowledge():
+    try:
+        # agno < 0.2 naming
+        from agno.knowledge.text import TextKnowledge  # type: ignore
+        from agno.knowledge.combined import CombinedKnowledge  # type: ignore
+    except ImportError:
+        # agno 0.1.0 naming in this repo's pinned requirements
+        from agno.knowledge.text import TextKnowledgeBase as TextKnowledge  # type: ignore
+        from agno.knowledge.combined import CombinedKnowledgeBase as CombinedKnowledge  # type: ignore
+
+    sources = []
+
+    # Add policy document if exists
+    policies_path = KNOWLEDGE_DIR / "policies.md"
+    if policies_path.exists():
+        sources.append(TextKnowledge(path=str(policies_path)))
+
+    # Add FAQ document if exists
+    faq_path = KNOWLEDGE_DIR / "faq.md"
+    if faq_path.exists():
+        sources.append(TextKnowledge(path=str(faq_path)))
+
+    # Add destination guides if they exist
+    destinations_dir = KNOWLEDGE_DIR / "destinations"
+    if destinations_dir.exists():
+        for guide in destinations_dir.glob("*.md"):
+            sources.append(TextKnowledge(path=str(guide)))
+
+    knowledge_sources[:] = sources
+    return CombinedKnowledge(sources=sources) if sources else None
+
+
+def get_knowledge():
+    """Return the knowledge base, building it on first call."""
+    global knowledge, _knowledge_built
+    if knowledge is None and not _knowledge_built:
+        with _knowledge_lock:
+            if not _knowledge_built:
+                knowledge = _build_knowledge()
+                _knowledge_built = True
+    return knowledge
+
+
+def build_support_agent(use_knowledge: bool = True) -> "Agent":
+    """Support Bot Agent"""
+    from agno.agent import Agent
+    from agno.models.openai import OpenAIChat
+
+    kb = get_knowledge() if use_knowledge else None
+    return Agent(
+        name="SupportBot",
+        model=OpenAIChat(id="gpt-4o"),
+        knowledge=kb,
+        search_knowledge=True if kb else False,
+        instructions=[
+            "You are a friendly and helpful travel support assistant for GoBuddy Adventures.",
+            "Answer customer questions accurately using the knowledge base when available.",
+            "Be warm, professional, and empathetic in your responses.",
+            "If you're not sure about something, say so and offer to connect with human support.",
+            "For booking or payment issues, direct users to contact support@gobuddy.com.",
+            "Always prioritize customer satisfaction and safety.",
+            "Provide practical, actionable advice when possible.",
+            "If asked about specific trips or bookings, ask for trip ID or booking reference.",
+        ],
+        markdown=True,
+        show_tool_calls=False,  # Hide internal RAG lookups from user
+    )
+
+
+support_agent = LazyAgent("support_agent", build_support_agent)
+
+# Answers without RAG when the knowledge index could not be loaded
+plain_support_agent = LazyAgent(
+    "plain_support_agent", lambda: build_support_agent(use_knowledge=False), register=False
 )
 
 
+def _count_documents(kb) -> Optional[int]:
+    """Documents in the index; falls back to reading the sources when there is no vector DB."""
+    vector_db = getattr(kb, "vector_db", None)
+    if vector_db is not None:
+        count = vector_db.get_count()
+        return count if isinstance(count, int) else None
+    return sum(len(documents) for documents in kb.document_lists)
+
+
 async def load_knowledge():
-    """Load the knowledge base. Called on server startup."""
-    global knowledge
-    if knowledge:
-        await knowledge.aload(recreate=False)
+    """
+    Load the knowledge base and record its status.
+
+    Started in the background on server startup; until it finishes the support
+    bot runs in degraded mode. Failures are recorded, not raised, and the bot
+    then answers without the knowledge base.
+    """
+    knowledge_status.state = "loading"
+    knowledge_status.error = None
+    started = time.perf_counter()
+    try:
+        # Building the sources reads every knowledge file; keep it off the event loop
+        kb = await asyncio.to_thread(get_knowledge)
+        knowledge_status.sources = len(knowledge_sources)
+        if not kb:
+            knowledge_status.state = "empty"
+            knowledge_status.documents = 0
+            return
+
+        if hasattr(kb, "aload"):
+            await kb.aload(recreate=False)
+        else:
+            # agno 0.1.0 only has the synchronous loader
+            await asyncio.to_thread(kb.load, recreate=False)
+        knowledge_status.documents = await asyncio.to_thread(_count_documents, kb)
+        knowledge_status.state = "ready"
         logger.info("Loaded %d knowledge sources", len(knowledge_sources))
+    except Exception as e:
+        knowledge_status.state = "failed"
+        knowledge_status.error = f"{type(e).__name__}: {e}"
+        logger.warning("Could not load knowledge base: %s", e)
+    finally:
+        knowledge_status.load_seconds = round(time.perf_counter() - started, 3)
 
 
 async def answer_question(
@@ -94,31 +207,74 @@ async def answer_question(
     Returns:
         Response with answer and metadata
     """
-    # Build prompt with context if provided
-    prompt = question
+    agent = _answering_agent()
+    if agent is None:
+        return _degraded_answer(question)
 
-    if context:
-        context_parts = []
-        if context.get("trip_id"):
-            context_parts.append(f"Trip ID: {context['trip_id']}")
-        if context.get("booking_ref"):
-            context_parts.append(f"Booking Reference: {context['booking_ref']}")
-        if context.get("user_name"):
-            context_parts.append(f"Customer Name: {context['user_name']}")
-
-        if context_parts:
-            prompt = f"Context: {', '.join(context_parts)}\n\nQuestion: {question}"
+    prompt = _build_support_prompt(question, context)
 
     # Get response from agent
-    response = await support_agent.arun(prompt, user_id=user_id)
+    response = await run_agent(agent, prompt, user_id=user_id)
 
     return {
         "answer": response.content,
-        "sources_used": bool(knowledge),
+        "sources_used": agent is support_agent and bool(knowledge),
         "agent": "SupportBot",
     }
 
 
+async def stream_answer(
+    question: str,
+    context: Optional[dict] = None,
+    user_id: Optional[str] = None,
+) -> AsyncIterator[dict]:
+    """
+    Streaming variant of `answer_question`.
+
+    Yields `agent_started`, `delta` events as tokens arrive, then a `result`
+    event whose `data` is the same dict `answer_question` returns.
+    """
+    agent = _answering_agent()
+    if agent is None:
+        yield {"event": "result", "data": _degraded_answer(question)}
+        return
+
+    prompt = _build_support_prompt(question, context)
+
+    yield {"event": "agent_started", "agent": "SupportBot"}
+    parts = []
+    async for delta in stream_agent(agent, prompt, user_id=user_id):
+        parts.append(delta)
+        yield {"event": "delta", "agent": "SupportBot", "content": delta}
+
+    yield {
+        "event": "result",
+        "data": {
+            "answer": "".join(parts),
+            "sources_used": agent is support_agent and bool(knowledge),
+            "agent": "SupportBot",
+        },
+    }
+
+
+def _build_support_prompt(question: str, context: Optional[dict]) -> str:
+    """Prefix the question with trip/booking context when provided."""
+    if not context:
+        return question
+
+    context_parts = []
+    if context.get("trip_id"):
+        context_parts.append(f"Trip ID: {context['trip_id']}")
+    if context.get("booking_ref"):
+        context_parts.append(f"Booking Reference: {context['booking_ref']}")
+    if context.get("user_name"):
+        context_parts.append(f"Customer Name: {context['user_name']}")
+
+    if context_parts:
+        return f"Context: {', '.join(context_parts)}\n\nQuestion: {question}"
+    return question
+
+
 # Quick response patterns for common questions
 QUICK_RESPONSES = {
     "contact": {
@@ -145,10 +301,31 @@ QUICK_RESPONSES = {
 }
 
 
+# Used in degraded mode for questions without a quick response
+DEGRADED_RESPONSE = (
+    "Our assistant is still starting up and can only answer common questions right now. "
+    "Please try again in a minute, or reach GoBuddy Adventures support at "
+    "support@gobuddy.com or +1-800-GO-BUDDY (available 24/7)."
+)
+
+
+def _degraded_answer(question: str) -> dict:
+    """Answer without the LLM while the knowledge index is loading."""
+    quick = get_quick_response(question)
+    return {
+        "answer": quick or DEGRADED_RESPONSE,
+        "sources_used": False,
+        "agent": "SupportBot",
+        "quick_response": quick is not None,
+        "degraded": True,
+    }
+
+
 def get_quick_response(question: str) -> Optional[str]:
     """Check if question matches a quick response pattern."""
     question_lower = question.lower()
     for category, data in QUICK_RESPONSES.items():
         if any(keyword in question_lower for keyword in data["keywords"]):
+            QUICK_RESPONSE_HITS.labels(category).inc()
             return data["response"]
     return None
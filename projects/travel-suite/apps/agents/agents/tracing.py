@@ -0,0 +1,114 @@
+"""
+OpenTelemetry tracing for agent runs and request handling.
+Spans carry the current request id so one slow request can be broken down
+by stage (auth, rate limit, each agent, formatter). Exporters are chosen
+with TRACING_EXPORTER; tests attach the in-memory exporter.
+"""
+import os
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SimpleSpanProcessor,
+    SpanExporter,
+)
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import INVALID_SPAN, Span, Status, StatusCode
+
+logger = logging.getLogger("gobuddy.tracing")
+
+# none | console | otlp | memory
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "gobuddy-agents")
+
+# Set per request by the HTTP middleware; copied into tasks spawned while handling it
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+provider = TracerProvider(resource=Resource.create({"service.name": TRACING_SERVICE_NAME}))
+tracer = provider.get_tracer("gobuddy.agents")
+
+memory_exporter = InMemorySpanExporter()
+_memory_exporter_enabled = False
+# False until an exporter is attached; until then spans are not created at all
+_recording = False
+
+
+def recording() -> bool:
+    """Whether spans are recorded (an exporter is attached)."""
+    return _recording
+
+
+def _build_exporter(name: str) -> Optional[SpanExporter]:
+    if name == "console":
+        return ConsoleSpanExporter()
+    if name == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("TRACING_EXPORTER=otlp needs opentelemetry-exporter-otlp-proto-http; tracing disabled")
+            return None
+        return OTLPSpanExporter()
+    return None
+
+
+def enable_memory_exporter() -> InMemorySpanExporter:
+    """Export finished spans synchronously to `memory_exporter` (idempotent)."""
+    global _memory_exporter_enabled, _recording
+    if not _memory_exporter_enabled:
+        provider.add_span_processor(SimpleSpanProcessor(memory_exporter))
+        _memory_exporter_enabled = True
+        _recording = True
+    return memory_exporter
+
+
+if TRACING_EXPORTER == "memory":
+    enable_memory_exporter()
+else:
+    _exporter = _build_exporter(TRACING_EXPORTER)
+    if _exporter is not None:
+        provider.add_span_processor(BatchSpanProcessor(_exporter))
+        _recording = True
+
+
+def _start(name: str, attributes: Optional[dict]) -> Span:
+    attrs = {k: v for k, v in (attributes or {}).items() if v is not None}
+    request_id = request_id_var.get()
+    if request_id:
+        attrs["request.id"] = request_id
+    return tracer.start_span(name, attributes=attrs)
+
+
+@contextmanager
+def span(name: str, attributes: Optional[dict] = None, current: bool = True) -> Iterator[Span]:
+    """
+    Record the block as a span; exceptions mark it as an error and propagate.
+
+    Spans opened inside the block nest under it while `current` is true.
+    Pass `current=False` inside async generators: they can be resumed from a
+    different context than they started in, where re-attaching fails.
+    Without an exporter the block gets the no-op `INVALID_SPAN`, so the
+    per-request paths (auth, rate limit) pay nothing for tracing.
+    """
+    if not _recording:
+        yield INVALID_SPAN
+        return
+    s = _start(name, attributes)
+    try:
+        if current:
+            with trace.use_span(s, end_on_exit=False, record_exception=False, set_status_on_exception=False):
+                yield s
+        else:
+            yield s
+    except Exception as e:
+        s.record_exception(e)
+        s.set_status(Status(StatusCode.ERROR, type(e).__name__))
+        raise
+    finally:
+        s.end()
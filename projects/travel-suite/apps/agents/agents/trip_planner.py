@@ -2,14 +2,33 @@
 Trip Planner Multi-Agent Team
 Coordinates Researcher, Planner, and Budgeter agents for comprehensive trip planning.
 """
-from dataclasses import dataclass
+import os
+import json
+import math
+import time
+import calendar
+import asyncio
+import logging
+import unicodedata
+from dataclasses import dataclass, field
 from types import SimpleNamespace
-from typing import Optional
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Optional
 from pydantic import BaseModel, Field
 
-from agno.agent import Agent
-from agno.models.openai import OpenAIChat
-from agno.tools.duckduckgo import DuckDuckGoTools
+from agents.admission import AdmissionRejected
+from agents.cache import SingleFlightCache
+from agents.handoff import ContextHandoff, HandoffStats
+from agents.lazy import LazyAgent
+from agents.metrics import HANDOFF_TOKENS
+from agents.repair import DayStreamParser, ItineraryRepairError, parse_json_object, repair_day, repair_itinerary
+from agents.research import ANY_MONTH, ResearchEntry, research_cache
+from agents.runtime import run_agent, stream_agent
+from agents.tracing import span
+
+if TYPE_CHECKING:
+    from agno.agent import Agent
+
+logger = logging.getLogger("gobuddy.trip_planner")
 
 
 # Structured output models
@@ -48,6 +67,30 @@ class TripItinerary(BaseModel):
     local_tips: list[str] = Field(default_factory=list)
 
 
+class DayOutline(BaseModel):
+    """One day of a trip outline: what the day is about and where it is spent."""
+
+    day_number: int
+    theme: str
+    area: str = Field(default="", description="Neighbourhood or region the day is spent in")
+
+
+class TripOutline(BaseModel):
+    """Day-by-day skeleton shared by the chunks of a long structured plan."""
+
+    total_budget: Optional[float] = None
+    best_time_to_visit: str = ""
+    days: list[DayOutline]
+    packing_tips: list[str] = Field(default_factory=list)
+    local_tips: list[str] = Field(default_factory=list)
+
+
+TEAM_MODES = ("sequential", "parallel", "dag")
+
+# Member run outcomes
+OK, FAILED, SKIPPED = "ok", "failed", "skipped"
+
+
 @dataclass
 class TeamShim:
     """
@@ -55,93 +98,607 @@ class TeamShim:
 
     Newer Agno releases removed/relocated `agno.team.Team`. This shim keeps the
     existing interface (`team.arun(...)`) used across the codebase and tests.
+
+    Modes:
+        sequential: agents run one after another, each on the team prompt.
+        parallel:   all agents run concurrently on the team prompt.
+        dag:        agents run as soon as the agents named in `depends_on`
+                    finish, and get their outputs appended to the prompt;
+                    agents with no dependencies start together.
+
+    `arun` also returns each agent's own output in `outputs`, keyed by name.
+    The transcript always lists agents in declaration order. With a `handoff`,
+    dependents receive a token-budgeted extract of their inputs instead.
+
+    Deadlines: with a `latency_budget` (seconds), the budget is split evenly
+    across dependency levels and each member is cancelled at its level's
+    deadline; `agent_timeout` caps every member run on its own. Members that
+    run out of time are reported in `skipped_agents` and the rest of the team
+    carries on, so callers get a partial result instead of a stall.
     """
 
     name: str
-    agents: list[Agent]
+    agents: list["Agent"]
     instructions: list[str]
     mode: str = "sequential"
+    # Agent name -> names of the agents whose output it consumes ("dag" mode)
+    depends_on: dict[str, list[str]] = field(default_factory=dict)
+    # Trims upstream output to a token budget; None passes it through whole
+    handoff: Optional[ContextHandoff] = None
+    # Upper bound in seconds for any single member run; None for no limit
+    agent_timeout: Optional[float] = None
+
+    def __post_init__(self):
+        if self.mode not in TEAM_MODES:
+            raise ValueError(f"Unknown team mode {self.mode!r}; expected one of {TEAM_MODES}")
+        _check_acyclic(self.depends_on)
+
+    def _span_attributes(self, given: Optional[dict[str, str]] = None) -> dict:
+        return {
+            "team.name": self.name,
+            "team.mode": self.mode,
+            "team.agents": [agent.name for agent in self.agents],
+            "team.given_agents": sorted(given or ()),
+        }
+
+    def _dependencies(self) -> dict[str, list[str]]:
+        """
+        Members each agent waits for: the previous agent when sequential,
+        none when parallel, and `depends_on` for a DAG.
+        """
+        names = [agent.name for agent in self.agents]
+        if self.mode == "sequential":
+            return {name: names[i - 1:i] for i, name in enumerate(names)}
+        if self.mode == "parallel":
+            return {name: [] for name in names}
+        unknown = {dep for deps in self.depends_on.values() for dep in deps} - set(names)
+        if unknown:
+            raise ValueError(f"{self.name} depends on agents not in the team: {sorted(unknown)}")
+        return {name: list(self.depends_on.get(name, [])) for name in names}
+
+    def _deadlines(self, dependencies: dict[str, list[str]], latency_budget: Optional[float]) -> dict:
+        """Monotonic deadline per member: level N of L finishes by N/L of the budget."""
+        if latency_budget is None:
+            return dict.fromkeys(dependencies)
+        levels: dict[str, int] = {}
+
+        def level(name: str) -> int:
+            if name not in levels:
+                levels[name] = 1 + max((level(dep) for dep in dependencies[name]), default=-1)
+            return levels[name]
+
+        for name in dependencies:
+            level(name)
+        depth = max(levels.values(), default=0) + 1
+        started = time.monotonic()
+        return {name: started + latency_budget * (lvl + 1) / depth for name, lvl in levels.items()}
+
+    def _time_left(self, deadline: Optional[float]) -> Optional[float]:
+        limits = [self.agent_timeout] if self.agent_timeout is not None else []
+        if deadline is not None:
+            limits.append(deadline - time.monotonic())
+        return min(limits) if limits else None
 
-    async def arun(self, prompt: str):
-        transcript = []
-        for agent in self.agents:
+    def _member_prompt(
+        self, consumer: str, prompt: str, upstream: dict[str, tuple[str, str]], handoffs: list[HandoffStats]
+    ) -> str:
+        """The team prompt plus the output of every agent this member consumes (dag mode only)."""
+        if self.mode != "dag":
+            return prompt
+        outputs = {name: content for name, (content, status) in upstream.items() if status == OK}
+        if self.handoff is not None and outputs:
+            outputs, stats = self.handoff.select(consumer, prompt, outputs)
+            HANDOFF_TOKENS.labels(consumer, "original").inc(stats.original_tokens)
+            HANDOFF_TOKENS.labels(consumer, "passed").inc(stats.passed_tokens)
+            handoffs.append(stats)
+
+        sections = [prompt]
+        for name, (content, status) in upstream.items():
+            if status == OK:
+                sections.append(f"{name} output:\n{outputs[name]}")
+            else:
+                reason = "failed" if status == FAILED else "ran out of time"
+                sections.append(f"{name} output unavailable ({name} {reason}); work from the request alone.")
+        return "\n\n".join(sections)
+
+    def _log_handoffs(self, team_span, handoffs: list[HandoffStats]) -> None:
+        if not handoffs:
+            return
+        original = sum(stats.original_tokens for stats in handoffs)
+        passed = sum(stats.passed_tokens for stats in handoffs)
+        team_span.set_attribute("team.handoff_tokens_saved", original - passed)
+        logger.info(
+            "%s handoff passed %d of %d upstream tokens (saved %d)",
+            self.name, passed, original, original - passed,
+        )
+
+    def _finish(self, team_span, outcomes: list[tuple[str, str]], handoffs: list[HandoffStats]) -> dict:
+        """Transcript, per-member outputs and failed/skipped members, in declaration order."""
+        failed_agents = [agent.name for agent, (_, status) in zip(self.agents, outcomes) if status == FAILED]
+        skipped_agents = [agent.name for agent, (_, status) in zip(self.agents, outcomes) if status == SKIPPED]
+        team_span.set_attribute("team.failed_agents", failed_agents)
+        team_span.set_attribute("team.skipped_agents", skipped_agents)
+        self._log_handoffs(team_span, handoffs)
+        if skipped_agents:
+            logger.warning("%s ran out of time for %s; returning a partial result", self.name, skipped_agents)
+        return {
+            "content": "\n\n".join(
+                f"{agent.name}:\n{content}".strip() for agent, (content, _) in zip(self.agents, outcomes)
+            ),
+            "failed_agents": failed_agents,
+            "skipped_agents": skipped_agents,
+            "outputs": {agent.name: content for agent, (content, _) in zip(self.agents, outcomes)},
+        }
+
+    async def arun(
+        self,
+        prompt: str,
+        given: Optional[dict[str, str]] = None,
+        latency_budget: Optional[float] = None,
+        prompts: Optional[dict[str, str]] = None,
+    ):
+        """
+        Run the team on `prompt`.
+
+        `given` supplies outputs for members the caller already has (e.g. cached
+        research); those members are not run and their output is used as is.
+        `latency_budget` bounds the whole run in seconds (see class docstring).
+        `prompts` replaces the team prompt for the named members.
+        """
+        given = given or {}
+        prompts = prompts or {}
+        dependencies = self._dependencies()
+        deadlines = self._deadlines(dependencies, latency_budget)
+        tasks: dict[str, asyncio.Task] = {}
+        handoffs: list[HandoffStats] = []
+
+        async def run_member(agent) -> tuple[str, str]:
+            upstream = {dep: await tasks[dep] for dep in dependencies[agent.name]}
+            if agent.name in given:
+                return given[agent.name], OK
+            time_left = self._time_left(deadlines[agent.name])
+            if time_left is not None and time_left <= 0:
+                return f"{agent.name} skipped: out of time", SKIPPED
             try:
-                result = await agent.arun(prompt)
-                content = getattr(result, "content", "") if result is not None else ""
+                member_prompt = self._member_prompt(
+                    agent.name, prompts.get(agent.name, prompt), upstream, handoffs
+                )
+                result = await asyncio.wait_for(run_agent(agent, member_prompt), time_left)
+                return (getattr(result, "content", "") if result is not None else ""), OK
+            except asyncio.TimeoutError:
+                return f"{agent.name} skipped: out of time", SKIPPED
+            except AdmissionRejected:
+                # Overload is not an agent failure; shed the whole request
+                raise
             except Exception as exc:
-                content = f"{agent.name} error: {exc}"
-            transcript.append(f"{agent.name}:\n{content}".strip())
-
-        return SimpleNamespace(content="\n\n".join(transcript))
-
-
-# Researcher Agent - Gathers destination information
-researcher = Agent(
-    name="Researcher",
-    role="Research destinations, activities, and local information",
-    model=OpenAIChat(id="gpt-4o-mini"),
-    tools=[DuckDuckGoTools()],
-    instructions=[
-        "Find accurate, up-to-date destination information",
-        "Research local activities, restaurants, and attractions",
-        "Check weather patterns for the travel dates",
-        "Find unique local experiences and hidden gems",
-        "Research transportation options and logistics",
-        "Always cite sources when providing information",
-    ],
-    markdown=True,
-    show_tool_calls=True,
-)
+                return f"{agent.name} error: {exc}", FAILED
 
-# Planner Agent - Creates detailed itineraries
-planner = Agent(
-    name="Planner",
-    role="Create day-by-day itineraries with realistic timing",
-    model=OpenAIChat(id="gpt-4o"),
-    instructions=[
-        "Create realistic, well-paced itineraries",
-        "Consider travel times between locations",
-        "Balance activities with rest time",
-        "Include breakfast, lunch, and dinner recommendations",
-        "Group nearby activities to minimize travel",
-        "Consider opening hours and busy periods",
-        "Include both popular attractions and local favorites",
-    ],
-    markdown=True,
-)
+        with span("team.run", self._span_attributes(given)) as team_span:
+            for agent in self.agents:
+                tasks[agent.name] = asyncio.create_task(run_member(agent))
+            try:
+                outcomes = await asyncio.gather(*tasks.values())
+            except BaseException:
+                await _cancel(tasks.values())
+                raise
+            result = self._finish(team_span, outcomes, handoffs)
+
+        return SimpleNamespace(**result)
+
+    async def astream(
+        self,
+        prompt: str,
+        given: Optional[dict[str, str]] = None,
+        latency_budget: Optional[float] = None,
+        prompts: Optional[dict[str, str]] = None,
+    ) -> AsyncIterator[dict]:
+        """
+        Run the agents like `arun`, yielding events as they happen.
+
+        Emits `agent_started`, `delta` (token chunks), then `agent_completed`,
+        `agent_failed` or `agent_skipped` (out of time; any streamed text is
+        kept) per agent, then `team_completed` with the transcript and each
+        member's output. Members in `given` only report `agent_completed` with
+        `cached: true`. In parallel and dag modes, events from concurrent
+        agents interleave.
+        """
+        given = given or {}
+        prompts = prompts or {}
+        dependencies = self._dependencies()
+        deadlines = self._deadlines(dependencies, latency_budget)
+        events: asyncio.Queue = asyncio.Queue()
+        tasks: dict[str, asyncio.Task] = {}
+        handoffs: list[HandoffStats] = []
+
+        async def run_member(agent) -> tuple[str, str]:
+            try:
+                upstream = {dep: await tasks[dep] for dep in dependencies[agent.name]}
+                if agent.name in given:
+                    events.put_nowait({"event": "agent_completed", "agent": agent.name, "cached": True})
+                    return given[agent.name], OK
+                time_left = self._time_left(deadlines[agent.name])
+                if time_left is not None and time_left <= 0:
+                    events.put_nowait({"event": "agent_skipped", "agent": agent.name})
+                    return f"{agent.name} skipped: out of time", SKIPPED
+                events.put_nowait({"event": "agent_started", "agent": agent.name})
+                parts = []
+
+                async def consume() -> None:
+                    member_prompt = self._member_prompt(
+                        agent.name, prompts.get(agent.name, prompt), upstream, handoffs
+                    )
+                    async for delta in stream_agent(agent, member_prompt):
+                        parts.append(delta)
+                        events.put_nowait({"event": "delta", "agent": agent.name, "content": delta})
+
+                try:
+                    await asyncio.wait_for(consume(), time_left)
+                except asyncio.TimeoutError:
+                    events.put_nowait({"event": "agent_skipped", "agent": agent.name})
+                    return "".join(parts) or f"{agent.name} skipped: out of time", SKIPPED
+                except AdmissionRejected:
+                    raise
+                except Exception as exc:
+                    events.put_nowait({"event": "agent_failed", "agent": agent.name})
+                    return f"{agent.name} error: {exc}", FAILED
+                events.put_nowait({"event": "agent_completed", "agent": agent.name})
+                return "".join(parts), OK
+            except AdmissionRejected as exc:
+                events.put_nowait(exc)  # shed the whole request without waiting for the others
+                raise
+            finally:
+                events.put_nowait(None)  # one marker per member, however it ended
+
+        with span("team.run", {**self._span_attributes(given), "team.stream": True}, current=False) as team_span:
+            for agent in self.agents:
+                tasks[agent.name] = asyncio.create_task(run_member(agent))
+            try:
+                remaining = len(tasks)
+                while remaining:
+                    event = await events.get()
+                    if event is None:
+                        remaining -= 1
+                    elif isinstance(event, AdmissionRejected):
+                        raise event
+                    else:
+                        yield event
+                outcomes = [task.result() for task in tasks.values()]
+            finally:
+                await _cancel(tasks.values())
+            result = self._finish(team_span, outcomes, handoffs)
+
+        yield {"event": "team_completed", **result}
+
+
+def _check_acyclic(depends_on: dict[str, list[str]]) -> None:
+    """Reject dependency cycles up front; a cycle would deadlock the run."""
+    visiting, done = set(), set()
+
+    def visit(name: str, path: list[str]) -> None:
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Team dependency cycle: {' -> '.join(path + [name])}")
+        visiting.add(name)
+        for dep in depends_on.get(name, []):
+            visit(dep, path + [name])
+        visiting.discard(name)
+        done.add(name)
+
+    for name in depends_on:
+        visit(name, [])
+
+
+async def _cancel(tasks) -> None:
+    """Cancel unfinished member runs and wait for them to unwind."""
+    pending = [task for task in tasks if not task.done()]
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Agents are built on first use (or by the startup warm-up): constructing them
+# imports the OpenAI client and search tools, which dominates cold start.
+def build_researcher() -> "Agent":
+    """Researcher Agent - Gathers destination information"""
+    from agno.agent import Agent
+    from agno.models.openai import OpenAIChat
+    from agno.tools.duckduckgo import DuckDuckGoTools
+
+    return Agent(
+        name="Researcher",
+        role="Research destinations, activities, and local information",
+        model=OpenAIChat(id="gpt-4o-mini"),
+        tools=[DuckDuckGoTools()],
+        instructions=[
+            "Find accurate, up-to-date destination information",
+            "Research local activities, restaurants, and attractions",
+            "Check weather patterns for the travel dates",
+            "Find unique local experiences and hidden gems",
+            "Research transportation options and logistics",
+            "Always cite sources when providing information",
+        ],
+        markdown=True,
+        # Prompts carry user text and upstream output; braces in them are not templates
+        format_state_in_messages=False,
+        show_tool_calls=True,
+    )
+
+
+PLANNER_INSTRUCTIONS = [
+    "Create realistic, well-paced itineraries",
+    "Consider travel times between locations",
+    "Balance activities with rest time",
+    "Include breakfast, lunch, and dinner recommendations",
+    "Group nearby activities to minimize travel",
+    "Consider opening hours and busy periods",
+    "Include both popular attractions and local favorites",
+]
+
+
+def build_planner() -> "Agent":
+    """Planner Agent - Creates detailed itineraries"""
+    from agno.agent import Agent
+    from agno.models.openai import OpenAIChat
+
+    return Agent(
+        name="Planner",
+        role="Create day-by-day itineraries with realistic timing",
+        model=OpenAIChat(id="gpt-4o"),
+        instructions=PLANNER_INSTRUCTIONS,
+        markdown=True,
+        format_state_in_messages=False,
+    )
 
-# Budgeter Agent - Optimizes costs
-budgeter = Agent(
-    name="Budgeter",
-    role="Optimize trip costs and find deals",
-    model=OpenAIChat(id="gpt-4o-mini"),
-    instructions=[
-        "Estimate realistic costs for all activities",
-        "Find budget-friendly alternatives when possible",
-        "Calculate transportation costs between locations",
-        "Include accommodation cost estimates",
-        "Track total trip budget and breakdown",
-        "Suggest money-saving tips for the destination",
-        "Consider local currency and exchange rates",
-    ],
-    markdown=True,
-)
 
+def build_budgeter() -> "Agent":
+    """Budgeter Agent - Optimizes costs"""
+    from agno.agent import Agent
+    from agno.models.openai import OpenAIChat
 
-# Create the Trip Planner Team
-trip_planner_team = TeamShim(
-    name="TripPlannerTeam",
-    agents=[researcher, planner, budgeter],
-    instructions=[
-        "Work together to create comprehensive trip plans",
-        "Researcher goes first to gather destination information",
-        "Planner uses research to create the itinerary",
-        "Budgeter optimizes costs and adds financial details",
-        "Always provide actionable, practical recommendations",
-        "Consider the user's preferences, budget, and travel style",
-    ],
-    mode="sequential",  # Agents work in order
+    return Agent(
+        name="Budgeter",
+        role="Optimize trip costs and find deals",
+        model=OpenAIChat(id="gpt-4o-mini"),
+        instructions=[
+            "Estimate realistic costs for all activities",
+            "Find budget-friendly alternatives when possible",
+            "Calculate transportation costs between locations",
+            "Include accommodation cost estimates",
+            "Track total trip budget and breakdown",
+            "Suggest money-saving tips for the destination",
+            "Consider local currency and exchange rates",
+        ],
+        markdown=True,
+        format_state_in_messages=False,
+    )
+
+
+def build_structured_planner() -> "Agent":
+    """Planner Agent that writes the `TripItinerary` JSON itself (single-pass structured plans)"""
+    from agno.agent import Agent
+    from agno.models.openai import OpenAIChat
+
+    schema = json.dumps(TripItinerary.model_json_schema(), separators=(",", ":"))
+    return Agent(
+        name="Planner",
+        role="Create day-by-day itineraries with realistic timing",
+        # JSON mode rather than response_model: the reply is validated and repaired locally
+        model=OpenAIChat(id="gpt-4o", response_format={"type": "json_object"}),
+        instructions=[
+            *PLANNER_INSTRUCTIONS,
+            "Use the research and cost estimates you are given for activities and cost_estimate values",
+            "Number the days from 1 and include exactly the number of days requested",
+            f"Reply with one JSON object matching this TripItinerary JSON schema: {schema}",
+        ],
+        format_state_in_messages=False,
+    )
+
+
+def build_outline_planner() -> "Agent":
+    """Planner Agent that sketches long trips day by day before they are written in chunks"""
+    from agno.agent import Agent
+    from agno.models.openai import OpenAIChat
+
+    schema = json.dumps(TripOutline.model_json_schema(), separators=(",", ":"))
+    return Agent(
+        name="Planner",
+        role="Outline multi-day trips so every day has a distinct focus",
+        model=OpenAIChat(id="gpt-4o", response_format={"type": "json_object"}),
+        instructions=[
+            "Give every day a theme and the area it is spent in; do not list individual activities",
+            "Group nearby sights on the same day and do not repeat a theme",
+            "Use the research and cost estimates you are given for the total budget and tips",
+            "Number the days from 1 and include exactly the number of days requested",
+            f"Reply with one JSON object matching this TripOutline JSON schema: {schema}",
+        ],
+        format_state_in_messages=False,
+    )
+
+
+# "dag" runs Researcher and Budgeter together and hands both to the Planner:
+# two model round trips instead of three. "sequential" restores the old order.
+TRIP_TEAM_MODE = os.getenv("TRIP_TEAM_MODE", "dag")
+# Cap on any single agent run in the trip team, in seconds
+TRIP_AGENT_TIMEOUT_SECONDS = float(os.getenv("TRIP_AGENT_TIMEOUT_SECONDS", "120"))
+# Default latency budget for plan_trip in seconds (unset: only the per-agent cap applies)
+TRIP_LATENCY_BUDGET_SECONDS = float(os.getenv("TRIP_LATENCY_BUDGET_SECONDS") or 0) or None
+
+
+# Keyword prefixes for what each downstream agent needs from its inputs
+TRIP_HANDOFF_FOCUS = {
+    "Planner": (
+        "activit", "attraction", "visit", "tour", "museum", "temple", "beach", "park", "market",
+        "restaurant", "food", "cafe", "eat", "open", "hour", "close", "morning", "afternoon",
+        "evening", "night", "walk", "transport", "train", "bus", "taxi", "ferry", "metro",
+        "minute", "distance", "area", "district", "neighbo", "weather", "season", "rain",
+        "crowd", "book", "reserv", "festival", "hidden",
+    ),
+    "Budgeter": (
+        "$", "€", "£", "¥", "usd", "cost", "price", "fee", "ticket", "entry", "admission",
+        "budget", "cheap", "free", "afford", "expens", "hotel", "hostel", "accommodation",
+        "stay", "night", "transport", "taxi", "train", "bus", "currency", "exchange", "tip",
+    ),
+}
+
+
+def build_trip_planner_team(name: str = "TripPlannerTeam", team_planner: Optional["Agent"] = None) -> TeamShim:
+    """Create the Trip Planner Team"""
+    return TeamShim(
+        name=name,
+        # Lazy handles, so each team run leases its own copy of every agent
+        agents=[researcher, team_planner or planner, budgeter],
+        instructions=[
+            "Work together to create comprehensive trip plans",
+            "Researcher gathers destination information",
+            "Budgeter estimates costs and adds financial details",
+            "Planner uses the research and cost estimates to create the itinerary",
+            "Always provide actionable, practical recommendations",
+            "Consider the user's preferences, budget, and travel style",
+        ],
+        mode=TRIP_TEAM_MODE,
+        depends_on={"Planner": ["Researcher", "Budgeter"]},
+        handoff=ContextHandoff(focus=TRIP_HANDOFF_FOCUS),
+        agent_timeout=TRIP_AGENT_TIMEOUT_SECONDS,
+    )
+
+
+researcher = LazyAgent("researcher", build_researcher)
+planner = LazyAgent("planner", build_planner)
+budgeter = LazyAgent("budgeter", build_budgeter)
+trip_planner_team = LazyAgent("trip_planner_team", build_trip_planner_team)
+structured_planner = LazyAgent("structured_planner", build_structured_planner)
+structured_trip_team = LazyAgent(
+    "structured_trip_team",
+    lambda: build_trip_planner_team("StructuredTripPlannerTeam", structured_planner),
 )
+outline_planner = LazyAgent("outline_planner", build_outline_planner)
+outline_trip_team = LazyAgent(
+    "outline_trip_team",
+    lambda: build_trip_planner_team("OutlineTripPlannerTeam", outline_planner),
+)
+
+
+# Team results for near-identical requests are shared across users.
+PLAN_CACHE_TTL_SECONDS = float(os.getenv("PLAN_CACHE_TTL_SECONDS", "21600"))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "500"))
+# Budgets within the same geometric band (default 25% wide) share a cached plan.
+PLAN_CACHE_BUDGET_BAND = float(os.getenv("PLAN_CACHE_BUDGET_BAND", "1.25"))
+
+plan_cache = SingleFlightCache(max_entries=PLAN_CACHE_MAX_ENTRIES, ttl_seconds=PLAN_CACHE_TTL_SECONDS)
+
+
+def canonical_destination(destination: str) -> str:
+    """
+    Canonicalize a destination for cache keys.
+
+    Strips accents, case, punctuation and extra whitespace, so
+    "  Bali,  Indonésia " and "bali, indonesia" match.
+    """
+    text = unicodedata.normalize("NFKD", destination)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    parts = []
+    for part in text.split(","):
+        words = "".join(c if c.isalnum() else " " for c in part).split()
+        if words:
+            parts.append(" ".join(words))
+    return ", ".join(parts)
+
+
+def budget_bucket(budget: Optional[float]) -> Optional[int]:
+    """Map a budget to its geometric band index (None for flexible budgets)."""
+    if not budget or budget <= 0:
+        return None
+    return round(math.log(budget) / math.log(PLAN_CACHE_BUDGET_BAND))
+
+
+def normalize_trip_request(
+    destination: str,
+    duration_days: int,
+    budget: Optional[float],
+    interests: Optional[list[str]],
+    travel_style: str,
+    travel_month: Optional[int] = None,
+) -> tuple:
+    """Cache key for a trip request: requests that map to the same key share a plan."""
+    return (
+        canonical_destination(destination),
+        duration_days,
+        budget_bucket(budget),
+        tuple(sorted({i.strip().lower() for i in interests or [] if i.strip()})),
+        travel_style.strip().lower(),
+        travel_month or ANY_MONTH,
+    )
+
+
+def invalidate_plans(destination: str, travel_month: Optional[int] = None) -> int:
+    """
+    Drop cached plans (text and structured) for a destination, e.g. after its
+    research is refreshed. With `travel_month`, only plans for that month go.
+    Returns the number of plans dropped.
+    """
+    target = canonical_destination(destination)
+
+    def matches(key) -> bool:
+        # Structured keys are the normalized request prefixed with "structured"
+        request = key[1:] if key[0] == "structured" else key
+        return request[0] == target and (travel_month is None or request[-1] == travel_month)
+
+    return plan_cache.evict(matches)
+
+
+def _is_complete(response) -> bool:
+    """Only cache team runs where every agent succeeded in time."""
+    return getattr(response, "failed_agents", None) == [] and not getattr(response, "skipped_agents", None)
+
+
+async def _cached_research(
+    destination: str, travel_month: Optional[int], refresh: bool
+) -> Optional[ResearchEntry]:
+    """Shared research for the destination and month, unless the caller wants it refreshed."""
+    if refresh:
+        return None
+    return await research_cache.get(canonical_destination(destination), travel_month or ANY_MONTH)
+
+
+async def _store_research(
+    destination: str,
+    travel_month: Optional[int],
+    research: Optional[ResearchEntry],
+    outputs: Optional[dict],
+    failed_agents,
+    skipped_agents,
+) -> Optional[dict]:
+    """Save the Researcher's fresh output, and describe the research behind this plan."""
+    if research is not None:
+        return {"cached": True, "age_seconds": research.age_seconds()}
+    content = (outputs or {}).get("Researcher")
+    # A failed or out-of-time Researcher leaves an error note or partial text, not research
+    if "Researcher" in failed_agents or "Researcher" in (skipped_agents or []):
+        return None
+    if not isinstance(content, str) or not content.strip():
+        return None
+    await research_cache.put(canonical_destination(destination), travel_month or ANY_MONTH, content)
+    return {"cached": False, "age_seconds": 0}
+
+
+def _research_prompts(destination: str, travel_month: Optional[int]) -> dict[str, str]:
+    """
+    The Researcher's prompt: destination and month only, like the research
+    cache key, so shared research carries nothing from one user's request.
+    """
+    when = f" in {calendar.month_name[travel_month]}" if travel_month else ""
+    return {
+        "Researcher": (
+            f"Research {destination} for travellers visiting{when}: attractions, local "
+            "activities, food, weather, transportation and practical tips."
+        )
+    }
+
+
+def _given(research: Optional[ResearchEntry]) -> Optional[dict[str, str]]:
+    # A research hit skips the Researcher stage entirely
+    return {"Researcher": research.content} if research is not None else None
 
 
 async def plan_trip(
@@ -151,6 +708,9 @@ async def plan_trip(
     interests: Optional[list[str]] = None,
     travel_style: str = "balanced",
     user_id: Optional[str] = None,
+    travel_month: Optional[int] = None,
+    refresh_research: bool = False,
+    latency_budget: Optional[float] = None,
 ) -> dict:
     """
     Plan a trip using the multi-agent team.
@@ -162,15 +722,130 @@ async def plan_trip(
         interests: List of interests (e.g., ['food', 'history', 'adventure'])
         travel_style: One of 'budget', 'balanced', 'luxury'
         user_id: Optional user ID for personalization
+        travel_month: Optional month of travel (1-12)
+        refresh_research: Ignore cached destination research (and cached plans) and research again
+        latency_budget: Seconds to answer within; stages that do not fit are
+            skipped and listed in `skipped_stages` of a partial plan
 
     Returns:
         Complete trip plan with itinerary
     """
-    # Build the prompt
+    prompt = _build_trip_prompt(destination, duration_days, budget, interests, travel_style, travel_month)
+    key = normalize_trip_request(destination, duration_days, budget, interests, travel_style, travel_month)
+    latency_budget = latency_budget or TRIP_LATENCY_BUDGET_SECONDS
+    deadline = time.monotonic() + latency_budget if latency_budget else None
+
+    async def compute():
+        research = await _cached_research(destination, travel_month, refresh_research)
+        response = await trip_planner_team.arun(
+            prompt, given=_given(research), latency_budget=_remaining(deadline),
+            prompts=_research_prompts(destination, travel_month),
+        )
+        skipped_agents = list(getattr(response, "skipped_agents", None) or [])
+        return SimpleNamespace(
+            content=response.content,
+            failed_agents=response.failed_agents,
+            skipped_agents=skipped_agents,
+            research=await _store_research(
+                destination, travel_month, research,
+                getattr(response, "outputs", None), response.failed_agents, skipped_agents,
+            ),
+        )
+
+    if refresh_research or deadline is not None:
+        # A bounded request must not wait on someone else's unbounded in-flight run
+        response = None if refresh_research else plan_cache.get(key)
+        if response is None:
+            response = await compute()
+            if _is_complete(response):
+                plan_cache.set(key, response)
+    else:
+        # Run the team (or share a cached / in-flight run for the same normalized request)
+        response = await plan_cache.get_or_compute(key, compute, cacheable=_is_complete)
+
+    return _trip_plan_result(
+        destination, duration_days, budget, travel_style, response.content, response.research,
+        response.skipped_agents,
+    )
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return max(0.0, deadline - time.monotonic()) if deadline is not None else None
+
+
+async def stream_trip_plan(
+    destination: str,
+    duration_days: int,
+    budget: Optional[float] = None,
+    interests: Optional[list[str]] = None,
+    travel_style: str = "balanced",
+    user_id: Optional[str] = None,
+    travel_month: Optional[int] = None,
+    refresh_research: bool = False,
+    latency_budget: Optional[float] = None,
+) -> AsyncIterator[dict]:
+    """
+    Streaming variant of `plan_trip`.
+
+    Yields the team's progress and token events, then a `result` event whose
+    `data` is the same dict `plan_trip` returns.
+    """
+    prompt = _build_trip_prompt(destination, duration_days, budget, interests, travel_style, travel_month)
+    key = normalize_trip_request(destination, duration_days, budget, interests, travel_style, travel_month)
+    latency_budget = latency_budget or TRIP_LATENCY_BUDGET_SECONDS
+    deadline = time.monotonic() + latency_budget if latency_budget else None
+
+    cached = None if refresh_research else plan_cache.get(key)
+    if cached is not None:
+        yield {
+            "event": "result",
+            "data": _trip_plan_result(
+                destination, duration_days, budget, travel_style, cached.content,
+                getattr(cached, "research", None),
+            ),
+        }
+        return
+
+    research = await _cached_research(destination, travel_month, refresh_research)
+    events = trip_planner_team.astream(
+        prompt, given=_given(research), latency_budget=_remaining(deadline),
+        prompts=_research_prompts(destination, travel_month),
+    )
+    async for event in events:
+        if event["event"] == "team_completed":
+            skipped = event.get("skipped_agents", [])
+            research_info = await _store_research(
+                destination, travel_month, research, event.get("outputs"), event["failed_agents"], skipped
+            )
+            if not event["failed_agents"] and not skipped:
+                plan_cache.set(key, SimpleNamespace(
+                    content=event["content"], failed_agents=[], skipped_agents=[], research=research_info
+                ))
+            yield {
+                "event": "result",
+                "data": _trip_plan_result(
+                    destination, duration_days, budget, travel_style, event["content"], research_info, skipped
+                ),
+            }
+        else:
+            yield event
+
+
+def _build_trip_prompt(
+    destination: str,
+    duration_days: int,
+    budget: Optional[float],
+    interests: Optional[list[str]],
+    travel_style: str,
+    travel_month: Optional[int] = None,
+) -> str:
     prompt_parts = [
         f"Plan a {duration_days}-day trip to {destination}.",
     ]
 
+    if travel_month:
+        prompt_parts.append(f"Travelling in {calendar.month_name[travel_month]}.")
+
     if budget:
         prompt_parts.append(f"Budget: ${budget} USD total.")
 
@@ -183,21 +858,59 @@ async def plan_trip(
         "timings, cost estimates, and local tips."
     )
 
-    prompt = " ".join(prompt_parts)
+    return " ".join(prompt_parts)
 
-    # Run the team
-    response = await trip_planner_team.arun(prompt)
 
+def _trip_plan_result(
+    destination: str,
+    duration_days: int,
+    budget: Optional[float],
+    travel_style: str,
+    plan: str,
+    research: Optional[dict] = None,
+    skipped_stages: Optional[list[str]] = None,
+) -> dict:
     return {
         "destination": destination,
         "duration_days": duration_days,
         "budget": budget,
         "travel_style": travel_style,
-        "plan": response.content,
+        "plan": plan,
         "agents_used": ["Researcher", "Planner", "Budgeter"],
+        # {"cached": bool, "age_seconds": int} for the research behind the plan, if known
+        "research": research,
+        # Stages cut for the latency budget; the plan is partial when non-empty
+        "skipped_stages": skipped_stages or [],
+        "partial": bool(skipped_stages),
     }
 
 
+def build_trip_formatter() -> "Agent":
+    from agno.agent import Agent
+    from agno.models.openai import OpenAIChat
+
+    return Agent(
+        name="TripFormatter",
+        model=OpenAIChat(id="gpt-4o"),
+        response_model=TripItinerary,
+        instructions=[
+            "Format the trip plan into a structured itinerary",
+            "Include all days with detailed activities",
+            "Ensure cost estimates are realistic",
+        ],
+    )
+
+
+# "single_pass" has the team's Planner write the TripItinerary JSON directly;
+# "formatter" re-expresses the team's text plan with an extra TripFormatter call.
+STRUCTURED_PLAN_MODE = os.getenv("STRUCTURED_PLAN_MODE", "single_pass")
+# Model re-asks allowed when the Planner's JSON cannot be repaired locally
+STRUCTURED_PLAN_MAX_REASKS = int(os.getenv("STRUCTURED_PLAN_MAX_REASKS", "1"))
+# Single-pass plans longer than this are outlined first, then written in day
+# ranges of at most this many days concurrently and merged; 0 disables chunking
+STRUCTURED_PLAN_CHUNK_DAYS = int(os.getenv("STRUCTURED_PLAN_CHUNK_DAYS", "5"))
+
+
 # Structured output version for API
 async def plan_trip_structured(
     destination: str,
@@ -205,30 +918,362 @@ async def plan_trip_structured(
     budget: Optional[float] = None,
     interests: Optional[list[str]] = None,
     travel_style: str = "balanced",
+    travel_month: Optional[int] = None,
+    refresh_research: bool = False,
 ) -> TripItinerary:
     """
     Plan a trip and return structured output.
     """
-    # Create a single agent with structured output for final formatting
-    formatter = Agent(
-        name="TripFormatter",
-        model=OpenAIChat(id="gpt-4o"),
-        response_model=TripItinerary,
-        instructions=[
-            "Format the trip plan into a structured itinerary",
-            "Include all days with detailed activities",
-            "Ensure cost estimates are realistic",
-        ],
+    if STRUCTURED_PLAN_MODE == "formatter":
+        return await _plan_trip_formatted(
+            destination, duration_days, budget, interests, travel_style, travel_month, refresh_research
+        )
+
+    prompt = _build_trip_prompt(destination, duration_days, budget, interests, travel_style, travel_month)
+    key = (
+        "structured",
+        *normalize_trip_request(destination, duration_days, budget, interests, travel_style, travel_month),
     )
 
-    # First get the detailed plan from the team
-    team_result = await plan_trip(
-        destination=destination,
+    # Long trips: one outline, then day ranges written concurrently
+    chunked = 0 < STRUCTURED_PLAN_CHUNK_DAYS < duration_days
+
+    async def compute():
+        attributes = {"trip.duration_days": duration_days, "trip.structured": "chunked" if chunked else "single_pass"}
+        with span("trip.plan", attributes):
+            research = await _cached_research(destination, travel_month, refresh_research)
+            team = outline_trip_team if chunked else structured_trip_team
+            response = await team.arun(
+                prompt, given=_given(research), prompts=_research_prompts(destination, travel_month)
+            )
+            await _store_research(
+                destination, travel_month, research,
+                response.outputs, response.failed_agents, response.skipped_agents,
+            )
+            if chunked:
+                itinerary = await _chunked_itinerary(response, prompt, destination, duration_days, budget)
+            else:
+                itinerary = await _validated_itinerary(
+                    response.outputs.get("Planner", ""), prompt, destination, duration_days, budget
+                )
+        return SimpleNamespace(
+            content=itinerary, failed_agents=response.failed_agents, skipped_agents=response.skipped_agents
+        )
+
+    if refresh_research:
+        response = await compute()
+        if _is_complete(response):
+            plan_cache.set(key, response)
+    else:
+        response = await plan_cache.get_or_compute(key, compute, cacheable=_is_complete)
+    return response.content
+
+
+async def _validated_itinerary(
+    reply,
+    prompt: str,
+    destination: str,
+    duration_days: int,
+    budget: Optional[float],
+) -> TripItinerary:
+    """Validate the Planner's JSON, repairing it locally and re-asking only on hard failures."""
+    for attempt in range(STRUCTURED_PLAN_MAX_REASKS + 1):
+        try:
+            data, fixes = repair_itinerary(parse_json_object(reply), destination, duration_days, budget)
+            itinerary = TripItinerary.model_validate(data)
+        except ValueError as exc:
+            # ItineraryRepairError and pydantic's ValidationError alike
+            if attempt == STRUCTURED_PLAN_MAX_REASKS:
+                raise ItineraryRepairError(f"Planner did not produce a valid itinerary: {exc}") from exc
+            logger.warning("Re-asking the Planner for a valid itinerary: %s", exc)
+            response = await run_agent(structured_planner, _reask_prompt(prompt, reply, exc))
+            reply = getattr(response, "content", "") if response is not None else ""
+            continue
+        if fixes:
+            logger.info("Repaired itinerary fields locally: %s", ", ".join(fixes))
+        return itinerary
+
+
+def day_ranges(duration_days: int, chunk_days: int) -> list[tuple[int, int]]:
+    """Split days 1..n into as few ranges of at most `chunk_days` as possible, evenly sized."""
+    count = math.ceil(duration_days / chunk_days)
+    size, longer = divmod(duration_days, count)
+    ranges = []
+    first = 1
+    for index in range(count):
+        last = first + size - (0 if index < longer else 1)
+        ranges.append((first, last))
+        first = last + 1
+    return ranges
+
+
+def _parse_outline(reply) -> Optional[TripOutline]:
+    try:
+        return TripOutline.model_validate(parse_json_object(reply))
+    except ValueError as exc:
+        # The chunks can still be written from the request and research alone
+        logger.warning("Writing itinerary chunks without an outline: %s", exc)
+        return None
+
+
+def _chunk_prompt(
+    prompt: str,
+    context: dict[str, str],
+    outline: Optional[TripOutline],
+    duration_days: int,
+    first: int,
+    last: int,
+) -> str:
+    sections = [prompt]
+    sections.extend(f"{name} output:\n{content}" for name, content in context.items())
+    if outline is not None and outline.days:
+        sections.append("Trip outline:\n" + "\n".join(
+            f"Day {day.day_number}: {day.theme}" + (f" ({day.area})" if day.area else "")
+            for day in outline.days
+        ))
+    count = last - first + 1
+    sections.append(
+        f"Write only days {first} to {last} of this {duration_days}-day trip, following the outline "
+        f"and not repeating activities that belong to other days. Reply with a TripItinerary of "
+        f"{count} days numbered 1 to {count} (day 1 is trip day {first})."
+    )
+    return "\n\n".join(sections)
+
+
+async def _chunked_itinerary(
+    response,
+    prompt: str,
+    destination: str,
+    duration_days: int,
+    budget: Optional[float],
+    on_day: Optional[Callable[[DayPlan], None]] = None,
+) -> TripItinerary:
+    """
+    Write a long trip in day ranges concurrently from the team's outline, then merge them.
+
+    With `on_day`, the ranges are streamed and each day is reported (numbered
+    in trip order) as soon as its JSON is complete.
+    """
+    outline = _parse_outline(response.outputs.get("Planner", ""))
+    unavailable = set(response.failed_agents) | set(getattr(response, "skipped_agents", []))
+    upstream = {
+        name: response.outputs[name]
+        for name in ("Researcher", "Budgeter")
+        if response.outputs.get(name) and name not in unavailable
+    }
+    # Every chunk gets the same trimmed research and cost estimates
+    context, _ = ContextHandoff(focus=TRIP_HANDOFF_FOCUS).select("Planner", prompt, upstream)
+    ranges = day_ranges(duration_days, STRUCTURED_PLAN_CHUNK_DAYS)
+
+    async def write(first: int, last: int) -> TripItinerary:
+        chunk_prompt = _chunk_prompt(prompt, context, outline, duration_days, first, last)
+        if on_day is None:
+            result = await run_agent(structured_planner, chunk_prompt)
+            reply = getattr(result, "content", "") if result is not None else ""
+        else:
+            days = DayPlanStream(last - first + 1)
+            parts = []
+            async for delta in stream_agent(structured_planner, chunk_prompt):
+                parts.append(delta)
+                for day in days.feed(delta):
+                    on_day(day.model_copy(update={"day_number": first + day.day_number - 1}))
+            reply = "".join(parts)
+        return await _validated_itinerary(reply, chunk_prompt, destination, last - first + 1, budget)
+
+    with span("trip.plan.chunks", {"trip.chunks": len(ranges)}):
+        tasks = [asyncio.ensure_future(write(first, last)) for first, last in ranges]
+        try:
+            chunks = await asyncio.gather(*tasks)
+        except BaseException:
+            await _cancel(tasks)
+            raise
+    return merge_itinerary_chunks(chunks, ranges, outline, destination, duration_days, budget)
+
+
+def merge_itinerary_chunks(
+    chunks: list[TripItinerary],
+    ranges: list[tuple[int, int]],
+    outline: Optional[TripOutline],
+    destination: str,
+    duration_days: int,
+    budget: Optional[float],
+) -> TripItinerary:
+    """One itinerary from per-range chunks: days renumbered in trip order, trip-wide fields from the outline."""
+    days = [
+        day.model_copy(update={"day_number": first + offset})
+        for chunk, (first, _) in zip(chunks, ranges)
+        for offset, day in enumerate(chunk.days)
+    ]
+    if outline is not None and outline.total_budget:
+        total = outline.total_budget
+    else:
+        total = budget or sum(activity.cost_estimate for day in days for activity in day.activities)
+
+    def tips(field: str) -> list[str]:
+        if outline is not None and getattr(outline, field):
+            return getattr(outline, field)
+        # Chunks tend to repeat the same trip-wide tips
+        return list(dict.fromkeys(tip for chunk in chunks for tip in getattr(chunk, field)))
+
+    return TripItinerary(
+        destination=chunks[0].destination or destination,
         duration_days=duration_days,
-        budget=budget,
-        interests=interests,
-        travel_style=travel_style,
+        total_budget=total,
+        currency=chunks[0].currency,
+        best_time_to_visit=(outline.best_time_to_visit if outline else "") or chunks[0].best_time_to_visit,
+        days=days,
+        packing_tips=tips("packing_tips"),
+        local_tips=tips("local_tips"),
+    )
+
+
+class DayPlanStream:
+    """
+    Validated `DayPlan`s from a Planner's streamed TripItinerary JSON.
+
+    `feed` takes the reply piece by piece and returns the days whose JSON
+    completed in that piece, repaired and numbered by position. Days past
+    `duration_days`, or that fail validation, are left to the final itinerary.
+    """
+
+    def __init__(self, duration_days: int):
+        self.duration_days = duration_days
+        self._parser = DayStreamParser()
+        self._seen = 0
+
+    def feed(self, delta: str) -> list[DayPlan]:
+        days = []
+        for raw in self._parser.feed(delta):
+            self._seen += 1
+            if self._seen > self.duration_days:
+                break
+            try:
+                days.append(DayPlan.model_validate(repair_day(raw, self._seen, [])))
+            except ValueError as exc:
+                logger.debug("Not streaming day %d: %s", self._seen, exc)
+        return days
+
+
+def _day_event(day: DayPlan) -> dict:
+    return {"event": "day", "data": day.model_dump()}
+
+
+async def stream_trip_plan_structured(
+    destination: str,
+    duration_days: int,
+    budget: Optional[float] = None,
+    interests: Optional[list[str]] = None,
+    travel_style: str = "balanced",
+    travel_month: Optional[int] = None,
+    refresh_research: bool = False,
+) -> AsyncIterator[dict]:
+    """
+    Streaming variant of `plan_trip_structured`.
+
+    Yields the team's progress events, a `day` event with each validated
+    `DayPlan` as soon as its JSON is complete in the Planner's output, then a
+    `result` event whose `data` is the full `TripItinerary`. Long (chunked)
+    trips write their day ranges concurrently, so their days can arrive out
+    of order; `day_number` is always the day of the trip. The result is
+    authoritative: a day changed by the final validation replaces the
+    streamed one. Token deltas are not forwarded, since they are raw JSON.
+    """
+    key = (
+        "structured",
+        *normalize_trip_request(destination, duration_days, budget, interests, travel_style, travel_month),
     )
+    # One lookup per request, so the hit rate counts each streamed plan once
+    cached = None if refresh_research or STRUCTURED_PLAN_MODE == "formatter" else plan_cache.get(key)
+    if STRUCTURED_PLAN_MODE == "formatter" or cached is not None:
+        # Nothing to stream incrementally; a cached plan is sent as day events at once
+        itinerary = cached.content if cached is not None else await plan_trip_structured(
+            destination, duration_days, budget, interests, travel_style, travel_month, refresh_research
+        )
+        for day in itinerary.days:
+            yield _day_event(day)
+        yield {"event": "result", "data": itinerary.model_dump()}
+        return
+
+    prompt = _build_trip_prompt(destination, duration_days, budget, interests, travel_style, travel_month)
+    chunked = 0 < STRUCTURED_PLAN_CHUNK_DAYS < duration_days
+    research = await _cached_research(destination, travel_month, refresh_research)
+    team = outline_trip_team if chunked else structured_trip_team
+    days = DayPlanStream(duration_days)
+    response = None
+    research_prompts = _research_prompts(destination, travel_month)
+    async for event in team.astream(prompt, given=_given(research), prompts=research_prompts):
+        if event["event"] == "team_completed":
+            response = SimpleNamespace(**{name: value for name, value in event.items() if name != "event"})
+        elif event["event"] == "delta":
+            if not chunked and event["agent"] == "Planner":
+                for day in days.feed(event["content"]):
+                    yield _day_event(day)
+        else:
+            yield event
+    await _store_research(
+        destination, travel_month, research, response.outputs, response.failed_agents, response.skipped_agents
+    )
+
+    if chunked:
+        found: asyncio.Queue = asyncio.Queue()
+        writing = asyncio.ensure_future(
+            _chunked_itinerary(response, prompt, destination, duration_days, budget, on_day=found.put_nowait)
+        )
+        tasks = [writing]
+        try:
+            while not writing.done() or not found.empty():
+                waiting = asyncio.ensure_future(found.get())
+                tasks.append(waiting)
+                await asyncio.wait({waiting, writing}, return_when=asyncio.FIRST_COMPLETED)
+                tasks.pop()
+                if waiting.done():
+                    yield _day_event(waiting.result())
+                else:
+                    waiting.cancel()
+            itinerary = writing.result()
+        finally:
+            await _cancel(tasks)
+    else:
+        itinerary = await _validated_itinerary(
+            response.outputs.get("Planner", ""), prompt, destination, duration_days, budget
+        )
+
+    if _is_complete(response):
+        plan_cache.set(key, SimpleNamespace(content=itinerary, failed_agents=[], skipped_agents=[]))
+    yield {"event": "result", "data": itinerary.model_dump()}
+
+
+def _reask_prompt(prompt: str, reply, error: Exception) -> str:
+    return (
+        f"{prompt}\n\nYour previous reply could not be used as a TripItinerary ({error}). "
+        f"Reply again with only the corrected JSON object.\n\nPrevious reply:\n{reply}"
+    )
+
+
+async def _plan_trip_formatted(
+    destination: str,
+    duration_days: int,
+    budget: Optional[float],
+    interests: Optional[list[str]],
+    travel_style: str,
+    travel_month: Optional[int] = None,
+    refresh_research: bool = False,
+) -> TripItinerary:
+    """Two-pass structured plan: the team's text plan, then a TripFormatter call."""
+    # Create a single agent with structured output for final formatting
+    formatter = build_trip_formatter()
+
+    # First get the detailed plan from the team
+    with span("trip.plan", {"trip.duration_days": duration_days}):
+        team_result = await plan_trip(
+            destination=destination,
+            duration_days=duration_days,
+            budget=budget,
+            interests=interests,
+            travel_style=travel_style,
+            travel_month=travel_month,
+            refresh_research=refresh_research,
+        )
 
     # Then format it
     format_prompt = f"""
@@ -241,5 +1286,5 @@ async def plan_trip_structured(
     Budget: ${budget or 'flexible'}
     """
 
-    response = await formatter.arun(format_prompt)
+    response = await run_agent(formatter, format_prompt)
     return response.content
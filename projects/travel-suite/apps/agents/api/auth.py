@@ -10,6 +10,13 @@ from fastapi import Request, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 import httpx
+import jwt
+from opentelemetry import trace
+
+from api.http_client import get_http_client
+from api.jwt_verifier import SupabaseJWTVerifier, LocalVerificationUnavailable
+from api.token_cache import TokenCache, to_identity
+from agents.tracing import span
 
 logger = logging.getLogger("gobuddy.auth")
 
@@ -20,6 +27,30 @@ SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY", "")
 _IS_PRODUCTION = os.getenv("ENV", "").lower() in {"production", "prod"}
 ALLOW_DEV_AUTH_BYPASS = os.getenv("ALLOW_DEV_AUTH_BYPASS", "").lower() in {"1", "true", "yes"}
 
+# "remote" asks Supabase Auth for every token; "local" verifies JWTs in-process
+# and only falls back to Supabase for tokens it has no key material for.
+AUTH_VERIFY_MODE = os.getenv("AUTH_VERIFY_MODE", "remote").lower()
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET", "")
+
+# app_metadata roles allowed to manage state shared by every user (e.g. research)
+ADMIN_ROLES = {"admin", "super_admin"}
+
+jwt_verifier = SupabaseJWTVerifier(
+    supabase_url=SUPABASE_URL,
+    jwt_secret=SUPABASE_JWT_SECRET,
+    audience=os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated"),
+    issuer=os.getenv("SUPABASE_JWT_ISSUER") or None,
+    jwks_refresh_seconds=float(os.getenv("SUPABASE_JWKS_REFRESH_SECONDS", "600")),
+)
+
+# Verified identities are cached per token hash; set TOKEN_CACHE_MAX_ENTRIES=0 to disable.
+token_cache = TokenCache(
+    max_entries=int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000")),
+    ttl_seconds=float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "120")),
+    max_negative_entries=int(os.getenv("TOKEN_CACHE_MAX_NEGATIVE_ENTRIES", "2000")),
+    negative_ttl_seconds=float(os.getenv("TOKEN_CACHE_NEGATIVE_TTL_SECONDS", "30")),
+)
+
 if _IS_PRODUCTION and ALLOW_DEV_AUTH_BYPASS:
     logger.error(
         "ALLOW_DEV_AUTH_BYPASS is set in production — this is a security risk. Disabling bypass."
@@ -31,9 +62,15 @@ async def verify_supabase_token(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
 ) -> dict:
     """
-    Verify a Supabase JWT token by calling the Supabase Auth API.
+    Verify a Supabase JWT token.
+
+    In "local" mode the signature and claims are checked in-process; tokens
+    that cannot be checked locally fall back to the Supabase Auth API.
+    Results are cached per token hash until the token's `exp` (bounded TTL),
+    and rejections are cached briefly to absorb floods of bad tokens.
 
-    Returns the authenticated user's metadata dict.
+    Returns the authenticated user's identity (`IDENTITY_FIELDS` of the
+    verified payload), the same dict on cache hits and misses.
     Raises HTTPException 401 if the token is invalid or missing.
     """
     if not credentials:
@@ -59,16 +96,68 @@ async def verify_supabase_token(
             detail="Authentication provider is not configured",
         )
 
+    with span("auth.verify", {"auth.mode": AUTH_VERIFY_MODE}) as auth_span:
+        cached = token_cache.get(token)
+        if cached is not None:
+            auth_span.set_attribute("auth.cache", "hit")
+            return cached
+        if token_cache.is_rejected(token):
+            auth_span.set_attribute("auth.cache", "rejected")
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+        auth_span.set_attribute("auth.cache", "miss")
+        try:
+            user = await _verify_token(token)
+        except HTTPException as e:
+            if e.status_code == 401:
+                token_cache.reject(token)
+            raise
+
+        # Same shape whether or not the next request is served from the cache
+        user = to_identity(user)
+        token_cache.put(token, user, exp=user.get("exp") or _unverified_expiry(token))
+        return user
+
+
+def _unverified_expiry(token: str) -> Optional[float]:
+    """
+    Read `exp` without checking the signature.
+
+    Only used to cap how long an already-verified identity is cached.
+    """
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{SUPABASE_URL}/auth/v1/user",
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "apikey": SUPABASE_ANON_KEY,
-                },
-                timeout=10.0,
-            )
+        return jwt.decode(token, options={"verify_signature": False}).get("exp")
+    except jwt.PyJWTError:
+        return None
+
+
+async def _verify_token(token: str) -> dict:
+    """Verify locally when configured, otherwise (or as fallback) via Supabase."""
+    if AUTH_VERIFY_MODE == "local":
+        trace.get_current_span().set_attribute("auth.method", "local")
+        try:
+            return await jwt_verifier.verify(token)
+        except LocalVerificationUnavailable as e:
+            logger.debug("Local verification unavailable, using Supabase: %s", e)
+        except (jwt.PyJWTError, TypeError, ValueError) as e:
+            # Includes malformed keys and key/algorithm mismatches, not only bad claims
+            logger.warning("Token verification failed: %s", e)
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    trace.get_current_span().set_attribute("auth.method", "remote")
+    return await _verify_remote(token)
+
+
+async def _verify_remote(token: str) -> dict:
+    """Verify a token by calling the Supabase Auth `/user` endpoint."""
+    try:
+        response = await get_http_client().get(
+            f"{SUPABASE_URL}/auth/v1/user",
+            headers={
+                "Authorization": f"Bearer {token}",
+                "apikey": SUPABASE_ANON_KEY,
+            },
+        )
 
         if response.status_code != 200:
             logger.warning("Token verification failed: %s", response.text)
@@ -86,3 +175,17 @@ async def verify_supabase_token(
 def get_user_id(user: dict = Depends(verify_supabase_token)) -> str:
     """Extract user ID from the verified token payload."""
     return user.get("id") or user.get("sub", "anonymous")
+
+
+def require_admin(user: dict = Depends(verify_supabase_token)) -> str:
+    """
+    User ID of an admin (`app_metadata.role`) or service-role caller.
+
+    Only the service role can write app_metadata, so users cannot grant
+    themselves the role. Everyone else gets a 403.
+    """
+    user_id = get_user_id(user)
+    role = (user.get("app_metadata") or {}).get("role")
+    if user_id == "dev-user" or user.get("role") == "service_role" or role in ADMIN_ROLES:
+        return user_id
+    raise HTTPException(status_code=403, detail="Forbidden: admin access required")
@@ -0,0 +1,298 @@
+"""
+Conversation history for agent chats, stored in `public.agent_conversations`.
+Each chat turn (user message + agent reply) is one row. Writes are queued and
+flushed in batches by a background task so they stay out of the request path;
+reads page newest-first with a keyset cursor, so deep pages cost the same as
+the first one.
+"""
+import os
+import json
+import uuid
+import base64
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import asyncpg
+
+logger = logging.getLogger("gobuddy.conversations")
+
+CONVERSATION_BATCH_SIZE = int(os.getenv("CONVERSATION_BATCH_SIZE", "100"))
+CONVERSATION_FLUSH_SECONDS = float(os.getenv("CONVERSATION_FLUSH_SECONDS", "0.5"))
+CONVERSATION_QUEUE_MAX = int(os.getenv("CONVERSATION_QUEUE_MAX", "10000"))
+
+# Values allowed by the agent_name CHECK constraint
+AGENT_NAMES = {"TripPlanner", "SupportBot", "TravelRecommender"}
+
+# Errors caused by the rows themselves (e.g. a user_id with no profile). The
+# batch is retried in halves so one bad turn does not cost the others.
+_ROW_ERRORS = (asyncpg.IntegrityConstraintViolationError, asyncpg.DataError)
+
+# Queued by `stop` behind the last turn: the writer flushes its batch and exits
+_STOP = object()
+
+
+class InvalidCursor(ValueError):
+    """The pagination cursor could not be decoded."""
+
+
+@dataclass
+class ConversationTurn:
+    """One user message and the agent's reply, waiting to be written."""
+
+    user_id: uuid.UUID
+    session_id: str
+    agent_name: str
+    messages: list[dict]
+    metadata: Optional[dict] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    def to_record(self) -> tuple:
+        return (
+            self.user_id,
+            self.session_id,
+            self.agent_name,
+            self.messages,
+            self.metadata,
+            self.created_at,
+            self.created_at,
+        )
+
+
+def encode_cursor(created_at: datetime, row_id: uuid.UUID) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e)) from e
+
+
+def _as_uuid(value: str) -> Optional[uuid.UUID]:
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+def _as_text(content: Any) -> str:
+    return content if isinstance(content, str) else json.dumps(content, default=str)
+
+
+class ConversationStore:
+    """
+    Batched writer and keyset reader for agent conversations.
+
+    `record` never waits on the database: turns go on a bounded queue and a
+    background task writes them with one `executemany` per batch (up to
+    `batch_size` rows, or whatever arrived within `flush_interval`). When the
+    queue is full new turns are dropped and counted rather than slowing chats.
+    A batch rejected for its rows is split until only the bad turns fail.
+    """
+
+    def __init__(
+        self,
+        table: str = "public.agent_conversations",
+        batch_size: int = CONVERSATION_BATCH_SIZE,
+        flush_interval: float = CONVERSATION_FLUSH_SECONDS,
+        max_queue: int = CONVERSATION_QUEUE_MAX,
+    ):
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._pool = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._pool is not None
+
+    async def start(self, pool) -> None:
+        """Start the background writer. Called from the app lifespan once the pool is open."""
+        if pool is None or self._writer_task is not None:
+            return
+        self._pool = pool
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._writer_task = asyncio.create_task(self._writer(), name="conversation-writer")
+
+    async def stop(self) -> None:
+        """Flush queued turns and stop the writer."""
+        if self._writer_task is None:
+            return
+        # Not cancelled: the writer may hold a batch it has taken off the queue
+        if not self._writer_task.done():
+            await self._queue.put(_STOP)
+        await asyncio.gather(self._writer_task, return_exceptions=True)
+        self._writer_task = None
+        remaining = []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        for start in range(0, len(remaining), self.batch_size):
+            await self._write(remaining[start:start + self.batch_size])
+        self._pool = None
+
+    def record(
+        self,
+        user_id: str,
+        agent_name: str,
+        user_message: str,
+        reply: Any,
+        session_id: Optional[str] = None,
+        metadata: Optional[dict] = None,
+    ) -> bool:
+        """
+        Queue one chat turn for writing. Returns False if it was not queued
+        (store disabled, non-UUID user such as the dev identity, or queue full).
+        """
+        user_uuid = _as_uuid(user_id)
+        if not self.enabled or user_uuid is None or agent_name not in AGENT_NAMES:
+            return False
+        turn = ConversationTurn(
+            user_id=user_uuid,
+            session_id=session_id or uuid.uuid4().hex,
+            agent_name=agent_name,
+            messages=[
+                {"role": "user", "content": user_message},
+                {"role": "assistant", "content": _as_text(reply)},
+            ],
+            metadata=metadata,
+        )
+        try:
+            self._queue.put_nowait(turn)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("Conversation queue full; dropped a %s turn", agent_name)
+            return False
+        return True
+
+    async def list_for_user(
+        self,
+        user_id: str,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        agent_name: Optional[str] = None,
+    ) -> tuple[list[dict], Optional[str]]:
+        """
+        Newest-first page of a user's turns and the cursor for the next page.
+
+        Uses `(created_at, id) < cursor` against the (user_id, created_at, id)
+        index instead of OFFSET, so page N does not scan the N-1 pages before it.
+
+        Raises:
+            InvalidCursor: the cursor is malformed
+        """
+        user_uuid = _as_uuid(user_id)
+        if not self.enabled or user_uuid is None:
+            return [], None
+
+        args: list[Any] = [user_uuid]
+        where = ["user_id = $1"]
+        if cursor:
+            created_at, row_id = decode_cursor(cursor)
+            args += [created_at, row_id]
+            where.append(f"(created_at, id) < (${len(args) - 1}, ${len(args)})")
+        if agent_name:
+            args.append(agent_name)
+            where.append(f"agent_name = ${len(args)}")
+        # One extra row tells us whether there is a next page
+        args.append(limit + 1)
+
+        query = (
+            f"SELECT id, session_id, agent_name, messages, metadata, created_at "
+            f"FROM {self.table} WHERE {' AND '.join(where)} "
+            f"ORDER BY created_at DESC, id DESC LIMIT ${len(args)}"
+        )
+        async with self._pool.acquire() as conn:
+            rows = await conn.fetch(query, *args)
+
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_cursor = encode_cursor(last["created_at"], last["id"])
+        return [
+            {
+                "id": str(row["id"]),
+                "session_id": row["session_id"],
+                "agent": row["agent_name"],
+                "messages": row["messages"],
+                "metadata": row["metadata"],
+                "created_at": row["created_at"].isoformat(),
+            }
+            for row in page
+        ], next_cursor
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    async def _writer(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            turn = await self._queue.get()
+            if turn is _STOP:
+                return
+            batch = [turn]
+            deadline = loop.time() + self.flush_interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    turn = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if turn is _STOP:
+                    stopping = True
+                    break
+                batch.append(turn)
+            await self._write(batch)
+            if stopping:
+                return
+
+    async def _write(self, batch: list[ConversationTurn]) -> None:
+        if not batch:
+            return
+        query = (
+            f"INSERT INTO {self.table} "
+            f"(user_id, session_id, agent_name, messages, metadata, started_at, created_at) "
+            f"VALUES ($1, $2, $3, $4, $5, $6, $7)"
+        )
+        try:
+            async with self._pool.acquire() as conn:
+                await conn.executemany(query, [turn.to_record() for turn in batch])
+            self.written += len(batch)
+        except _ROW_ERRORS as e:
+            # executemany is atomic, so none of the batch was written
+            if len(batch) > 1:
+                middle = len(batch) // 2
+                await self._write(batch[:middle])
+                await self._write(batch[middle:])
+                return
+            self.failed += 1
+            logger.error("Failed to write a conversation turn for user %s: %s", batch[0].user_id, e)
+        except Exception as e:
+            # History is best effort; never let a write failure reach a chat request
+            self.failed += len(batch)
+            logger.error("Failed to write %d conversation turns: %s", len(batch), e)
+
+
+conversation_store = ConversationStore()
@@ -0,0 +1,64 @@
+"""
+Shared asyncpg connection pool for GoBuddy AI Agents.
+Opened in the app lifespan when DATABASE_URL is set; features that need the
+database (e.g. conversation history) are disabled without it.
+"""
+import os
+import json
+import logging
+from typing import Optional
+
+import asyncpg
+
+logger = logging.getLogger("gobuddy.db")
+
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "10"))
+# Prepared statement cache per connection; set to 0 behind PgBouncer in transaction mode
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+_pool: Optional[asyncpg.Pool] = None
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    # Exchange JSONB columns as Python objects rather than strings
+    await conn.set_type_codec("jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+async def create_db_pool(dsn: str) -> asyncpg.Pool:
+    """Create a pool from the DB_* settings."""
+    return await asyncpg.create_pool(
+        dsn,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        command_timeout=DB_COMMAND_TIMEOUT,
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+        init=_init_connection,
+    )
+
+
+async def init_db_pool(dsn: str = DATABASE_URL) -> Optional[asyncpg.Pool]:
+    """Open the shared pool. Called from the app lifespan; returns None if no database is configured."""
+    global _pool
+    if not dsn:
+        logger.info("DATABASE_URL not set; database-backed features are disabled")
+        return None
+    if _pool is None:
+        _pool = await create_db_pool(dsn)
+        logger.info("Database pool ready (min=%d, max=%d)", DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE)
+    return _pool
+
+
+def get_db_pool() -> Optional[asyncpg.Pool]:
+    """Return the shared pool, or None if the database is not configured."""
+    return _pool
+
+
+async def close_db_pool() -> None:
+    """Close the pool. Called on shutdown."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
@@ -5,7 +5,8 @@ Database connections, authentication, etc.
 import os
 from typing import Optional
 from fastapi import Header, HTTPException
-import httpx
+
+from api.http_client import get_http_client
 
 # Supabase configuration
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -30,21 +31,20 @@ async def verify_user(authorization: Optional[str] = Header(None)) -> Optional[s
     if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
         raise HTTPException(status_code=503, detail="Authentication service is not configured")
 
-    # Verify token with Supabase
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{SUPABASE_URL}/auth/v1/user",
-            headers={
-                "Authorization": f"Bearer {token}",
-                "apikey": SUPABASE_SERVICE_KEY,
-            },
-        )
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=401, detail="Invalid or expired token")
-
-        user_data = response.json()
-        return user_data.get("id")
+    # Verify token with Supabase over the shared, pooled client
+    response = await get_http_client().get(
+        f"{SUPABASE_URL}/auth/v1/user",
+        headers={
+            "Authorization": f"Bearer {token}",
+            "apikey": SUPABASE_SERVICE_KEY,
+        },
+    )
+
+    if response.status_code != 200:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    user_data = response.json()
+    return user_data.get("id")
 
 
 async def get_supabase_client():
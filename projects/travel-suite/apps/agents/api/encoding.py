@@ -0,0 +1,171 @@
+"""
+Response encoding: orjson for JSON bodies, optional MessagePack via `Accept`,
+and brotli/gzip compression negotiated from `Accept-Encoding`.
+"""
+import os
+import gzip
+import logging
+from contextvars import ContextVar
+from typing import Any, Optional
+
+import orjson
+from fastapi.responses import JSONResponse
+
+try:
+    import brotli  # optional: without it only gzip is offered
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack  # optional: without it msgpack clients get JSON
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger("gobuddy.encoding")
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+# Bodies smaller than this are sent as-is; compressing them costs more than it saves
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+# Brotli 4-5 is the usual sweet spot for dynamic responses; 11 is for static assets
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+
+# Set per request by CompressionMiddleware so the response class can pick a format
+_accept_var: ContextVar[str] = ContextVar("accept", default="")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact JSON bytes; unknown types fall back to str()."""
+    return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+def wants_msgpack(accept: str) -> bool:
+    return msgpack is not None and any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Default response class: orjson-encoded JSON, or MessagePack when the
+    request's `Accept` header asks for it.
+    """
+
+    def __init__(self, content: Any, *args, **kwargs):
+        super().__init__(content, *args, **kwargs)
+        self.headers["vary"] = "Accept"
+
+    def render(self, content: Any) -> bytes:
+        if wants_msgpack(_accept_var.get()):
+            # Set before Response.__init__ builds the Content-Type header
+            self.media_type = "application/msgpack"
+            return msgpack.packb(content, default=str, use_bin_type=True)
+        return dumps(content)
+
+
+def _parse_accept_encoding(header: str) -> dict[str, float]:
+    """Parse `br;q=1.0, gzip;q=0.8` into {coding: q}."""
+    codings = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding.strip().lower()] = q
+    return codings
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header (br wins ties), or None."""
+    codings = _parse_accept_encoding(accept_encoding)
+    wildcard = codings.get("*", 0.0)
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for coding in offered:
+        q = codings.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _add_vary(headers: list[tuple[bytes, bytes]], value: bytes) -> None:
+    for i, (name, existing) in enumerate(headers):
+        if name.lower() == b"vary":
+            headers[i] = (name, existing + b", " + value)
+            return
+    headers.append((b"vary", value))
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI middleware compressing complete responses with brotli or gzip.
+
+    Only single-message bodies of at least COMPRESSION_MIN_BYTES are
+    compressed; streamed responses (SSE) and bodies that already carry a
+    Content-Encoding pass through untouched, so event streams are never
+    buffered. Also records the request's `Accept` header for FastJSONResponse.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        token = _accept_var.set(headers.get(b"accept", b"").decode("latin-1"))
+        coding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                # Hold the headers until the first body chunk shows whether to compress
+                start_message = message
+                return
+            if start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            response_headers = list(start["headers"])
+            body = message.get("body", b"")
+            eligible = (
+                coding is not None
+                and not message.get("more_body", False)
+                and len(body) >= self.minimum_size
+                and not any(name.lower() == b"content-encoding" for name, _ in response_headers)
+            )
+            if eligible:
+                body = compress(body, coding)
+                response_headers = [
+                    (name, value) for name, value in response_headers
+                    if name.lower() != b"content-length"
+                ]
+                response_headers += [
+                    (b"content-encoding", coding.encode()),
+                    (b"content-length", str(len(body)).encode()),
+                ]
+                message = {**message, "body": body}
+            _add_vary(response_headers, b"Accept-Encoding")
+            await send({**start, "headers": response_headers})
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _accept_var.reset(token)
@@ -0,0 +1,85 @@
+"""
+Shared outbound HTTP client for GoBuddy AI Agents.
+One pooled, keep-alive client is opened in the app lifespan and reused by
+every auth check, so requests do not pay TCP+TLS setup to Supabase each time.
+"""
+import os
+import logging
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger("gobuddy.http_client")
+
+HTTP_CLIENT_TIMEOUT = float(os.getenv("HTTP_CLIENT_TIMEOUT", "10"))
+HTTP_CLIENT_CONNECT_TIMEOUT = float(os.getenv("HTTP_CLIENT_CONNECT_TIMEOUT", "5"))
+HTTP_CLIENT_MAX_CONNECTIONS = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", "100"))
+HTTP_CLIENT_MAX_KEEPALIVE = int(os.getenv("HTTP_CLIENT_MAX_KEEPALIVE", "20"))
+HTTP_CLIENT_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_CLIENT_KEEPALIVE_EXPIRY", "30"))
+HTTP_CLIENT_HTTP2 = os.getenv("HTTP_CLIENT_HTTP2", "true").lower() in {"1", "true", "yes"}
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package (installed via httpx[http2])."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _use_http2() -> bool:
+    if HTTP_CLIENT_HTTP2 and not _http2_available():
+        logger.warning("HTTP/2 requested but `h2` is not installed; using HTTP/1.1")
+        return False
+    return HTTP_CLIENT_HTTP2
+
+
+def build_http_client() -> httpx.AsyncClient:
+    """Create a pooled AsyncClient from the HTTP_CLIENT_* settings."""
+    return httpx.AsyncClient(
+        http2=_use_http2(),
+        timeout=httpx.Timeout(HTTP_CLIENT_TIMEOUT, connect=HTTP_CLIENT_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_CLIENT_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_CLIENT_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_CLIENT_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """Open the shared client. Called from the app lifespan on startup."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = build_http_client()
+        logger.info(
+            "Shared HTTP client ready (max_connections=%d, keepalive=%d)",
+            HTTP_CLIENT_MAX_CONNECTIONS,
+            HTTP_CLIENT_MAX_KEEPALIVE,
+        )
+    return _client
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared client.
+
+    Falls back to creating it lazily so code paths that run without the
+    lifespan (scripts, bare TestClient usage) still work.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = build_http_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client and release pooled connections. Called on shutdown."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        logger.info("Shared HTTP client closed")
+    _client = None
@@ -0,0 +1,234 @@
+"""
+Asynchronous job execution for long-running agent work (e.g. trip planning).
+Submitting returns a job id immediately; a bounded worker pool runs the job and
+keeps the result for a configurable TTL so clients can poll or get a callback.
+
+Jobs live in the memory of the process that accepted them, so polling only
+works when every request reaches that process: run the API as a single
+worker process (one uvicorn worker per replica, with sticky routing if there
+are several replicas). A shared Postgres/Redis job store is needed before
+scaling out with multiple workers.
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+import contextvars
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+from urllib.parse import urlparse
+
+from agents.admission import AdmissionRejected
+from api.http_client import get_http_client
+
+logger = logging.getLogger("gobuddy.jobs")
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "100"))
+JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+# Callbacks are only sent to these hosts (comma-separated); empty disables callbacks.
+JOB_CALLBACK_ALLOWED_HOSTS = {
+    h.strip().lower() for h in os.getenv("JOB_CALLBACK_ALLOWED_HOSTS", "").split(",") if h.strip()
+}
+
+
+class QueueFull(Exception):
+    """The job queue is at capacity; the caller should retry later."""
+
+
+class JobQueueNotRunning(Exception):
+    """Workers have not been started (or were stopped)."""
+
+
+@dataclass
+class Job:
+    """A unit of queued agent work and its outcome."""
+
+    id: str
+    user_id: str
+    kind: str
+    run: Callable[[], Awaitable[Any]] = field(repr=False)
+    callback_url: Optional[str] = None
+    status: str = "queued"  # queued -> running -> succeeded | failed | retryable
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    # Seconds to wait before resubmitting a job shed by LLM admission control (status "retryable")
+    retry_after: Optional[int] = None
+    # Captured at submit so the run keeps the request id and trace of the request that queued it
+    context: contextvars.Context = field(default_factory=contextvars.copy_context, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+            "retry_after": self.retry_after,
+        }
+
+
+def is_allowed_callback(url: str) -> bool:
+    """Only HTTPS callbacks to allow-listed hosts are accepted."""
+    parsed = urlparse(url)
+    return parsed.scheme == "https" and (parsed.hostname or "").lower() in JOB_CALLBACK_ALLOWED_HOSTS
+
+
+class JobManager:
+    """
+    Bounded worker pool with a bounded queue.
+
+    At most `max_workers` jobs run concurrently and at most `max_queue` wait;
+    further submissions raise QueueFull instead of opening more upstream calls.
+    Finished jobs are kept for `result_ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = JOB_WORKERS,
+        max_queue: int = JOB_QUEUE_MAX,
+        result_ttl: float = JOB_RESULT_TTL_SECONDS,
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self._jobs: dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self) -> None:
+        """Start the worker pool. Called from the app lifespan."""
+        if self._workers:
+            return
+        # Created here so the queue binds to the serving event loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"job-worker-{i}")
+            for i in range(self.max_workers)
+        ]
+        logger.info("Started %d job workers (queue limit %d)", self.max_workers, self.max_queue)
+
+    async def stop(self) -> None:
+        """Cancel workers. Jobs still queued are marked failed."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for job in self._jobs.values():
+            if job.status in {"queued", "running"}:
+                self._finish(job, error="Server shutting down")
+
+    def submit(
+        self,
+        user_id: str,
+        kind: str,
+        run: Callable[[], Awaitable[Any]],
+        callback_url: Optional[str] = None,
+    ) -> Job:
+        """
+        Queue a job.
+
+        Raises:
+            QueueFull: the queue is at `max_queue`
+            JobQueueNotRunning: workers are not started
+        """
+        if self._queue is None or not self._workers:
+            raise JobQueueNotRunning()
+        self._purge_expired()
+
+        job = Job(id=uuid.uuid4().hex, user_id=user_id, kind=kind, run=run, callback_url=callback_url)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFull()
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job; expired results are treated as missing."""
+        self._purge_expired()
+        return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        statuses: dict[str, int] = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": len(self._workers),
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_limit": self.max_queue,
+            "jobs": statuses,
+        }
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _finish(
+        self,
+        job: Job,
+        result: Any = None,
+        error: Optional[str] = None,
+        retry_after: Optional[int] = None,
+    ) -> None:
+        job.result = result
+        job.error = error
+        job.retry_after = retry_after
+        if retry_after is not None:
+            job.status = "retryable"
+        else:
+            job.status = "failed" if error else "succeeded"
+        job.finished_at = time.time()
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                job.status = "running"
+                job.started_at = time.time()
+                try:
+                    self._finish(job, result=await asyncio.create_task(job.run(), context=job.context))
+                except asyncio.CancelledError:
+                    raise
+                except AdmissionRejected as e:
+                    # Same outcome as the sync routes' 503 + Retry-After: the model was busy, not broken
+                    logger.warning("Job %s (%s) shed: %s", job.id, job.kind, e)
+                    self._finish(job, error="The assistant is busy. Please try again shortly.",
+                                 retry_after=e.retry_after)
+                except Exception as e:
+                    logger.error("Job %s (%s) failed: %s", job.id, job.kind, e, exc_info=True)
+                    self._finish(job, error="An internal error occurred. Please try again.")
+                if job.callback_url:
+                    await self._send_callback(job)
+            finally:
+                self._queue.task_done()
+
+    async def _send_callback(self, job: Job) -> None:
+        """POST the finished job to its callback URL (best effort)."""
+        try:
+            response = await get_http_client().post(job.callback_url, json=job.to_dict())
+            if response.status_code >= 400:
+                logger.warning("Callback for job %s returned %d", job.id, response.status_code)
+        except Exception as e:
+            logger.warning("Callback for job %s failed: %s", job.id, e)
+
+
+# Trip planning runs several sequential LLM calls; it goes through this pool.
+# Per-process job store: requires a single worker process (see module docstring).
+trip_job_manager = JobManager()
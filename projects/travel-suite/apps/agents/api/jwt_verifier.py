@@ -0,0 +1,148 @@
+"""
+Local verification of Supabase access tokens.
+Checks signature, expiry, audience and issuer in-process against the project's
+JWT secret (HS256) or its published JWKS (RS256/ES256), so the hot path does
+not need a round trip to Supabase Auth.
+"""
+import time
+import asyncio
+import logging
+from typing import Optional
+
+import jwt
+
+from api.http_client import get_http_client
+
+logger = logging.getLogger("gobuddy.auth.jwt")
+
+ASYMMETRIC_ALGORITHMS = {"RS256", "ES256", "EdDSA"}
+
+
+class LocalVerificationUnavailable(Exception):
+    """The token is well-formed but cannot be checked locally (unknown key or algorithm)."""
+
+
+def claims_to_user(claims: dict) -> dict:
+    """Shape verified JWT claims like the Supabase `/auth/v1/user` payload."""
+    return {
+        "id": claims["sub"],
+        "sub": claims["sub"],
+        "email": claims.get("email"),
+        "phone": claims.get("phone"),
+        "role": claims.get("role", "authenticated"),
+        "aud": claims.get("aud"),
+        "app_metadata": claims.get("app_metadata", {}),
+        "user_metadata": claims.get("user_metadata", {}),
+        "exp": claims.get("exp"),
+    }
+
+
+class SupabaseJWTVerifier:
+    """
+    Verifies Supabase JWTs against a shared secret or a cached JWKS.
+
+    The JWKS is fetched from `{supabase_url}/auth/v1/.well-known/jwks.json`
+    and refreshed every `jwks_refresh_seconds`, or sooner when a token carries
+    an unknown `kid` (key rotation), rate-limited by `min_refresh_interval`.
+    """
+
+    def __init__(
+        self,
+        supabase_url: str,
+        jwt_secret: str = "",
+        audience: str = "authenticated",
+        issuer: Optional[str] = None,
+        jwks_refresh_seconds: float = 600,
+        min_refresh_interval: float = 30,
+        leeway_seconds: float = 10,
+    ):
+        self.supabase_url = supabase_url.rstrip("/")
+        self.jwt_secret = jwt_secret
+        self.audience = audience
+        self.issuer = issuer or (f"{self.supabase_url}/auth/v1" if self.supabase_url else None)
+        self.jwks_refresh_seconds = jwks_refresh_seconds
+        self.min_refresh_interval = min_refresh_interval
+        self.leeway_seconds = leeway_seconds
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._fetched_at: Optional[float] = None
+        self._refresh_lock = asyncio.Lock()
+
+    @property
+    def jwks_url(self) -> str:
+        return f"{self.supabase_url}/auth/v1/.well-known/jwks.json"
+
+    async def refresh_jwks(self) -> int:
+        """Fetch the signing keys. Keeps the previous keys if the fetch fails."""
+        self._fetched_at = time.monotonic()
+        try:
+            response = await get_http_client().get(self.jwks_url)
+            response.raise_for_status()
+            keys = {}
+            for jwk in response.json().get("keys", []):
+                try:
+                    keys[jwk.get("kid", "")] = jwt.PyJWK(jwk)
+                except jwt.PyJWTError as e:
+                    logger.warning("Skipping unusable JWK %s: %s", jwk.get("kid"), e)
+            self._keys = keys
+            logger.info("Loaded %d JWKS signing keys", len(keys))
+        except Exception as e:
+            logger.warning("JWKS refresh failed, keeping %d cached keys: %s", len(self._keys), e)
+        return len(self._keys)
+
+    def _needs_refresh(self, kid: str) -> bool:
+        if self._fetched_at is None:
+            return True
+        age = time.monotonic() - self._fetched_at
+        return age > self.jwks_refresh_seconds or (
+            kid not in self._keys and age > self.min_refresh_interval
+        )
+
+    async def _get_signing_key(self, kid: str) -> Optional[jwt.PyJWK]:
+        if self._needs_refresh(kid):
+            async with self._refresh_lock:
+                # Another request may have refreshed while we waited
+                if self._needs_refresh(kid):
+                    await self.refresh_jwks()
+        return self._keys.get(kid)
+
+    async def verify(self, token: str) -> dict:
+        """
+        Verify a token locally and return the user payload.
+
+        The signing algorithm comes from the secret or the JWKS key, never
+        from the token alone; a header `alg` that does not match is rejected.
+
+        Raises:
+            jwt.InvalidTokenError: signature, expiry, audience or issuer check failed
+            LocalVerificationUnavailable: no local key material for this token
+        """
+        header = jwt.get_unverified_header(token)
+        alg = header.get("alg")
+
+        if alg == "HS256":
+            if not self.jwt_secret:
+                raise LocalVerificationUnavailable("HS256 token but no JWT secret configured")
+            key, algorithm = self.jwt_secret, "HS256"
+        elif alg in ASYMMETRIC_ALGORITHMS and self.supabase_url:
+            kid = header.get("kid", "")
+            signing_key = await self._get_signing_key(kid)
+            if signing_key is None:
+                raise LocalVerificationUnavailable(f"No JWKS key for kid={kid}")
+            if signing_key.algorithm_name != alg:
+                raise jwt.InvalidAlgorithmError(
+                    f"Token alg {alg} does not match {signing_key.algorithm_name} key {kid}"
+                )
+            key, algorithm = signing_key.key, signing_key.algorithm_name
+        else:
+            raise LocalVerificationUnavailable(f"Unsupported algorithm: {alg}")
+
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=self.audience,
+            issuer=self.issuer,
+            leeway=self.leeway_seconds,
+            options={"require": ["exp", "sub"]},
+        )
+        return claims_to_user(claims)
@@ -0,0 +1,76 @@
+"""
+Prometheus `/metrics` endpoint and HTTP request instrumentation.
+Agent-level metrics live in `agents.metrics`; everything shares the default registry.
+"""
+import os
+import hmac
+import time
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+# Optional bearer token for scrapers; leave empty when /metrics is only reachable internally
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "gobuddy_http_request_duration_seconds",
+    "HTTP request latency until the response body completes, by route template.",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "gobuddy_rate_limit_rejections_total",
+    "Requests rejected with 429 by a rate limiter.",
+    ["limiter", "window"],
+)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware timing every HTTP request.
+
+    Routes are labelled by their template (`/api/jobs/{job_id}`), never the raw
+    path, so label cardinality stays bounded; unmatched paths share one label.
+    Plain ASGI (rather than BaseHTTPMiddleware) keeps the per-request cost to a
+    couple of clock reads and does not buffer streaming responses.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status),
+            ).observe(time.perf_counter() - started)
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request) -> Response:
+    """Prometheus text exposition of all registered metrics."""
+    if METRICS_TOKEN:
+        supplied = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied, METRICS_TOKEN):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -3,42 +3,297 @@ Rate limiting middleware for GoBuddy AI Agents.
 Prevents API abuse and protects upstream LLM quota (e.g., Gemini 1,500 req/day).
 """
 import os
+import math
 import time
 import logging
-from collections import defaultdict
-from typing import Optional
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Sequence
 
 from fastapi import Request, HTTPException
 
+from api.metrics import RATE_LIMIT_REJECTIONS
+from agents.tracing import span
+
 logger = logging.getLogger("gobuddy.rate_limit")
 RATE_LIMIT_DISABLED = (
     os.getenv("DISABLE_RATE_LIMIT", "").lower() in {"1", "true", "yes"}
     or os.getenv("ENV", "").lower() == "test"
 )
+# "memory" (per-process) or "redis" (shared across workers and hosts via REDIS_URL)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Let requests through if the shared backend is unreachable instead of failing every call.
+RATE_LIMIT_FAIL_OPEN = os.getenv("RATE_LIMIT_FAIL_OPEN", "true").lower() in {"1", "true", "yes"}
+
+# A window is (length in seconds, max requests in that window).
+Window = tuple[int, int]
+
+
+@dataclass
+class Rejection:
+    """Why a request was refused: which window, its estimated usage, and when to retry."""
+
+    window: int
+    limit: int
+    used: float
+    retry_after: int
+
+
+def sliding_count(previous: float, current: float, elapsed: float, window: int) -> float:
+    """Weight the previous interval by how much of it still overlaps the window."""
+    return previous * (1.0 - elapsed / window) + current
+
+
+def retry_after_seconds(
+    window: int, limit: int, previous: float, current: float, elapsed: float
+) -> int:
+    """Seconds until the estimated sliding count drops below the limit."""
+    if current >= limit:
+        # Next interval: current becomes previous and must decay below the limit
+        wait = (window - elapsed) + (1.0 - limit / current) * window
+    elif previous:
+        # previous * (1 - t / window) + current < limit
+        wait = (1.0 - (limit - current) / previous) * window - elapsed
+    else:
+        wait = window - elapsed
+    return max(1, math.ceil(wait))
+
+
+class RateLimitBackend(ABC):
+    """
+    Storage and algorithm behind RateLimiter.
+
+    Implementations must check every window and record the request as one
+    atomic step, so concurrent callers can never overshoot a limit.
+    """
+
+    @abstractmethod
+    async def hit(self, key: str, windows: Sequence[Window], now: float) -> Optional[Rejection]:
+        """Record a request for `key` unless a window is full; return the Rejection if so."""
+
+    @abstractmethod
+    async def usage(self, key: str, windows: Sequence[Window], now: float) -> list[float]:
+        """Estimated requests used in each window, without recording anything."""
+
+    async def close(self) -> None:
+        """Release connections. Called on shutdown."""
+
+
+class _KeyState:
+    """
+    Compact per-key sliding-window-counter state.
+
+    `counters` holds (window index, previous count, current count) for each
+    window, flattened into one list to keep per-key overhead small.
+    """
+
+    __slots__ = ("counters", "last_seen")
+
+    def __init__(self, num_windows: int):
+        self.counters = [0] * (3 * num_windows)
+        self.last_seen = 0.0
+
+
+class InMemoryBackend(RateLimitBackend):
+    """
+    Per-process sliding-window-counter backend.
+
+    Each window keeps only the request count of the current and previous fixed
+    interval; the sliding count is estimated by weighting the previous interval
+    by how much of it still overlaps the window. `hit()` is O(1) per key.
+
+    Keys are kept in least-recently-seen order, so idle keys (no traffic for
+    two of the longest windows, after which their state no longer matters) are
+    evicted from the front in amortized O(1) as part of normal checks.
+    """
+
+    def __init__(self, idle_after: float = 2 * 3600):
+        self._idle_after = idle_after
+        self._states: OrderedDict[str, _KeyState] = OrderedDict()
+
+    @staticmethod
+    def _counts(state: _KeyState, i: int, window: int, now: float) -> tuple[int, int, int]:
+        """Return (window index, previous count, current count) for window `i` at `now`."""
+        index = int(now // window)
+        last_index, previous, current = state.counters[3 * i:3 * i + 3]
+        if index == last_index:
+            return index, previous, current
+        if index == last_index + 1:
+            return index, current, 0
+        return index, 0, 0
+
+    def _evict_idle(self, now: float) -> None:
+        """Drop keys idle long enough that their counters no longer matter."""
+        cutoff = now - self._idle_after
+        while self._states:
+            key, state = next(iter(self._states.items()))
+            if state.last_seen > cutoff:
+                break
+            del self._states[key]
+
+    async def hit(self, key: str, windows: Sequence[Window], now: float) -> Optional[Rejection]:
+        self._evict_idle(now)
+
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = _KeyState(len(windows))
+        else:
+            self._states.move_to_end(key)
+        state.last_seen = now
+
+        for i, (window, limit) in enumerate(windows):
+            index, previous, current = self._counts(state, i, window, now)
+            state.counters[3 * i:3 * i + 3] = index, previous, current
+            elapsed = now % window
+            used = sliding_count(previous, current, elapsed, window)
+            if used >= limit:
+                return Rejection(
+                    window=window,
+                    limit=limit,
+                    used=used,
+                    retry_after=retry_after_seconds(window, limit, previous, current, elapsed),
+                )
+
+        # Record the request
+        for i in range(len(windows)):
+            state.counters[3 * i + 2] += 1
+        return None
+
+    async def usage(self, key: str, windows: Sequence[Window], now: float) -> list[float]:
+        state = self._states.get(key)
+        if state is None:
+            return [0.0] * len(windows)
+        used = []
+        for i, (window, _) in enumerate(windows):
+            _, previous, current = self._counts(state, i, window, now)
+            used.append(sliding_count(previous, current, now % window, window))
+        return used
+
+    def __len__(self) -> int:
+        """Number of keys currently tracked."""
+        return len(self._states)
+
+
+# Same sliding-window counter as InMemoryBackend, evaluated atomically in Redis.
+# KEYS: (current interval, previous interval) counter keys per window.
+# ARGV: now, then (window, limit) pairs in the same order. Returns {0} when allowed,
+# or {window, limit, previous, current, elapsed} (as strings) for the first full window.
+# Every key is passed in KEYS so Redis Cluster can route the script; counters expire
+# after two windows.
+_SLIDING_WINDOW_LUA = """
+local now = tonumber(ARGV[1])
+local n = (#ARGV - 1) / 2
+for i = 1, n do
+    local window = tonumber(ARGV[2 * i])
+    local limit = tonumber(ARGV[1 + 2 * i])
+    local current = tonumber(redis.call('GET', KEYS[2 * i - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[2 * i]) or '0')
+    local elapsed = now - math.floor(now / window) * window
+    if previous * (1 - elapsed / window) + current >= limit then
+        return {tostring(window), tostring(limit), tostring(previous), tostring(current), tostring(elapsed)}
+    end
+end
+for i = 1, n do
+    redis.call('INCR', KEYS[2 * i - 1])
+    redis.call('EXPIRE', KEYS[2 * i - 1], tonumber(ARGV[2 * i]) * 2)
+end
+return {0}
+"""
+
+
+class RedisBackend(RateLimitBackend):
+    """
+    Redis-protocol backend shared by every worker and host.
+
+    Each check runs as a single Lua script, so concurrent workers see one
+    consistent count per key. Keys use a `{...}` hash tag so all counters for
+    one client land on the same cluster slot.
+    """
+
+    def __init__(self, client=None, url: str = REDIS_URL, prefix: str = "gobuddy:rl"):
+        if client is None:
+            import redis.asyncio as redis  # optional dependency, only needed for this backend
+
+            client = redis.Redis.from_url(url)
+        self._client = client
+        self._prefix = prefix
+        self._script = client.register_script(_SLIDING_WINDOW_LUA)
+
+    def _key_prefix(self, key: str) -> str:
+        return f"{self._prefix}:{{{key}}}"
+
+    def _interval_keys(self, key: str, window: int, now: float) -> tuple[str, str]:
+        """Counter keys for the current and previous interval of `window` at `now`."""
+        prefix = self._key_prefix(key)
+        index = int(now // window)
+        return f"{prefix}:{window}:{index}", f"{prefix}:{window}:{index - 1}"
+
+    async def hit(self, key: str, windows: Sequence[Window], now: float) -> Optional[Rejection]:
+        keys, args = [], [repr(now)]
+        for window, limit in windows:
+            keys += self._interval_keys(key, window, now)
+            args += [window, limit]
+        result = await self._script(keys=keys, args=args)
+        if len(result) == 1:
+            return None
+
+        window, limit, previous, current, elapsed = (float(v) for v in result)
+        return Rejection(
+            window=int(window),
+            limit=int(limit),
+            used=sliding_count(previous, current, elapsed, int(window)),
+            retry_after=retry_after_seconds(int(window), int(limit), previous, current, elapsed),
+        )
+
+    async def usage(self, key: str, windows: Sequence[Window], now: float) -> list[float]:
+        used = []
+        for window, _ in windows:
+            current, previous = await self._client.mget(*self._interval_keys(key, window, now))
+            used.append(sliding_count(float(previous or 0), float(current or 0), now % window, window))
+        return used
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def build_backend() -> RateLimitBackend:
+    """Create the backend selected by RATE_LIMIT_BACKEND."""
+    if RATE_LIMIT_BACKEND == "redis":
+        logger.info("Using Redis rate-limit backend")
+        return RedisBackend(url=REDIS_URL)
+    if RATE_LIMIT_BACKEND != "memory":
+        logger.warning("Unknown RATE_LIMIT_BACKEND=%s; using in-memory backend", RATE_LIMIT_BACKEND)
+    return InMemoryBackend()
 
 
 class RateLimiter:
     """
-    In-memory sliding window rate limiter.
+    Sliding-window-counter rate limiter with per-minute and per-hour limits.
 
-    For production with multiple workers, replace with Redis-backed implementation.
+    Counting is delegated to a RateLimitBackend: the in-memory backend is
+    per-process, the Redis backend enforces limits across all workers.
+    `name` namespaces keys so limiters can share one backend.
     """
 
     def __init__(
         self,
         requests_per_minute: int = 10,
         requests_per_hour: int = 100,
+        backend: Optional[RateLimitBackend] = None,
+        name: str = "default",
     ):
         self.requests_per_minute = requests_per_minute
         self.requests_per_hour = requests_per_hour
-        self._minute_windows: dict[str, list[float]] = defaultdict(list)
-        self._hour_windows: dict[str, list[float]] = defaultdict(list)
-
-    def _clean_window(self, window: list[float], cutoff: float) -> list[float]:
-        """Remove expired entries from a time window."""
-        return [t for t in window if t > cutoff]
+        self.backend = backend or InMemoryBackend()
+        self.name = name
+        self._windows: tuple[Window, ...] = (
+            (60, requests_per_minute),
+            (3600, requests_per_hour),
+        )
 
-    def check(self, key: str) -> None:
+    async def check(self, key: str) -> None:
         """
         Check if a request is allowed for the given key.
 
@@ -51,65 +306,59 @@ class RateLimiter:
         if RATE_LIMIT_DISABLED:
             return
 
-        now = time.time()
+        with span("rate_limit.check", {"rate_limit.name": self.name}) as check_span:
+            try:
+                rejection = await self.backend.hit(f"{self.name}:{key}", self._windows, time.time())
+            except Exception as e:
+                check_span.set_attribute("rate_limit.backend_error", True)
+                if not RATE_LIMIT_FAIL_OPEN:
+                    raise HTTPException(status_code=503, detail="Rate limiting unavailable")
+                logger.error("Rate-limit backend error, allowing request: %s", e)
+                return
+            check_span.set_attribute("rate_limit.allowed", rejection is None)
 
-        # Check per-minute limit
-        self._minute_windows[key] = self._clean_window(
-            self._minute_windows[key], now - 60
+        if rejection is None:
+            return
+
+        hourly = rejection.window >= 3600
+        RATE_LIMIT_REJECTIONS.labels(self.name, "hour" if hourly else "minute").inc()
+        logger.warning(
+            "Rate limit exceeded (%s) for key=%s (%d/%d)",
+            "per-hour" if hourly else "per-minute",
+            key[0:8] + "...",
+            rejection.used,
+            rejection.limit,
         )
-        if len(self._minute_windows[key]) >= self.requests_per_minute:
-            retry_after = int(60 - (now - self._minute_windows[key][0]))
-            logger.warning(
-                "Rate limit exceeded (per-minute) for key=%s (%d/%d)",
-                key[0:8] + "...",
-                len(self._minute_windows[key]),
-                self.requests_per_minute,
-            )
-            raise HTTPException(
-                status_code=429,
-                detail=f"Rate limit exceeded. Try again in {retry_after} seconds.",
-                headers={"Retry-After": str(retry_after)},
-            )
-
-        # Check per-hour limit
-        self._hour_windows[key] = self._clean_window(
-            self._hour_windows[key], now - 3600
+        prefix = "Hourly rate limit" if hourly else "Rate limit"
+        raise HTTPException(
+            status_code=429,
+            detail=f"{prefix} exceeded. Try again in {rejection.retry_after} seconds.",
+            headers={"Retry-After": str(rejection.retry_after)},
         )
-        if len(self._hour_windows[key]) >= self.requests_per_hour:
-            retry_after = int(3600 - (now - self._hour_windows[key][0]))
-            logger.warning(
-                "Rate limit exceeded (per-hour) for key=%s (%d/%d)",
-                key[0:8] + "...",
-                len(self._hour_windows[key]),
-                self.requests_per_hour,
-            )
-            raise HTTPException(
-                status_code=429,
-                detail=f"Hourly rate limit exceeded. Try again in {retry_after} seconds.",
-                headers={"Retry-After": str(retry_after)},
-            )
-
-        # Record the request
-        self._minute_windows[key].append(now)
-        self._hour_windows[key].append(now)
 
-    def get_remaining(self, key: str) -> dict:
+    async def get_remaining(self, key: str) -> dict:
         """Get remaining quota for a key."""
-        now = time.time()
-        minute_used = len(self._clean_window(self._minute_windows.get(key, []), now - 60))
-        hour_used = len(self._clean_window(self._hour_windows.get(key, []), now - 3600))
+        minute_used, hour_used = await self.backend.usage(
+            f"{self.name}:{key}", self._windows, time.time()
+        )
         return {
-            "minute": {"used": minute_used, "limit": self.requests_per_minute},
-            "hour": {"used": hour_used, "limit": self.requests_per_hour},
+            "minute": {"used": math.ceil(minute_used), "limit": self.requests_per_minute},
+            "hour": {"used": math.ceil(hour_used), "limit": self.requests_per_hour},
         }
 
 
-# Default limiter instances
+# Default limiter instances share one backend (memory or Redis, per RATE_LIMIT_BACKEND)
+rate_limit_backend = build_backend()
+
 # AI chat endpoints: stricter limits (LLM calls are expensive)
-ai_limiter = RateLimiter(requests_per_minute=5, requests_per_hour=60)
+ai_limiter = RateLimiter(
+    requests_per_minute=5, requests_per_hour=60, backend=rate_limit_backend, name="ai"
+)
 
 # General endpoints: more generous limits
-general_limiter = RateLimiter(requests_per_minute=30, requests_per_hour=500)
+general_limiter = RateLimiter(
+    requests_per_minute=30, requests_per_hour=500, backend=rate_limit_backend, name="general"
+)
 
 
 def get_client_key(request: Request, user_id: Optional[str] = None) -> str:
@@ -1,25 +1,95 @@
 """
 API Routes for GoBuddy AI Agents
 """
+import os
+import asyncio
 import logging
-from typing import Optional
+from typing import Annotated, Any, AsyncIterator, Literal, Optional, Union
 from fastapi import APIRouter, HTTPException, Depends, Request, Query
 from pydantic import BaseModel, Field
 
-from agents.trip_planner import plan_trip, plan_trip_structured
-from agents.support_bot import answer_question, get_quick_response
+from agents.trip_planner import (
+    canonical_destination,
+    invalidate_plans,
+    plan_trip,
+    plan_trip_structured,
+    stream_trip_plan,
+    stream_trip_plan_structured,
+)
+from agents.research import ANY_MONTH, research_cache
+from agents.support_bot import answer_question, get_quick_response, stream_answer
 from agents.recommender import (
     get_recommendations,
+    stream_recommendations,
     update_preferences,
     provide_feedback,
 )
-from api.auth import verify_supabase_token, get_user_id
+from api.auth import verify_supabase_token, get_user_id, require_admin
 from api.rate_limit import ai_limiter, general_limiter, get_client_key
+from api.streaming import event_stream_response, single_event, wants_event_stream
+from api.jobs import trip_job_manager, is_allowed_callback, QueueFull, JobQueueNotRunning
+from api.conversations import conversation_store, InvalidCursor
+from agents.admission import AdmissionRejected
+from agents.tracing import request_id_var, span
 
 logger = logging.getLogger("gobuddy.routes")
 
 router = APIRouter()
 
+# /api/batch limits: items per batch, and how many of them run at once
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10"))
+BATCH_MAX_PARALLEL = int(os.getenv("BATCH_MAX_PARALLEL", "3"))
+
+
+def _model_busy(exc: AdmissionRejected) -> HTTPException:
+    """503 for requests shed by LLM admission control."""
+    logger.warning("Shedding request: %s", exc)
+    return HTTPException(
+        status_code=503,
+        detail="The assistant is busy. Please try again shortly.",
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+def _resolve_user_id(user_id: str, requested_user_id: Optional[str]) -> str:
+    """Enforce ownership: JWT identity is the source of truth (dev mode uses the query parameter)."""
+    if user_id == "dev-user":
+        if not requested_user_id:
+            raise HTTPException(status_code=400, detail="user_id query parameter is required in dev mode")
+        return requested_user_id
+    if requested_user_id and requested_user_id != user_id:
+        raise HTTPException(status_code=403, detail="Forbidden: cannot access another user's data")
+    return user_id
+
+
+def _remember(
+    user_id: str,
+    agent_name: str,
+    message: str,
+    reply: Any,
+    context: Optional[dict] = None,
+) -> None:
+    """Queue a chat turn for the conversation history (no-op without a database)."""
+    session_id = (context or {}).get("session_id") or request_id_var.get()
+    conversation_store.record(user_id, agent_name, message, reply, session_id=session_id)
+
+
+async def _remembering(
+    events: AsyncIterator[dict],
+    user_id: str,
+    agent_name: str,
+    message: str,
+    reply_key: str,
+    context: Optional[dict] = None,
+) -> AsyncIterator[dict]:
+    """Pass stream events through, recording the turn when the final result arrives."""
+    session_id = (context or {}).get("session_id") or request_id_var.get()
+    async for event in events:
+        if event.get("event") == "result":
+            data = event.get("data") or {}
+            _remember(user_id, agent_name, message, data.get(reply_key, data), {"session_id": session_id})
+        yield event
+
 
 # Request/Response Models
 class TripPlanRequest(BaseModel):
@@ -38,6 +108,25 @@ class TripPlanRequest(BaseModel):
     structured: bool = Field(
         default=False, description="Return structured JSON output"
     )
+    travel_month: Optional[int] = Field(
+        None, ge=1, le=12, description="Month of travel (1-12); destination research is shared per month"
+    )
+    latency_budget_seconds: Optional[float] = Field(
+        None,
+        gt=0,
+        le=300,
+        description="Answer within about this many seconds; stages that do not fit are skipped "
+        "and listed in skipped_stages (unstructured plans)",
+    )
+
+
+class TripPlanJobRequest(TripPlanRequest):
+    """Request body for a background trip planning job."""
+
+    callback_url: Optional[str] = Field(
+        None,
+        description="HTTPS URL to POST the finished job to (allow-listed hosts only)",
+    )
 
 
 class ChatMessage(BaseModel):
@@ -79,6 +168,62 @@ class FeedbackRequest(BaseModel):
     rating: Optional[int] = Field(None, ge=1, le=5, description="Rating 1-5")
 
 
+def _trip_plan_prompt(request: TripPlanRequest) -> str:
+    """The user side of a trip planner turn, as stored in the history."""
+    return f"Plan a {request.duration_days}-day trip to {request.destination} ({request.travel_style})"
+
+
+async def _trip_plan_data(request: TripPlanRequest, user_id: str) -> dict:
+    """Run a (non-streaming) trip plan; structured plans are returned as plain dicts."""
+    if request.structured:
+        result = await plan_trip_structured(
+            destination=request.destination,
+            duration_days=request.duration_days,
+            budget=request.budget,
+            interests=request.interests,
+            travel_style=request.travel_style,
+            travel_month=request.travel_month,
+        )
+        return result.model_dump()
+    return await plan_trip(
+        destination=request.destination,
+        duration_days=request.duration_days,
+        budget=request.budget,
+        interests=request.interests,
+        travel_style=request.travel_style,
+        user_id=user_id,
+        travel_month=request.travel_month,
+        latency_budget=request.latency_budget_seconds,
+    )
+
+
+class SupportBatchItem(ChatMessage):
+    type: Literal["support"]
+    id: Optional[str] = Field(None, description="Client correlation id, echoed in the result")
+
+
+class RecommendBatchItem(RecommendationRequest):
+    type: Literal["recommend"]
+    id: Optional[str] = Field(None, description="Client correlation id, echoed in the result")
+
+
+class TripPlanBatchItem(TripPlanRequest):
+    type: Literal["trip_plan"]
+    id: Optional[str] = Field(None, description="Client correlation id, echoed in the result")
+
+
+BatchItem = Annotated[
+    Union[SupportBatchItem, RecommendBatchItem, TripPlanBatchItem],
+    Field(discriminator="type"),
+]
+
+
+class BatchRequest(BaseModel):
+    """Several chat sub-requests answered in one round trip."""
+
+    requests: list[BatchItem] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+
+
 # Trip Planner Endpoints
 @router.post("/chat/trip-planner")
 async def chat_trip_planner(
@@ -93,37 +238,134 @@ async def chat_trip_planner(
     - Researcher: Gathers destination information
     - Planner: Creates day-by-day itinerary
     - Budgeter: Optimizes costs and estimates expenses
+
+    Send `Accept: text/event-stream` to receive per-agent progress and
+    token deltas as Server-Sent Events. Structured plans stream a `day` event
+    per validated day as soon as it is written instead of token deltas, then
+    the full itinerary as the `result`.
     """
     try:
-        ai_limiter.check(get_client_key(raw_request, user_id))
+        await ai_limiter.check(get_client_key(raw_request, user_id))
         logger.info("Trip plan request: %s for %d days by user %s",
                      request.destination, request.duration_days, user_id)
-        if request.structured:
-            result = await plan_trip_structured(
+        if wants_event_stream(raw_request) and request.structured:
+            return event_stream_response(_remembering(stream_trip_plan_structured(
                 destination=request.destination,
                 duration_days=request.duration_days,
                 budget=request.budget,
                 interests=request.interests,
                 travel_style=request.travel_style,
-            )
-            return {"success": True, "data": result.model_dump()}
-        else:
-            result = await plan_trip(
+                travel_month=request.travel_month,
+            ), user_id, "TripPlanner", _trip_plan_prompt(request), "plan"))
+        if wants_event_stream(raw_request):
+            return event_stream_response(_remembering(stream_trip_plan(
                 destination=request.destination,
                 duration_days=request.duration_days,
                 budget=request.budget,
                 interests=request.interests,
                 travel_style=request.travel_style,
                 user_id=user_id,
-            )
-            return {"success": True, "data": result}
+                travel_month=request.travel_month,
+                latency_budget=request.latency_budget_seconds,
+            ), user_id, "TripPlanner", _trip_plan_prompt(request), "plan"))
+        data = await _trip_plan_data(request, user_id)
+        _remember(user_id, "TripPlanner", _trip_plan_prompt(request), data.get("plan", data))
+        return {"success": True, "data": data}
     except HTTPException:
         raise
+    except AdmissionRejected as e:
+        raise _model_busy(e)
     except Exception as e:
         logger.error("Trip planning failed: %s", str(e), exc_info=True)
         raise HTTPException(status_code=500, detail="An internal error occurred. Please try again.")
 
 
+# Trip Planner Jobs
+@router.post("/jobs/trip-planner", status_code=202)
+async def submit_trip_plan_job(
+    request: TripPlanJobRequest,
+    raw_request: Request,
+    user_id: str = Depends(get_user_id),
+):
+    """
+    Queue a trip plan and return a job id immediately.
+
+    Poll `GET /api/jobs/{job_id}` for the result, or pass `callback_url` to
+    have the finished job POSTed back. Returns 503 with Retry-After when the
+    job queue is full. A job shed by LLM admission control finishes with
+    status `retryable` and `retry_after` seconds instead of `failed`.
+
+    Jobs are held in the accepting process's memory, so the API must run as a
+    single worker process (or with sticky routing) for polls to find them.
+    """
+    await ai_limiter.check(get_client_key(raw_request, user_id))
+    if request.callback_url and not is_allowed_callback(request.callback_url):
+        raise HTTPException(status_code=400, detail="callback_url host is not allowed")
+
+    async def run() -> dict:
+        data = await _trip_plan_data(request, user_id)
+        _remember(user_id, "TripPlanner", _trip_plan_prompt(request), data.get("plan", data))
+        return data
+
+    try:
+        job = trip_job_manager.submit(user_id, "trip_plan", run, callback_url=request.callback_url)
+    except QueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Trip planner is busy. Please try again shortly.",
+            headers={"Retry-After": "30"},
+        )
+    except JobQueueNotRunning:
+        raise HTTPException(status_code=503, detail="Job queue is not available")
+
+    logger.info("Queued trip plan job %s: %s for %d days by user %s",
+                job.id, request.destination, request.duration_days, user_id)
+    return {
+        "success": True,
+        "data": {
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/api/jobs/{job.id}",
+        },
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    user_id: str = Depends(get_user_id),
+):
+    """Get the status (and, once finished, the result) of a background job."""
+    job = trip_job_manager.get(job_id)
+    # 404 rather than 403 for other users' jobs so ids cannot be probed
+    if job is None or job.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"success": True, "data": job.to_dict()}
+
+
+def _quick_response_data(answer: str) -> dict:
+    return {
+        "answer": answer,
+        "quick_response": True,
+        "agent": "SupportBot",
+    }
+
+
+async def _support_data(request: ChatMessage, user_id: str) -> dict:
+    """Answer a support message (non-streaming)."""
+    # Check for quick response first
+    quick = get_quick_response(request.message)
+    if quick:
+        return _quick_response_data(quick)
+
+    # Use the full agent
+    return await answer_question(
+        question=request.message,
+        context=request.context,
+        user_id=user_id,
+    )
+
+
 # Support Bot Endpoints
 @router.post("/chat/support")
 async def chat_support(
@@ -136,30 +378,30 @@ async def chat_support(
 
     Answers customer questions using RAG (knowledge base) when available.
     Handles FAQs, policies, booking questions, and general support.
+    Send `Accept: text/event-stream` to stream the answer as Server-Sent Events.
     """
     try:
-        ai_limiter.check(get_client_key(raw_request, user_id))
-        # Check for quick response first
-        quick = get_quick_response(request.message)
-        if quick:
-            return {
-                "success": True,
-                "data": {
-                    "answer": quick,
-                    "quick_response": True,
-                    "agent": "SupportBot",
-                },
-            }
-
-        # Use the full agent
-        result = await answer_question(
-            question=request.message,
-            context=request.context,
-            user_id=user_id,
-        )
-        return {"success": True, "data": result}
+        await ai_limiter.check(get_client_key(raw_request, user_id))
+        if wants_event_stream(raw_request):
+            quick = get_quick_response(request.message)
+            if quick:
+                _remember(user_id, "SupportBot", request.message, quick, request.context)
+                return event_stream_response(
+                    single_event({"event": "result", "data": _quick_response_data(quick)})
+                )
+            return event_stream_response(_remembering(stream_answer(
+                question=request.message,
+                context=request.context,
+                user_id=user_id,
+            ), user_id, "SupportBot", request.message, "answer", request.context))
+
+        data = await _support_data(request, user_id)
+        _remember(user_id, "SupportBot", request.message, data["answer"], request.context)
+        return {"success": True, "data": data}
     except HTTPException:
         raise
+    except AdmissionRejected as e:
+        raise _model_busy(e)
     except Exception as e:
         logger.error("Support chat failed: %s", str(e), exc_info=True)
         raise HTTPException(status_code=500, detail="An internal error occurred. Please try again.")
@@ -178,27 +420,32 @@ async def chat_recommend(
 
     The Recommender agent learns user preferences over time and
     provides increasingly personalized suggestions.
+    Send `Accept: text/event-stream` to stream the answer as Server-Sent Events.
     """
     try:
-        # Enforce ownership: JWT identity is the source of truth
-        effective_user_id = user_id
-        if user_id == "dev-user":
-            if not requested_user_id:
-                raise HTTPException(status_code=400, detail="user_id query parameter is required in dev mode")
-            effective_user_id = requested_user_id
-        elif requested_user_id and requested_user_id != user_id:
-            raise HTTPException(status_code=403, detail="Forbidden: cannot access another user's data")
-
-        ai_limiter.check(get_client_key(raw_request, effective_user_id))
+        effective_user_id = _resolve_user_id(user_id, requested_user_id)
+
+        await ai_limiter.check(get_client_key(raw_request, effective_user_id))
+        prompt = request.query or "Recommend destinations"
+        if wants_event_stream(raw_request):
+            return event_stream_response(_remembering(stream_recommendations(
+                user_id=effective_user_id,
+                query=request.query,
+                preferences=request.preferences,
+                num_recommendations=request.num_recommendations,
+            ), effective_user_id, "TravelRecommender", prompt, "recommendations"))
         result = await get_recommendations(
             user_id=effective_user_id,
             query=request.query,
             preferences=request.preferences,
             num_recommendations=request.num_recommendations,
         )
+        _remember(effective_user_id, "TravelRecommender", prompt, result.get("recommendations", result))
         return {"success": True, "data": result}
     except HTTPException:
         raise
+    except AdmissionRejected as e:
+        raise _model_busy(e)
     except Exception as e:
         logger.error("Recommendation failed: %s", str(e), exc_info=True)
         raise HTTPException(status_code=500, detail="An internal error occurred. Please try again.")
@@ -214,14 +461,7 @@ async def update_user_preferences(
     Update user preferences for better recommendations.
     """
     try:
-        # Enforce ownership: JWT identity is the source of truth
-        effective_user_id = user_id
-        if user_id == "dev-user":
-            if not requested_user_id:
-                raise HTTPException(status_code=400, detail="user_id query parameter is required in dev mode")
-            effective_user_id = requested_user_id
-        elif requested_user_id and requested_user_id != user_id:
-            raise HTTPException(status_code=403, detail="Forbidden: cannot access another user's data")
+        effective_user_id = _resolve_user_id(user_id, requested_user_id)
 
         result = await update_preferences(
             user_id=effective_user_id,
@@ -231,6 +471,8 @@ async def update_user_preferences(
         return {"success": True, "data": result}
     except HTTPException:
         raise
+    except AdmissionRejected as e:
+        raise _model_busy(e)
     except Exception as e:
         logger.error("Preference update failed: %s", str(e), exc_info=True)
         raise HTTPException(status_code=500, detail="An internal error occurred. Please try again.")
@@ -246,14 +488,7 @@ async def submit_feedback(
     Submit feedback about a destination for learning.
     """
     try:
-        # Enforce ownership: JWT identity is the source of truth
-        effective_user_id = user_id
-        if user_id == "dev-user":
-            if not requested_user_id:
-                raise HTTPException(status_code=400, detail="user_id query parameter is required in dev mode")
-            effective_user_id = requested_user_id
-        elif requested_user_id and requested_user_id != user_id:
-            raise HTTPException(status_code=403, detail="Forbidden: cannot access another user's data")
+        effective_user_id = _resolve_user_id(user_id, requested_user_id)
 
         result = await provide_feedback(
             user_id=effective_user_id,
@@ -264,31 +499,203 @@ async def submit_feedback(
         return {"success": True, "data": result}
     except HTTPException:
         raise
+    except AdmissionRejected as e:
+        raise _model_busy(e)
     except Exception as e:
         logger.error("Feedback submission failed: %s", str(e), exc_info=True)
         raise HTTPException(status_code=500, detail="An internal error occurred. Please try again.")
 
 
-# Conversation History (optional endpoint)
+# Batch Endpoint
+@router.post("/batch")
+async def chat_batch(
+    request: BatchRequest,
+    raw_request: Request,
+    user_id: str = Depends(get_user_id),
+    requested_user_id: Optional[str] = Query(default=None, alias="user_id"),
+):
+    """
+    Run several chat sub-requests (support, recommend, trip_plan) in one call.
+
+    The caller is authenticated once. Each sub-request counts against the AI
+    rate limit like a separate call (checked in request order), and at most
+    BATCH_MAX_PARALLEL of them run concurrently. Results come back in request
+    order; a failed item carries its own status and error instead of failing
+    the batch. The `user_id` query parameter applies to recommend items as on
+    `/chat/recommend`.
+    """
+    # Rate-limit every item up front, in order, so earlier items win when the quota runs out
+    client_key = get_client_key(raw_request, user_id)
+    rate_limited: list[Optional[HTTPException]] = []
+    for _ in request.requests:
+        try:
+            await ai_limiter.check(client_key)
+            rate_limited.append(None)
+        except HTTPException as e:
+            rate_limited.append(e)
+
+    semaphore = asyncio.Semaphore(BATCH_MAX_PARALLEL)
+
+    async def run(item) -> dict:
+        # Each item is recorded like the matching single-request route
+        if item.type == "support":
+            data = await _support_data(item, user_id)
+            _remember(user_id, "SupportBot", item.message, data["answer"], item.context)
+            return data
+        if item.type == "recommend":
+            effective_user_id = _resolve_user_id(user_id, requested_user_id)
+            result = await get_recommendations(
+                user_id=effective_user_id,
+                query=item.query,
+                preferences=item.preferences,
+                num_recommendations=item.num_recommendations,
+            )
+            _remember(effective_user_id, "TravelRecommender", item.query or "Recommend destinations",
+                      result.get("recommendations", result))
+            return result
+        data = await _trip_plan_data(item, user_id)
+        _remember(user_id, "TripPlanner", _trip_plan_prompt(item), data.get("plan", data))
+        return data
+
+    async def run_item(item, error: Optional[HTTPException]) -> dict:
+        if error is None:
+            try:
+                async with semaphore:
+                    with span("batch.item", {"batch.item_type": item.type}):
+                        data = await run(item)
+                return {"id": item.id, "type": item.type, "success": True, "status": 200, "data": data}
+            except HTTPException as e:
+                error = e
+            except AdmissionRejected as e:
+                error = _model_busy(e)
+            except Exception as e:
+                logger.error("Batch %s item failed: %s", item.type, str(e), exc_info=True)
+                error = HTTPException(status_code=500, detail="An internal error occurred. Please try again.")
+
+        retry_after = (error.headers or {}).get("Retry-After")
+        return {
+            "id": item.id,
+            "type": item.type,
+            "success": False,
+            "status": error.status_code,
+            "error": {"detail": error.detail, "retry_after": int(retry_after) if retry_after else None},
+        }
+
+    results = await asyncio.gather(*(
+        run_item(item, limited) for item, limited in zip(request.requests, rate_limited)
+    ))
+    logger.info("Batch of %d by user %s: %d succeeded",
+                len(results), user_id, sum(r["success"] for r in results))
+    return {"success": True, "data": {"results": results}}
+
+
+# Conversation History
 @router.get("/conversations/{user_id}")
 async def get_conversations(
     user_id: str,
-    limit: int = 10,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+    agent: Optional[Literal["TripPlanner", "SupportBot", "TravelRecommender"]] = None,
     _current_user: str = Depends(get_user_id),
 ):
     """
-    Get conversation history for a user (if stored in database).
+    Get a user's conversation history, newest first.
+
+    Each entry is one chat turn (user message and agent reply). Pass the
+    returned `next_cursor` as `cursor` to fetch the next page; it is null on
+    the last page.
     """
     if user_id != _current_user and _current_user != "dev-user":
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    # This would connect to the agent_conversations table.
-    # For now, return a placeholder.
+    if not conversation_store.enabled:
+        return {
+            "success": True,
+            "data": {
+                "user_id": user_id,
+                "conversations": [],
+                "next_cursor": None,
+                "note": "Conversation history requires DATABASE_URL",
+            },
+        }
+
+    try:
+        conversations, next_cursor = await conversation_store.list_for_user(
+            user_id, limit=limit, cursor=cursor, agent_name=agent
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    except Exception as e:
+        logger.error("Conversation history lookup failed: %s", str(e), exc_info=True)
+        raise HTTPException(status_code=500, detail="An internal error occurred. Please try again.")
+
     return {
         "success": True,
         "data": {
             "user_id": user_id,
-            "conversations": [],
-            "note": "Conversation history requires database integration",
+            "conversations": conversations,
+            "next_cursor": next_cursor,
         },
     }
+
+
+# Shared destination research
+@router.get("/research/{destination}")
+async def get_research_status(
+    destination: str,
+    month: Optional[int] = Query(default=None, ge=1, le=12, description="Travel month (1-12)"),
+    _current_user: str = Depends(get_user_id),
+):
+    """
+    How old the cached research for a destination is.
+
+    Trip plans for this destination and month reuse it until it expires;
+    an admin can DELETE the same path to have it researched again.
+    """
+    key = canonical_destination(destination)
+    try:
+        entry = await research_cache.get(key, month or ANY_MONTH)
+    except Exception as e:
+        logger.error("Research cache lookup failed: %s", str(e), exc_info=True)
+        raise HTTPException(status_code=500, detail="An internal error occurred. Please try again.")
+
+    return {
+        "success": True,
+        "data": {
+            "destination": key,
+            "travel_month": month,
+            "cached": entry is not None,
+            "age_seconds": entry.age_seconds() if entry else None,
+            "expires_in_seconds": (
+                max(0, int(research_cache.ttl_seconds) - entry.age_seconds()) if entry else None
+            ),
+        },
+    }
+
+
+@router.delete("/research/{destination}")
+async def refresh_research(
+    destination: str,
+    raw_request: Request,
+    month: Optional[int] = Query(default=None, ge=1, le=12, description="Only this travel month"),
+    admin_id: str = Depends(require_admin),
+):
+    """
+    Drop cached research for a destination so the next trip plan researches it again.
+
+    Cached trip plans built on that research are dropped too. Admin or service
+    callers only: the research is shared by every user.
+    """
+    await general_limiter.check(get_client_key(raw_request, admin_id))
+    key = canonical_destination(destination)
+    try:
+        await research_cache.invalidate(key, month)
+    except Exception as e:
+        logger.error("Research cache invalidation failed: %s", str(e), exc_info=True)
+        raise HTTPException(status_code=500, detail="An internal error occurred. Please try again.")
+    plans = invalidate_plans(key, month)
+
+    return {
+        "success": True,
+        "data": {"destination": key, "travel_month": month, "invalidated": True, "plans_invalidated": plans},
+    }
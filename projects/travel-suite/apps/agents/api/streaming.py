@@ -0,0 +1,65 @@
+"""
+Server-Sent Events helpers for the chat routes.
+Clients opt in with `Accept: text/event-stream`; everyone else keeps the JSON response.
+"""
+import logging
+from typing import AsyncIterator
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from agents.admission import AdmissionRejected
+from api.encoding import dumps
+
+logger = logging.getLogger("gobuddy.streaming")
+
+EVENT_STREAM = "text/event-stream"
+
+
+def wants_event_stream(request: Request) -> bool:
+    """True if the client asked for an SSE response."""
+    return EVENT_STREAM in request.headers.get("accept", "")
+
+
+def format_sse(event: dict) -> str:
+    """Encode an agent event dict as one SSE frame (`event` names the frame)."""
+    name = event.get("event", "message")
+    payload = {k: v for k, v in event.items() if k != "event"}
+    return f"event: {name}\ndata: {dumps(payload).decode()}\n\n"
+
+
+async def _encode(events: AsyncIterator[dict]) -> AsyncIterator[str]:
+    try:
+        async for event in events:
+            yield format_sse(event)
+    except AdmissionRejected as e:
+        logger.warning("Shedding event stream: %s", e)
+        yield format_sse({
+            "event": "error",
+            "detail": "The assistant is busy. Please try again shortly.",
+            "retry_after": e.retry_after,
+        })
+    except Exception as e:
+        # Headers are already sent, so errors are reported in-band
+        logger.error("Event stream failed: %s", str(e), exc_info=True)
+        yield format_sse(
+            {"event": "error", "detail": "An internal error occurred. Please try again."}
+        )
+
+
+async def single_event(event: dict) -> AsyncIterator[dict]:
+    """Wrap an already-computed result (e.g. a quick response) as a one-event stream."""
+    yield event
+
+
+def event_stream_response(events: AsyncIterator[dict]) -> StreamingResponse:
+    """Stream agent events to the client as SSE frames."""
+    return StreamingResponse(
+        _encode(events),
+        media_type=EVENT_STREAM,
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop nginx-style proxies from buffering the stream
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -0,0 +1,132 @@
+"""
+In-process cache of verified token identities for GoBuddy AI Agents.
+Clients reuse one access token across many chat turns; caching the verified
+identity avoids re-verifying it on every request.
+"""
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+# The identity handed to routes, cached or not: these fields only, so the memory
+# ceiling stays predictable no matter how much user_metadata a user carries.
+# app_metadata is kept because authorization reads it and only the service role
+# can write it.
+IDENTITY_FIELDS = ("id", "sub", "email", "phone", "role", "aud", "app_metadata", "exp")
+
+
+def to_identity(user: dict) -> dict:
+    """The verified user payload reduced to IDENTITY_FIELDS."""
+    return {k: user[k] for k in IDENTITY_FIELDS if user.get(k) is not None}
+
+
+class TokenCache:
+    """
+    Bounded LRU+TTL cache keyed by the SHA-256 digest of the token.
+
+    Raw tokens are never stored. Positive entries expire after `ttl_seconds`
+    or at the token's `exp`, whichever comes first. Rejected tokens are kept in
+    a separate, smaller negative cache so a flood of bad tokens cannot evict
+    legitimate users or grow memory past `max_entries + max_negative_entries`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        ttl_seconds: float = 120,
+        max_negative_entries: int = 2_000,
+        negative_ttl_seconds: float = 30,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_negative_entries = max_negative_entries
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._entries: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self._rejected: OrderedDict[bytes, float] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """
+        Return the cached identity for a token, or None.
+
+        A recently rejected token is not counted as a miss; `is_rejected`
+        counts it as a negative hit instead.
+        """
+        key = self._key(token)
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, identity = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(identity)
+            del self._entries[key]
+        if self._rejected.get(key, 0) <= now:
+            self.misses += 1
+        return None
+
+    def is_rejected(self, token: str) -> bool:
+        """True if the token failed verification within the negative TTL."""
+        key = self._key(token)
+        expires_at = self._rejected.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            del self._rejected[key]
+            return False
+        self.negative_hits += 1
+        return True
+
+    def put(self, token: str, identity: dict, exp: Optional[float] = None) -> None:
+        """Cache a verified identity, never beyond the token's own expiry."""
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= now or self.max_entries <= 0:
+            return
+
+        key = self._key(token)
+        self._entries[key] = (expires_at, to_identity(identity))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def reject(self, token: str) -> None:
+        """Remember a token that failed verification for a short while."""
+        if self.max_negative_entries <= 0:
+            return
+        key = self._key(token)
+        self._rejected[key] = time.time() + self.negative_ttl_seconds
+        self._rejected.move_to_end(key)
+        while len(self._rejected) > self.max_negative_entries:
+            self._rejected.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._rejected.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current sizes."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "negative_entries": len(self._rejected),
+            "max_entries": self.max_entries,
+            "max_negative_entries": self.max_negative_entries,
+        }
@@ -0,0 +1,75 @@
+"""
+Request tracing middleware.
+Assigns every HTTP request an id (honouring a sane inbound X-Request-ID),
+opens the root span for it and echoes the id back in the response.
+"""
+import re
+import uuid
+from contextlib import nullcontext
+
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from agents.tracing import recording, request_id_var, tracer
+
+REQUEST_ID_HEADER = b"x-request-id"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+def _request_id(scope) -> str:
+    for name, value in scope.get("headers", []):
+        if name == REQUEST_ID_HEADER:
+            supplied = value.decode("latin-1")
+            if _VALID_REQUEST_ID.match(supplied):
+                return supplied
+            break
+    return uuid.uuid4().hex
+
+
+class RequestTracingMiddleware:
+    """Pure ASGI middleware: one server span per request, tagged with the request id."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _request_id(scope)
+        token = request_id_var.set(request_id)
+        method = scope["method"]
+        # Without an exporter the span would be thrown away, so none is created
+        traced = recording()
+        if traced:
+            server_span = tracer.start_span(
+                f"{method} request",
+                kind=SpanKind.SERVER,
+                attributes={"http.request.method": method, "url.path": scope["path"], "request.id": request_id},
+            )
+        else:
+            server_span = trace.INVALID_SPAN
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                server_span.set_attribute("http.response.status_code", status)
+                if status >= 500:
+                    server_span.set_status(Status(StatusCode.ERROR))
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (REQUEST_ID_HEADER, request_id.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            with trace.use_span(server_span, end_on_exit=False) if traced else nullcontext():
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            if route is not None and traced:
+                server_span.update_name(f"{method} {route.path}")
+                server_span.set_attribute("http.route", route.path)
+            server_span.end()
+            request_id_var.reset(token)
@@ -0,0 +1 @@
+"""Micro-benchmarks for GoBuddy AI Agents (run from apps/agents with `python -m benchmarks.<name>`)."""
@@ -0,0 +1,128 @@
+"""
+Micro-benchmark for response encoding of a structured trip plan.
+
+Builds a realistic 14-day TripItinerary (5 activities and 3 meals a day) and
+compares encode time and bytes on the wire for stdlib json, orjson and
+MessagePack, each raw and with gzip / brotli at the configured levels.
+Generated text repeats more than a real plan, so compression ratios here are
+on the optimistic side; encode times are representative.
+
+    cd apps/agents && python -m benchmarks.encoding [--days 14] [--rounds 200]
+"""
+import argparse
+import gzip
+import json
+import time
+
+import orjson
+
+from agents.trip_planner import Activity, DayPlan, TripItinerary
+from api.encoding import COMPRESSION_BROTLI_QUALITY, COMPRESSION_GZIP_LEVEL, brotli, dumps, msgpack
+
+THEMES = ["Old Town & Markets", "Temples and Rice Terraces", "Beach Day", "Volcano Sunrise Hike",
+          "Cooking Class & Food Crawl", "Island Hopping", "Museums & Galleries"]
+SLOTS = [("08:00", 90), ("10:00", 150), ("13:00", 60), ("15:00", 120), ("19:00", 120)]
+
+
+def sample_itinerary(days: int) -> TripItinerary:
+    plans = []
+    for day in range(1, days + 1):
+        theme = THEMES[day % len(THEMES)]
+        activities = [
+            Activity(
+                time=start,
+                title=f"{theme} stop {slot + 1}",
+                description=(
+                    f"Explore the highlights of {theme.lower()} with a local guide; "
+                    "arrive early to avoid crowds and bring cash for small vendors."
+                ),
+                duration_minutes=minutes,
+                location=f"Ubud district, venue {day}-{slot + 1}",
+                cost_estimate=round(12.5 * (slot + 1) + day, 2),
+            )
+            for slot, (start, minutes) in enumerate(SLOTS)
+        ]
+        plans.append(DayPlan(
+            day_number=day,
+            date=f"2026-07-{day:02d}",
+            theme=theme,
+            activities=activities,
+            meals=["Warung breakfast near the hotel", "Nasi campur at a local market",
+                   "Seafood dinner on Jimbaran beach"],
+            notes="Wear modest clothing for temple visits; sarongs are usually provided.",
+        ))
+    return TripItinerary(
+        destination="Bali, Indonesia",
+        duration_days=days,
+        total_budget=2800.0,
+        best_time_to_visit="April to October (dry season)",
+        days=plans,
+        packing_tips=["Light rain jacket", "Reef-safe sunscreen", "Sarong for temples"],
+        local_tips=["Use Grab or Gojek for short rides", "Agree on prices before boat trips"],
+    )
+
+
+def _time_us(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def run(days: int, rounds: int) -> list[dict]:
+    # The shape routes return: the model is dumped to plain Python first
+    payload = {"success": True, "data": sample_itinerary(days).model_dump()}
+
+    encoders = {
+        "json (stdlib)": lambda: json.dumps(payload, default=str).encode(),
+        "orjson": lambda: dumps(payload),
+    }
+    if msgpack is not None:
+        encoders["msgpack"] = lambda: msgpack.packb(payload, default=str, use_bin_type=True)
+
+    compressors = {
+        "raw": lambda body: body,
+        f"gzip-{COMPRESSION_GZIP_LEVEL}": lambda body: gzip.compress(
+            body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0
+        ),
+    }
+    if brotli is not None:
+        compressors[f"br-{COMPRESSION_BROTLI_QUALITY}"] = lambda body: brotli.compress(
+            body, quality=COMPRESSION_BROTLI_QUALITY
+        )
+
+    results = []
+    for name, encode in encoders.items():
+        encode_us = _time_us(encode, rounds)
+        body = encode()
+        for coding, compress in compressors.items():
+            compress_us = 0.0 if coding == "raw" else _time_us(lambda: compress(body), rounds)
+            results.append({
+                "format": name,
+                "coding": coding,
+                "bytes": len(compress(body)),
+                "encode_us": encode_us,
+                "total_us": encode_us + compress_us,
+            })
+    # Sanity check: orjson and stdlib json describe the same document
+    assert orjson.loads(dumps(payload)) == json.loads(json.dumps(payload, default=str))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    results = run(args.days, args.rounds)
+    baseline = results[0]["bytes"]
+    print(f"{args.days}-day TripItinerary response, mean of {args.rounds} rounds")
+    print(f"  {'format':<14} {'coding':<8} {'bytes':>8} {'vs json':>8} {'encode':>10} {'encode+compress':>16}")
+    for r in results:
+        print(f"  {r['format']:<14} {r['coding']:<8} {r['bytes']:>8,} {r['bytes'] / baseline:>7.0%} "
+              f"{r['encode_us']:>8.0f}us {r['total_us']:>14.0f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Deterministic stand-ins for OpenAIChat and DuckDuckGoTools, for load tests.
+
+`install_fakes()` swaps them in at the agno import paths the agent builders
+use, so every agent built afterwards talks to FakeChat instead of OpenAI.
+FakeChat sleeps (asynchronously on the async paths) to simulate time to first
+token and per-token generation, reports token usage like a real model, and
+answers JSON-mode requests with a sample of the requested schema.
+"""
+import json
+import math
+import time
+import asyncio
+import hashlib
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterator, Optional
+from unittest.mock import patch
+
+from agno.models.base import Model
+from agno.models.message import Message
+from agno.models.response import ModelResponse
+from agno.tools import Toolkit
+
+WORDS = (
+    "explore the old town early then take a scooter to the rice terraces for sunset and "
+    "try the night market for local dishes budget around forty dollars a day for food"
+).split()
+
+
+@dataclass
+class FakeLLMConfig:
+    """Latency and size of fake model responses."""
+
+    ttft_ms: float = 300.0
+    token_ms: float = 5.0
+    output_tokens: int = 120
+    # Sample JSON answers for JSON-mode requests: {schema name: payload}
+    json_samples: dict[str, dict] = field(default_factory=dict)
+
+    def generation_seconds(self) -> float:
+        return (self.ttft_ms + self.token_ms * self.output_tokens) / 1000
+
+
+def default_json_samples() -> dict[str, dict]:
+    from benchmarks.encoding import sample_itinerary
+
+    # As long as the longest load-test trip; shorter trips are trimmed by the itinerary repair
+    itinerary = sample_itinerary(7)
+    outline = {
+        "total_budget": itinerary.total_budget,
+        "best_time_to_visit": itinerary.best_time_to_visit,
+        "days": [{"day_number": day.day_number, "theme": day.theme, "area": "Ubud"} for day in itinerary.days],
+        "packing_tips": itinerary.packing_tips,
+        "local_tips": itinerary.local_tips,
+    }
+    return {"TripItinerary": itinerary.model_dump(), "TripOutline": outline}
+
+
+@dataclass
+class FakeChat(Model):
+    """agno Model that never leaves the process. Tool calls are never requested."""
+
+    id: str = "fake"
+    name: str = "FakeChat"
+    provider: str = "Fake"
+    config: FakeLLMConfig = field(default_factory=FakeLLMConfig)
+
+    def _reply(self, messages: list[Message]) -> str:
+        if isinstance(self.response_format, dict) and self.response_format.get("type") == "json_object":
+            system = " ".join(str(m.content) for m in messages if m.role == "system")
+            # agno puts the response model's fields in the system prompt; answer with the sample
+            # that matches (the most specific one when a larger schema contains a smaller one)
+            matches = [sample for sample in self.config.json_samples.values() if all(key in system for key in sample)]
+            return json.dumps(max(matches, key=len)) if matches else "{}"
+        # Seeded by the prompt so identical requests get identical answers
+        prompt = str(messages[-1].content) if messages else ""
+        offset = int(hashlib.sha1(prompt.encode()).hexdigest(), 16) % len(WORDS)
+        return " ".join(WORDS[(offset + i) % len(WORDS)] for i in range(self.config.output_tokens))
+
+    def _finish(self, messages: list[Message], content: str, started: float) -> None:
+        input_tokens = sum(len(str(m.content or "")) for m in messages) // 4
+        messages.append(Message(
+            role="assistant",
+            content=content,
+            metrics={
+                "input_tokens": input_tokens,
+                "output_tokens": self.config.output_tokens,
+                "total_tokens": input_tokens + self.config.output_tokens,
+                "time": time.perf_counter() - started,
+            },
+        ))
+
+    def _chunks(self, content: str) -> list[str]:
+        words = content.split(" ")
+        pieces = [words[0]] + [" " + word for word in words[1:]]
+        # Long replies (JSON samples) stream in output_tokens chunks, so a stream
+        # takes as long as the same reply unstreamed
+        size = math.ceil(len(pieces) / max(1, self.config.output_tokens))
+        return ["".join(pieces[i:i + size]) for i in range(0, len(pieces), size)]
+
+    # Raw provider calls: the fake has no provider payload, so these return the
+    # same ModelResponse objects as the response methods
+
+    def invoke(self, messages: list[Message]) -> ModelResponse:
+        return self.response(messages)
+
+    async def ainvoke(self, messages: list[Message]) -> ModelResponse:
+        return await self.aresponse(messages)
+
+    def invoke_stream(self, messages: list[Message]) -> Iterator[ModelResponse]:
+        return self.response_stream(messages)
+
+    async def ainvoke_stream(self, messages: list[Message]) -> AsyncIterator[ModelResponse]:
+        async for chunk in self.aresponse_stream(messages):
+            yield chunk
+
+    def response(self, messages: list[Message]) -> ModelResponse:
+        started = time.perf_counter()
+        time.sleep(self.config.generation_seconds())
+        content = self._reply(messages)
+        self._finish(messages, content, started)
+        return ModelResponse(content=content)
+
+    async def aresponse(self, messages: list[Message]) -> ModelResponse:
+        started = time.perf_counter()
+        await asyncio.sleep(self.config.generation_seconds())
+        content = self._reply(messages)
+        self._finish(messages, content, started)
+        return ModelResponse(content=content)
+
+    def response_stream(self, messages: list[Message]) -> Iterator[ModelResponse]:
+        started = time.perf_counter()
+        content = self._reply(messages)
+        time.sleep(self.config.ttft_ms / 1000)
+        for chunk in self._chunks(content):
+            time.sleep(self.config.token_ms / 1000)
+            yield ModelResponse(content=chunk)
+        self._finish(messages, content, started)
+
+    async def aresponse_stream(self, messages: list[Message]) -> AsyncIterator[ModelResponse]:
+        started = time.perf_counter()
+        content = self._reply(messages)
+        await asyncio.sleep(self.config.ttft_ms / 1000)
+        for chunk in self._chunks(content):
+            await asyncio.sleep(self.config.token_ms / 1000)
+            yield ModelResponse(content=chunk)
+        self._finish(messages, content, started)
+
+
+class FakeSearchTools(Toolkit):
+    """DuckDuckGoTools replacement returning canned results without network access."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(name="duckduckgo")
+        self.register(self.duckduckgo_search)
+        self.register(self.duckduckgo_news)
+
+    def duckduckgo_search(self, query: str, max_results: int = 5) -> str:
+        """Search the web for a query."""
+        return json.dumps([
+            {"title": f"{query} travel guide {i}", "href": f"https://example.com/{i}", "body": " ".join(WORDS[:20])}
+            for i in range(max_results)
+        ])
+
+    def duckduckgo_news(self, query: str, max_results: int = 5) -> str:
+        """Search recent news for a query."""
+        return self.duckduckgo_search(query, max_results)
+
+
+def _fake_chat_factory(config: FakeLLMConfig):
+    def OpenAIChat(id: str = "gpt-4o", response_format=None, **kwargs) -> FakeChat:
+        # Keep the real model id so per-model admission gates behave as in production
+        return FakeChat(id=id, response_format=response_format, config=config)
+
+    return OpenAIChat
+
+
+@contextmanager
+def install_fakes(config: Optional[FakeLLMConfig] = None):
+    """Route agents built inside this block to FakeChat and FakeSearchTools."""
+    config = config or FakeLLMConfig()
+    if not config.json_samples:
+        config.json_samples = default_json_samples()
+    with patch("agno.models.openai.OpenAIChat", _fake_chat_factory(config)), \
+         patch("agno.tools.duckduckgo.DuckDuckGoTools", FakeSearchTools):
+        yield config
@@ -0,0 +1,366 @@
+"""
+Offline load test for the agents API.
+
+Serves the real app with uvicorn on localhost, with auth (local HS256 JWTs)
+and rate limiting enabled, and every agent backed by benchmarks.fake_llm
+instead of OpenAI / DuckDuckGo. Workers replay a weighted mix of all routes
+for a fixed duration and report per-route p50/p95/p99 and throughput, plus
+event-loop lag measured inside the server: anything that blocks the loop
+shows up there and in the latency of the cheap routes (health, jobs).
+
+    cd apps/agents && python -m benchmarks.loadtest [--duration 30] [--concurrency 50]
+        [--ttft-ms 300] [--token-ms 5] [--output-tokens 120] [--json report.json]
+        [--max-loop-lag-ms 100] [--max-error-rate 0.01]
+
+Exits non-zero when a --max-* threshold is exceeded, so CI can gate on it.
+"""
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import logging
+import socket
+import asyncio
+import argparse
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+import httpx
+import jwt
+
+SUPABASE_URL = "http://supabase.loadtest.invalid"
+JWT_SECRET = "loadtest-secret-" + uuid.uuid4().hex
+LAG_INTERVAL_SECONDS = 0.01
+
+
+def configure_env() -> None:
+    """Production-like settings; must run before the app is imported."""
+    os.environ.update({
+        "ENV": "loadtest",
+        "OPENAI_API_KEY": "fake",
+        "ALLOW_DEV_AUTH_BYPASS": "false",
+        "AUTH_VERIFY_MODE": "local",
+        "SUPABASE_URL": SUPABASE_URL,
+        "SUPABASE_ANON_KEY": "loadtest-anon-key",
+        "SUPABASE_JWT_SECRET": JWT_SECRET,
+        "AGENT_WARMUP": "background",
+        "TRACING_EXPORTER": "none",
+    })
+    os.environ.pop("DISABLE_RATE_LIMIT", None)
+    os.environ.pop("DATABASE_URL", None)
+
+
+def make_token(user_id: str) -> str:
+    return jwt.encode(
+        {
+            "sub": user_id,
+            "role": "authenticated",
+            "aud": "authenticated",
+            "iss": f"{SUPABASE_URL}/auth/v1",
+            "exp": int(time.time()) + 3600,
+        },
+        JWT_SECRET,
+        algorithm="HS256",
+    )
+
+
+DESTINATIONS = ["Bali", "Lisbon", "Kyoto", "Cusco", "Marrakech", "Hanoi", "Reykjavik", "Cape Town"]
+QUESTIONS = [
+    "Can I change the dates of my trip after booking?",
+    "Is travel insurance included in the package?",
+    "What happens if my flight is delayed and I miss the pickup?",
+    "Do you offer vegetarian meals on guided tours?",
+]
+
+
+def _trip(rng: random.Random, structured: bool = False) -> dict:
+    return {
+        "destination": rng.choice(DESTINATIONS),
+        "duration_days": rng.randint(2, 7),
+        "budget": rng.choice([None, 1500, 3000]),
+        "interests": rng.sample(["food", "hiking", "history", "beaches", "nightlife"], 2),
+        "structured": structured,
+    }
+
+
+Request = Callable[[httpx.AsyncClient, str, str, random.Random], Awaitable[httpx.Response]]
+
+
+async def _stream(client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+    async with client.stream("POST", url, headers={**kwargs.pop("headers"), "Accept": "text/event-stream"}, **kwargs) as response:
+        async for _ in response.aiter_bytes():
+            pass
+    return response
+
+
+# Recently submitted jobs and their owner's auth headers, polled by job_status
+_submitted_jobs: list[tuple[str, dict]] = []
+
+
+async def _submit_job(client: httpx.AsyncClient, auth: dict, rng: random.Random) -> httpx.Response:
+    response = await client.post("/api/jobs/trip-planner", headers=auth, json=_trip(rng))
+    if response.status_code == 202:
+        _submitted_jobs.append((response.json()["data"]["status_url"], auth))
+        del _submitted_jobs[:-100]
+    return response
+
+
+async def _poll_job(client: httpx.AsyncClient, auth: dict, rng: random.Random) -> httpx.Response:
+    """One status check of a recent job, as its owner polling for the result would."""
+    if not _submitted_jobs:
+        return await _submit_job(client, auth, rng)
+    status_url, owner_auth = rng.choice(_submitted_jobs)
+    return await client.get(status_url, headers=owner_auth)
+
+
+SCENARIOS: dict[str, tuple[int, Request]] = {
+    "support": (25, lambda c, user, auth, rng: c.post(
+        "/api/chat/support", headers=auth, json={"message": rng.choice(QUESTIONS)})),
+    "support_stream": (10, lambda c, user, auth, rng: _stream(
+        c, "/api/chat/support", headers=auth, json={"message": rng.choice(QUESTIONS)})),
+    "recommend": (15, lambda c, user, auth, rng: c.post(
+        "/api/chat/recommend", headers=auth, json={"query": f"somewhere like {rng.choice(DESTINATIONS)}"})),
+    "recommend_stream": (5, lambda c, user, auth, rng: _stream(
+        c, "/api/chat/recommend", headers=auth, json={"query": "a quiet beach week"})),
+    "trip_plan": (10, lambda c, user, auth, rng: c.post(
+        "/api/chat/trip-planner", headers=auth, json=_trip(rng))),
+    "trip_plan_structured": (3, lambda c, user, auth, rng: c.post(
+        "/api/chat/trip-planner", headers=auth, json=_trip(rng, structured=True))),
+    "trip_plan_stream": (5, lambda c, user, auth, rng: _stream(
+        c, "/api/chat/trip-planner", headers=auth, json=_trip(rng))),
+    "trip_structured_stream": (2, lambda c, user, auth, rng: _stream(
+        c, "/api/chat/trip-planner", headers=auth, json=_trip(rng, structured=True))),
+    "trip_plan_job": (3, lambda c, user, auth, rng: _submit_job(c, auth, rng)),
+    "job_status": (6, lambda c, user, auth, rng: _poll_job(c, auth, rng)),
+    "batch": (4, lambda c, user, auth, rng: c.post(
+        "/api/batch", headers=auth, json={"requests": [
+            {"type": "support", "message": rng.choice(QUESTIONS)},
+            {"type": "recommend", "query": "mountains"},
+        ]})),
+    "preferences": (3, lambda c, user, auth, rng: c.post(
+        "/api/recommend/preferences", headers=auth,
+        json={"preference_type": "interests", "preference_value": "food"})),
+    "feedback": (2, lambda c, user, auth, rng: c.post(
+        "/api/recommend/feedback", headers=auth,
+        json={"destination": rng.choice(DESTINATIONS), "feedback": "Loved it", "rating": 5})),
+    "conversations": (5, lambda c, user, auth, rng: c.get(
+        f"/api/conversations/{user}", headers=auth)),
+    "health": (10, lambda c, user, auth, rng: c.get("/api/health")),
+}
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0-100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def _summary(values: list[float]) -> dict:
+    return {
+        "p50_ms": round(percentile(values, 50), 1),
+        "p95_ms": round(percentile(values, 95), 1),
+        "p99_ms": round(percentile(values, 99), 1),
+        "max_ms": round(max(values, default=0.0), 1),
+    }
+
+
+@dataclass
+class Server:
+    """The app under uvicorn in a background thread, with a loop-lag probe on its loop."""
+
+    port: int
+    lag_ms: list[float]
+    thread: threading.Thread
+    server: object
+
+    @classmethod
+    def start(cls) -> "Server":
+        import uvicorn
+        from main import app
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+
+        lag_ms: list[float] = []
+
+        server = uvicorn.Server(uvicorn.Config(
+            app, host="127.0.0.1", port=port, log_level="warning", access_log=False
+        ))
+
+        async def probe_lag() -> None:
+            loop = asyncio.get_running_loop()
+            while True:
+                started = loop.time()
+                await asyncio.sleep(LAG_INTERVAL_SECONDS)
+                lag_ms.append(max(0.0, (loop.time() - started - LAG_INTERVAL_SECONDS) * 1000))
+
+        async def serve() -> None:
+            probe = asyncio.create_task(probe_lag())
+            try:
+                await server.serve()
+            finally:
+                probe.cancel()
+
+        thread = threading.Thread(target=asyncio.run, args=(serve(),), name="loadtest-server", daemon=True)
+        thread.start()
+        deadline = time.monotonic() + 30
+        while not server.started:
+            if time.monotonic() > deadline or not thread.is_alive():
+                raise RuntimeError("server did not start")
+            time.sleep(0.05)
+        return cls(port=port, lag_ms=lag_ms, thread=thread, server=server)
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60) -> bool:
+    """Wait for /readyz (knowledge loaded, agents warmed up)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if (await client.get("/readyz")).status_code == 200:
+            return True
+        await asyncio.sleep(0.2)
+    return False
+
+
+async def drive(
+    base_url: str,
+    duration: float,
+    concurrency: int,
+    users: int,
+    seed: int,
+) -> dict:
+    rng = random.Random(seed)
+    user_ids = [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(users)]
+    headers = {user: {"Authorization": f"Bearer {make_token(user)}"} for user in user_ids}
+    names = list(SCENARIOS)
+    weights = [SCENARIOS[name][0] for name in names]
+
+    latencies: dict[str, list[float]] = defaultdict(list)
+    statuses: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    next_user = iter(range(10**9))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        ready = await wait_ready(client)
+        started = time.perf_counter()
+        stop_at = started + duration
+
+        async def worker(worker_id: int) -> None:
+            worker_rng = random.Random(seed + worker_id)
+            while time.perf_counter() < stop_at:
+                name = worker_rng.choices(names, weights)[0]
+                # Spread requests over users so per-user rate limits reflect real traffic
+                user = user_ids[next(next_user) % users]
+                request_started = time.perf_counter()
+                try:
+                    response = await SCENARIOS[name][1](client, user, headers[user], worker_rng)
+                    status = str(response.status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies[name].append((time.perf_counter() - request_started) * 1000)
+                statuses[name][status] += 1
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    total = sum(len(v) for v in latencies.values())
+    errors = sum(
+        count for route in statuses.values() for status, count in route.items()
+        if not status.isdigit() or (int(status) >= 500 and status != "503")
+    )
+    return {
+        "ready": ready,
+        "duration_s": round(elapsed, 2),
+        "concurrency": concurrency,
+        "users": users,
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 1),
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "overall": _summary([v for values in latencies.values() for v in values]),
+        "routes": {
+            name: {
+                "count": len(latencies[name]),
+                "rps": round(len(latencies[name]) / elapsed, 1),
+                "status": dict(sorted(statuses[name].items())),
+                **_summary(latencies[name]),
+            }
+            for name in names if latencies[name]
+        },
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"{report['requests']:,} requests in {report['duration_s']}s "
+          f"({report['throughput_rps']} req/s) at concurrency {report['concurrency']}, "
+          f"{report['users']} users; error rate {report['error_rate']:.2%}")
+    if not report["ready"]:
+        print("  warning: /readyz never returned 200; support answers may be degraded")
+    print(f"  {'route':<22} {'count':>6} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8}  status")
+    rows = [("overall", {"count": report["requests"], "rps": report["throughput_rps"], **report["overall"]})]
+    rows += list(report["routes"].items())
+    for name, r in rows:
+        status = " ".join(f"{code}x{n}" for code, n in r.get("status", {}).items())
+        print(f"  {name:<22} {r['count']:>6} {r['rps']:>7} {r['p50_ms']:>6.0f}ms "
+              f"{r['p95_ms']:>6.0f}ms {r['p99_ms']:>6.0f}ms  {status}")
+    lag = report["loop_lag"]
+    print(f"  event-loop lag: p50 {lag['p50_ms']}ms  p99 {lag['p99_ms']}ms  max {lag['max_ms']}ms")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=2000, help="distinct JWT identities")
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=5)
+    parser.add_argument("--output-tokens", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--max-loop-lag-ms", type=float, help="fail if server loop lag p99 exceeds this")
+    parser.add_argument("--max-error-rate", type=float, help="fail if the unexpected-error rate exceeds this")
+    args = parser.parse_args(argv)
+
+    configure_env()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    from benchmarks.fake_llm import FakeLLMConfig, install_fakes
+
+    config = FakeLLMConfig(ttft_ms=args.ttft_ms, token_ms=args.token_ms, output_tokens=args.output_tokens)
+    with install_fakes(config):
+        server = Server.start()
+        try:
+            report = asyncio.run(drive(
+                f"http://127.0.0.1:{server.port}", args.duration, args.concurrency, args.users, args.seed
+            ))
+        finally:
+            server.stop()
+    report["fake_llm"] = {"ttft_ms": args.ttft_ms, "token_ms": args.token_ms, "output_tokens": args.output_tokens}
+    report["loop_lag"] = _summary(server.lag_ms)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    if args.max_loop_lag_ms is not None and report["loop_lag"]["p99_ms"] > args.max_loop_lag_ms:
+        failures.append(f"event-loop lag p99 {report['loop_lag']['p99_ms']}ms > {args.max_loop_lag_ms}ms")
+    if args.max_error_rate is not None and report["error_rate"] > args.max_error_rate:
+        failures.append(f"error rate {report['error_rate']:.2%} > {args.max_error_rate:.2%}")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
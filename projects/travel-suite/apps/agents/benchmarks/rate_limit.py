@@ -0,0 +1,86 @@
+"""
+Micro-benchmark for api.rate_limit.RateLimiter (in-memory backend).
+
+Measures `check()` cost and tracked-state memory at 100k distinct keys, plus
+the cost of evicting them once they go idle.
+
+    cd apps/agents && python -m benchmarks.rate_limit [--keys 100000] [--rounds 3]
+"""
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+from unittest.mock import patch
+
+import api.rate_limit as rate_limit
+from api.rate_limit import RateLimiter
+
+
+def _per_call_ns(elapsed: float, calls: int) -> float:
+    return elapsed / calls * 1e9
+
+
+async def run(num_keys: int, rounds: int) -> dict:
+    rate_limit.RATE_LIMIT_DISABLED = False
+    keys = [f"user:{i:08d}" for i in range(num_keys)]
+    limiter = RateLimiter(requests_per_minute=10_000, requests_per_hour=100_000)
+
+    start = time.perf_counter()
+    for key in keys:
+        await limiter.check(key)
+    insert_elapsed = time.perf_counter() - start
+
+    # Memory is measured on a separate limiter: tracemalloc skews timings.
+    measured = RateLimiter(requests_per_minute=10_000, requests_per_hour=100_000)
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for key in keys:
+        await measured.check(key)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del measured
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for key in keys:
+            await limiter.check(key)
+    steady_elapsed = time.perf_counter() - start
+
+    # Jump past the idle horizon: the next check evicts every stale key.
+    future = time.time() + 2 * 3600 + 1
+    with patch("api.rate_limit.time.time", return_value=future):
+        start = time.perf_counter()
+        await limiter.check("user:fresh")
+        evict_elapsed = time.perf_counter() - start
+
+    return {
+        "keys": num_keys,
+        "first_check_ns": _per_call_ns(insert_elapsed, num_keys),
+        "steady_check_ns": _per_call_ns(steady_elapsed, num_keys * rounds),
+        "state_bytes_total": after - before,
+        "state_bytes_per_key": (after - before) / num_keys,
+        "evict_all_ms": evict_elapsed * 1e3,
+        "keys_after_evict": len(limiter.backend),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.keys, args.rounds))
+    print(f"RateLimiter.check() with {result['keys']:,} distinct keys")
+    print(f"  first check (new key):    {result['first_check_ns']:8.0f} ns/call")
+    print(f"  steady-state check:       {result['steady_check_ns']:8.0f} ns/call")
+    print(f"  tracked state:            {result['state_bytes_total'] / 2**20:8.1f} MiB "
+          f"({result['state_bytes_per_key']:.0f} B/key incl. namespaced key)")
+    print(f"  evict all idle keys:      {result['evict_all_ms']:8.1f} ms "
+          f"(keys left: {result['keys_after_evict']})")
+
+
+if __name__ == "__main__":
+    main()
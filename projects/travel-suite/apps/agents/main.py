@@ -3,10 +3,12 @@ GoBuddy AI Agents - FastAPI Server
 Multi-agent travel assistance powered by Agno framework
 """
 import os
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 # Load environment variables
@@ -20,29 +22,59 @@ logging.basicConfig(
 )
 logger = logging.getLogger("gobuddy")
 
-# Import agents
-from agents.trip_planner import trip_planner_team
-from agents.support_bot import support_agent
-from agents.recommender import recommender_agent
+# Agents themselves are built lazily (see agents/lazy.py), so these imports stay cheap
 from api.routes import router
+from api.http_client import init_http_client, close_http_client
+from api.db import init_db_pool, close_db_pool
+from api.conversations import conversation_store
+from api.rate_limit import rate_limit_backend
+from api.auth import token_cache
+from api.jobs import trip_job_manager
+from api.encoding import CompressionMiddleware, FastJSONResponse
+from api.metrics import MetricsMiddleware, router as metrics_router
+from api.tracing import RequestTracingMiddleware
+from agents.admission import admission
+from agents.research import research_cache
+from agents.trip_planner import plan_cache
+from agents.lazy import agent_states, warm_up_agents, warmup_finished
+from agents.support_bot import knowledge_ready, knowledge_status
+
+# "background" builds agents right after startup without delaying it; "off" builds on first use
+AGENT_WARMUP = os.getenv("AGENT_WARMUP", "background").lower()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler for startup/shutdown events."""
-    # Startup: Load knowledge base for RAG
-    logger.info("Loading knowledge base...")
-    try:
-        from agents.support_bot import load_knowledge
-        await load_knowledge()
-        logger.info("Knowledge base loaded successfully")
-    except Exception as e:
-        logger.warning("Could not load knowledge base: %s", e)
+    # Startup: open the pooled HTTP client used for Supabase auth checks
+    await init_http_client()
+    # Postgres pool for conversation history and shared research (disabled without DATABASE_URL)
+    db_pool = await init_db_pool()
+    await conversation_store.start(db_pool)
+    await research_cache.start(db_pool)
+    await trip_job_manager.start()
+    warmup_task = asyncio.create_task(warm_up_agents()) if AGENT_WARMUP == "background" else None
+
+    # Load the RAG knowledge base in the background; the support bot runs
+    # degraded (quick responses only) and /readyz reports 503 until it is done
+    logger.info("Loading knowledge base in the background...")
+    from agents.support_bot import load_knowledge
+    knowledge_task = asyncio.create_task(load_knowledge())
 
     yield
 
     # Shutdown
     logger.info("Shutting down AI agents...")
+    knowledge_task.cancel()
+    if warmup_task is not None:
+        warmup_task.cancel()
+    await trip_job_manager.stop()
+    # Flush queued history writes before the pool goes away
+    await conversation_store.stop()
+    await research_cache.stop()
+    await close_db_pool()
+    await close_http_client()
+    await rate_limit_backend.close()
 
 
 # Create FastAPI app
@@ -51,6 +83,8 @@ app = FastAPI(
     description="AI-powered travel assistance with multi-agent collaboration",
     version="1.0.0",
     lifespan=lifespan,
+    # orjson bodies, or MessagePack for clients that send Accept: application/msgpack
+    default_response_class=FastJSONResponse,
 )
 
 # Build allowed origins from env vars (restrict in production)
@@ -65,12 +99,21 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=_allowed_origins,
     allow_credentials=True,
-    allow_methods=["GET", "POST", "OPTIONS"],
-    allow_headers=["Authorization", "Content-Type", "X-Client-Info", "apikey"],
+    allow_methods=["GET", "POST", "DELETE", "OPTIONS"],
+    allow_headers=["Authorization", "Content-Type", "X-Client-Info", "apikey", "X-Request-ID"],
+    expose_headers=["X-Request-ID"],
 )
 
+# brotli/gzip for large bodies (e.g. structured itineraries); SSE passes through
+app.add_middleware(CompressionMiddleware)
+# Outermost, so latency includes CORS handling and compression
+app.add_middleware(MetricsMiddleware)
+# Sets the request id (X-Request-ID) and root span before anything else runs
+app.add_middleware(RequestTracingMiddleware)
+
 # Include API routes
 app.include_router(router, prefix="/api")
+app.include_router(metrics_router)
 
 
 @app.get("/")
@@ -85,6 +128,20 @@ async def root():
             {"name": "Recommender", "endpoint": "/api/chat/recommend"},
         ],
         "health": "/api/health",
+        "liveness": "/livez",
+        "readiness": "/readyz",
+        "metrics": "/metrics",
+    }
+
+
+def _agent_summary() -> dict:
+    """Per-product agent state: ready | not_built | failed, or degraded for the support bot."""
+    states = agent_states()
+    support = states["support_agent"]["state"]
+    return {
+        "trip_planner": states["trip_planner_team"]["state"],
+        "support_bot": "degraded" if knowledge_status.state == "loading" else support,
+        "recommender": states["recommender_agent"]["state"],
     }
 
 
@@ -93,14 +150,45 @@ async def health_check():
     """Health check endpoint."""
     return {
         "status": "healthy",
-        "agents": {
-            "trip_planner": "ready",
-            "support_bot": "ready",
-            "recommender": "ready",
-        },
+        "agents": _agent_summary(),
+        "knowledge": knowledge_status.to_dict(),
+        # Per-model LLM concurrency gates: queue depth and wait times
+        "admission": admission.stats(),
+        "conversations": conversation_store.stats(),
+        "research_cache": research_cache.stats(),
+        # Hit rate of the normalized trip-plan keys
+        "plan_cache": plan_cache.stats(),
+        # Verified-JWT cache: hit rate and negative (rejected token) entries
+        "token_cache": token_cache.stats(),
     }
 
 
+@app.get("/livez")
+async def liveness():
+    """Liveness probe: the process is up and the event loop is responsive."""
+    return {"status": "alive"}
+
+
+@app.get("/readyz")
+async def readiness():
+    """
+    Readiness probe: 200 once the knowledge index is loaded and agent warm-up
+    has finished, 503 (with the same body) before that or if loading failed.
+    """
+    warming_up = AGENT_WARMUP == "background" and not warmup_finished()
+    ready = knowledge_ready() and not warming_up
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "agents": _agent_summary(),
+            "agent_builds": agent_states(),
+            "warmup": "off" if AGENT_WARMUP != "background" else ("done" if not warming_up else "running"),
+            "knowledge": knowledge_status.to_dict(),
+        },
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
 
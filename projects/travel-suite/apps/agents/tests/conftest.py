@@ -9,6 +9,44 @@ from unittest.mock import AsyncMock, MagicMock, patch
 os.environ["ENV"] = "test"
 os.environ["OPENAI_API_KEY"] = "test-key"
 os.environ["ALLOW_DEV_AUTH_BYPASS"] = "true"
+# Agents are built on demand in tests; no background warm-up thread
+os.environ["AGENT_WARMUP"] = "off"
+
+
+@pytest.fixture(autouse=True)
+def _reset_plan_cache():
+    """Cached team runs and research must not leak between tests."""
+    from agents.research import research_cache
+    from agents.trip_planner import plan_cache
+
+    plan_cache.clear()
+    research_cache.clear()
+    yield
+    plan_cache.clear()
+    research_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def _knowledge_ready():
+    """Tests run the support bot in normal mode unless they opt into degraded mode."""
+    from agents.support_bot import knowledge_status
+
+    saved = knowledge_status.to_dict()
+    knowledge_status.state = "ready"
+    yield knowledge_status
+    for field, value in saved.items():
+        setattr(knowledge_status, field, value)
+
+
+@pytest.fixture
+def spans():
+    """In-memory span exporter, emptied before each test that uses it."""
+    from agents.tracing import enable_memory_exporter
+
+    exporter = enable_memory_exporter()
+    exporter.clear()
+    yield exporter
+    exporter.clear()
 
 
 @pytest.fixture
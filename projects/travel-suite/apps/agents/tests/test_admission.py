@@ -0,0 +1,185 @@
+"""
+Tests for per-model LLM admission control.
+"""
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+
+from agents.admission import AdmissionController, AdmissionRejected, ModelGate, _parse_overrides
+
+
+class TestModelGate:
+    """Concurrency cap and bounded wait queue for one model."""
+
+    async def test_caps_concurrency(self):
+        gate = ModelGate("gpt-4o", max_concurrent=2, max_queue=10, max_wait_seconds=5)
+        running = 0
+        peak = 0
+
+        async def run():
+            nonlocal running, peak
+            await gate.acquire()
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            gate.release()
+
+        await asyncio.gather(*(run() for _ in range(6)))
+
+        assert peak == 2
+        stats = gate.stats()
+        assert stats["admitted"] == 6
+        assert stats["active"] == 0
+        assert stats["waiting"] == 0
+
+    async def test_rejects_when_queue_full(self):
+        gate = ModelGate("gpt-4o", max_concurrent=1, max_queue=1, max_wait_seconds=5)
+        await gate.acquire()
+        waiter = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as exc:
+            await gate.acquire()
+        assert exc.value.retry_after >= 1
+        assert gate.stats()["rejected"] == 1
+
+        gate.release()
+        await waiter
+        gate.release()
+
+    async def test_wait_times_out(self):
+        gate = ModelGate("gpt-4o", max_concurrent=1, max_queue=5, max_wait_seconds=0.01)
+        await gate.acquire()
+
+        with pytest.raises(AdmissionRejected):
+            await gate.acquire()
+
+        stats = gate.stats()
+        assert stats["timed_out"] == 1
+        assert stats["waiting"] == 0
+        gate.release()
+        assert gate.stats()["active"] == 0
+
+    async def test_waiters_admitted_in_fifo_order(self):
+        gate = ModelGate("gpt-4o", max_concurrent=1, max_queue=5, max_wait_seconds=5)
+        await gate.acquire()
+        order = []
+
+        async def run(i):
+            await gate.acquire()
+            order.append(i)
+            gate.release()
+
+        tasks = [asyncio.create_task(run(i)) for i in range(3)]
+        await asyncio.sleep(0)
+        gate.release()
+        await asyncio.gather(*tasks)
+
+        assert order == [0, 1, 2]
+
+    async def test_cancelled_waiter_leaves_queue(self):
+        gate = ModelGate("gpt-4o", max_concurrent=1, max_queue=5, max_wait_seconds=5)
+        await gate.acquire()
+        waiter = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        gate.release()
+        assert gate.stats()["active"] == 0
+        assert gate.stats()["waiting"] == 0
+
+
+class TestAdmissionController:
+    """Per-model gates and configuration."""
+
+    def test_parse_overrides(self):
+        assert _parse_overrides("gpt-4o=4, gpt-4o-mini=16") == {"gpt-4o": 4, "gpt-4o-mini": 16}
+        assert _parse_overrides("") == {}
+
+    async def test_models_have_independent_gates(self):
+        controller = AdmissionController(default_concurrency=1, default_queue=0)
+
+        async with controller.admit("gpt-4o"):
+            # A saturated gpt-4o must not block gpt-4o-mini
+            async with controller.admit("gpt-4o-mini"):
+                pass
+            with pytest.raises(AdmissionRejected):
+                async with controller.admit("gpt-4o"):
+                    pass
+
+        stats = controller.stats()
+        assert stats["gpt-4o"]["rejected"] == 1
+        assert stats["gpt-4o-mini"]["admitted"] == 1
+
+    def test_overrides_apply_per_model(self):
+        controller = AdmissionController(
+            default_concurrency=8, concurrency_overrides={"gpt-4o": 2}, queue_overrides={"gpt-4o": 4}
+        )
+        assert controller.gate_for("gpt-4o").max_concurrent == 2
+        assert controller.gate_for("gpt-4o").max_queue == 4
+        assert controller.gate_for("gpt-4o-mini").max_concurrent == 8
+
+
+class TestAgentRuntime:
+    """Agent calls go through the gate for their model."""
+
+    async def test_run_agent_uses_model_gate(self):
+        from agents.runtime import run_agent
+
+        controller = AdmissionController()
+        agent = SimpleNamespace(
+            model=SimpleNamespace(id="gpt-4o-mini"),
+            arun=AsyncMock(return_value=SimpleNamespace(content="ok")),
+        )
+        with patch("agents.runtime.admission", controller):
+            result = await run_agent(agent, "hi", user_id="u1")
+
+        assert result.content == "ok"
+        agent.arun.assert_awaited_once_with("hi", user_id="u1")
+        assert controller.stats()["gpt-4o-mini"]["admitted"] == 1
+
+    async def test_team_propagates_rejection(self):
+        from agents.trip_planner import TeamShim
+
+        agent = SimpleNamespace(name="Researcher", model=SimpleNamespace(id="gpt-4o-mini"))
+        team = TeamShim(name="t", agents=[agent], instructions=[])
+        with patch(
+            "agents.trip_planner.run_agent",
+            AsyncMock(side_effect=AdmissionRejected("gpt-4o-mini", 7)),
+        ):
+            with pytest.raises(AdmissionRejected):
+                await team.arun("plan")
+
+
+class TestAdmissionEndpoints:
+    """Shed requests surface as 503 with Retry-After."""
+
+    def test_support_chat_returns_503_when_busy(self):
+        from main import app
+
+        client = TestClient(app)
+        with patch(
+            "api.routes.answer_question",
+            AsyncMock(side_effect=AdmissionRejected("gpt-4o-mini", 12)),
+        ):
+            response = client.post(
+                "/api/chat/support",
+                json={"message": "Can you explain how travel insurance claims work in detail?"},
+            )
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "12"
+
+    def test_health_exposes_admission_stats(self):
+        from main import app
+
+        client = TestClient(app)
+        response = client.get("/api/health")
+
+        assert response.status_code == 200
+        assert "admission" in response.json()
@@ -26,6 +26,8 @@ class TestHealthEndpoint:
         data = response.json()
         assert data["status"] == "healthy"
         assert "agents" in data
+        assert set(data["plan_cache"]) >= {"hits", "misses", "coalesced", "hit_rate"}
+        assert set(data["token_cache"]) >= {"hits", "misses", "negative_hits", "hit_rate"}
 
     def test_root_endpoint(self, client):
         """Test root endpoint returns API info."""
@@ -92,6 +94,108 @@ class TestTripPlannerEndpoint:
         assert response.status_code == 422
 
 
+class TestStreaming:
+    """Tests for Server-Sent Events on the chat routes."""
+
+    SSE = {"Accept": "text/event-stream"}
+
+    @staticmethod
+    def _events(response):
+        import json
+
+        frames = [f for f in response.text.split("\n\n") if f.strip()]
+        parsed = []
+        for frame in frames:
+            name, data = frame.split("\n", 1)
+            parsed.append((name.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+        return parsed
+
+    def test_trip_planner_streams_events(self, client):
+        """Trip planning streams progress events, then the result."""
+        async def fake_stream(**kwargs):
+            yield {"event": "agent_started", "agent": "Researcher"}
+            yield {"event": "delta", "agent": "Researcher", "content": "Bali"}
+            yield {"event": "agent_completed", "agent": "Researcher"}
+            yield {"event": "result", "data": {"destination": kwargs["destination"]}}
+
+        with patch("api.routes.stream_trip_plan", side_effect=fake_stream), \
+             patch("api.routes.plan_trip") as mock_plan:
+            response = client.post(
+                "/api/chat/trip-planner",
+                json={"destination": "Bali", "duration_days": 5},
+                headers=self.SSE,
+            )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = self._events(response)
+        assert events[0] == ("agent_started", {"agent": "Researcher"})
+        assert events[-1] == ("result", {"data": {"destination": "Bali"}})
+        mock_plan.assert_not_called()
+
+    def test_structured_trip_plan_streams_days(self, client):
+        """Structured plans stream validated days, then the itinerary."""
+        async def fake_stream(**kwargs):
+            yield {"event": "day", "data": {"day_number": 1, "theme": "Old town"}}
+            yield {"event": "result", "data": {"destination": kwargs["destination"], "days": []}}
+
+        with patch("api.routes.stream_trip_plan_structured", side_effect=fake_stream), \
+             patch("api.routes.stream_trip_plan") as text_stream:
+            response = client.post(
+                "/api/chat/trip-planner",
+                json={"destination": "Bali", "duration_days": 5, "structured": True},
+                headers=self.SSE,
+            )
+
+        events = self._events(response)
+        assert events[0] == ("day", {"data": {"day_number": 1, "theme": "Old town"}})
+        assert events[-1][0] == "result"
+        text_stream.assert_not_called()
+
+    def test_stream_error_reported_in_band(self, client):
+        """Failures after the stream starts become an `error` event."""
+        async def failing_stream(**kwargs):
+            yield {"event": "agent_started", "agent": "SupportBot"}
+            raise RuntimeError("upstream exploded")
+
+        with patch("api.routes.get_quick_response", return_value=None), \
+             patch("api.routes.stream_answer", side_effect=failing_stream):
+            response = client.post(
+                "/api/chat/support",
+                json={"message": "Tell me about visas"},
+                headers=self.SSE,
+            )
+
+        events = self._events(response)
+        assert events[-1][0] == "error"
+        assert "upstream exploded" not in response.text
+
+    def test_quick_response_as_single_event(self, client):
+        """Quick responses are still streamed when SSE is requested."""
+        response = client.post(
+            "/api/chat/support",
+            json={"message": "How do I contact support?"},
+            headers=self.SSE,
+        )
+
+        events = self._events(response)
+        assert len(events) == 1
+        assert events[0][1]["data"]["quick_response"] is True
+
+    def test_json_remains_default(self, client):
+        """Without the Accept header, routes keep returning JSON."""
+        with patch("api.routes.get_recommendations") as mock_rec, \
+             patch("api.routes.stream_recommendations") as mock_stream:
+            mock_rec.return_value = {"recommendations": "...", "personalized": True}
+            response = client.post(
+                "/api/chat/recommend?user_id=test-user",
+                json={"num_recommendations": 3},
+            )
+
+        assert response.headers["content-type"] == "application/json"
+        mock_stream.assert_not_called()
+
+
 class TestSupportEndpoint:
     """Tests for support chat API endpoint."""
 
@@ -0,0 +1,349 @@
+"""
+Tests for Supabase token verification and the shared HTTP client.
+"""
+import pytest
+import httpx
+import respx
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+SUPABASE_URL = "https://test-project.supabase.co"
+
+
+@pytest.fixture
+def supabase_env(monkeypatch):
+    """Point the auth module at a fake Supabase project."""
+    import api.auth as auth
+    from api.token_cache import TokenCache
+
+    monkeypatch.setattr(auth, "SUPABASE_URL", SUPABASE_URL)
+    monkeypatch.setattr(auth, "SUPABASE_ANON_KEY", "anon-key")
+    monkeypatch.setattr(auth, "token_cache", TokenCache())
+    return auth
+
+
+def _bearer(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+class TestSharedHttpClient:
+    """Tests for the lifespan-managed HTTP client."""
+
+    @pytest.mark.asyncio
+    async def test_get_returns_same_client(self):
+        """Repeated lookups reuse one pooled client."""
+        from api.http_client import get_http_client, close_http_client
+
+        first = get_http_client()
+        assert get_http_client() is first
+        await close_http_client()
+        assert first.is_closed
+
+    @pytest.mark.asyncio
+    async def test_init_and_close(self):
+        """init opens a client, close releases it and a new one is built on demand."""
+        from api.http_client import init_http_client, get_http_client, close_http_client
+
+        client = await init_http_client()
+        assert get_http_client() is client
+        await close_http_client()
+        assert client.is_closed
+        assert get_http_client() is not client
+        await close_http_client()
+
+
+class TestVerifySupabaseToken:
+    """Tests for remote token verification against Supabase Auth."""
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_valid_token_uses_shared_client(self, supabase_env):
+        """Successful verification returns the user payload."""
+        from api.http_client import get_http_client, close_http_client
+
+        route = respx.get(f"{SUPABASE_URL}/auth/v1/user").mock(
+            return_value=httpx.Response(200, json={"id": "user-1", "email": "a@b.c"})
+        )
+        client = get_http_client()
+
+        user = await supabase_env.verify_supabase_token(_bearer("good-token"))
+        await supabase_env.verify_supabase_token(_bearer("other-token"))
+
+        assert user["id"] == "user-1"
+        assert route.call_count == 2
+        assert get_http_client() is client
+        await close_http_client()
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_invalid_token_rejected(self, supabase_env):
+        """Non-200 from Supabase maps to 401."""
+        respx.get(f"{SUPABASE_URL}/auth/v1/user").mock(
+            return_value=httpx.Response(401, json={"msg": "bad jwt"})
+        )
+
+        with pytest.raises(HTTPException) as exc:
+            await supabase_env.verify_supabase_token(_bearer("bad-token"))
+        assert exc.value.status_code == 401
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_unreachable_auth_service(self, supabase_env):
+        """Network failures map to 503."""
+        respx.get(f"{SUPABASE_URL}/auth/v1/user").mock(
+            side_effect=httpx.ConnectError("boom")
+        )
+
+        with pytest.raises(HTTPException) as exc:
+            await supabase_env.verify_supabase_token(_bearer("any-token"))
+        assert exc.value.status_code == 503
+
+
+def _make_token(secret: str = "test-secret", **overrides) -> str:
+    import time
+    import jwt
+
+    claims = {
+        "sub": "user-42",
+        "email": "local@example.com",
+        "role": "authenticated",
+        "aud": "authenticated",
+        "iss": f"{SUPABASE_URL}/auth/v1",
+        "exp": int(time.time()) + 3600,
+    }
+    claims.update(overrides)
+    return jwt.encode(claims, secret, algorithm="HS256")
+
+
+@pytest.fixture
+def local_verifier(supabase_env, monkeypatch):
+    """Enable local verification with an HS256 secret."""
+    from api.jwt_verifier import SupabaseJWTVerifier
+
+    verifier = SupabaseJWTVerifier(supabase_url=SUPABASE_URL, jwt_secret="test-secret")
+    monkeypatch.setattr(supabase_env, "AUTH_VERIFY_MODE", "local")
+    monkeypatch.setattr(supabase_env, "jwt_verifier", verifier)
+    return verifier
+
+
+class TestLocalJWTVerification:
+    """Tests for in-process JWT verification."""
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_valid_hs256_token_skips_network(self, supabase_env, local_verifier):
+        """A locally verifiable token never calls Supabase."""
+        route = respx.get(f"{SUPABASE_URL}/auth/v1/user")
+
+        user = await supabase_env.verify_supabase_token(_bearer(_make_token()))
+
+        assert user["id"] == "user-42"
+        assert user["email"] == "local@example.com"
+        assert not route.called
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "token_kwargs",
+        [
+            {"exp": 1000},
+            {"aud": "anon-service"},
+            {"iss": "https://evil.example.com/auth/v1"},
+        ],
+        ids=["expired", "wrong-audience", "wrong-issuer"],
+    )
+    async def test_rejects_bad_claims(self, supabase_env, local_verifier, token_kwargs):
+        """Expiry, audience and issuer are enforced."""
+        with pytest.raises(HTTPException) as exc:
+            await supabase_env.verify_supabase_token(_bearer(_make_token(**token_kwargs)))
+        assert exc.value.status_code == 401
+
+    @pytest.mark.asyncio
+    async def test_rejects_bad_signature(self, supabase_env, local_verifier):
+        """Tokens signed with another secret are rejected."""
+        with pytest.raises(HTTPException) as exc:
+            await supabase_env.verify_supabase_token(_bearer(_make_token(secret="other-secret")))
+        assert exc.value.status_code == 401
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_falls_back_to_remote_without_key_material(self, supabase_env, monkeypatch):
+        """HS256 tokens with no configured secret are checked remotely."""
+        from api.jwt_verifier import SupabaseJWTVerifier
+
+        monkeypatch.setattr(supabase_env, "AUTH_VERIFY_MODE", "local")
+        monkeypatch.setattr(supabase_env, "jwt_verifier", SupabaseJWTVerifier(supabase_url=SUPABASE_URL))
+        route = respx.get(f"{SUPABASE_URL}/auth/v1/user").mock(
+            return_value=httpx.Response(200, json={"id": "remote-user"})
+        )
+
+        user = await supabase_env.verify_supabase_token(_bearer(_make_token()))
+
+        assert user["id"] == "remote-user"
+        assert route.called
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_es256_token_verified_with_cached_jwks(self):
+        """Asymmetric tokens are checked against the JWKS, fetched once and cached."""
+        import json
+        import time
+        import jwt
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from api.jwt_verifier import SupabaseJWTVerifier
+
+        private_key = ec.generate_private_key(ec.SECP256R1())
+        jwk = json.loads(jwt.algorithms.ECAlgorithm.to_jwk(private_key.public_key()))
+        jwk.update({"kid": "key-1", "alg": "ES256", "use": "sig"})
+        jwks_route = respx.get(f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json").mock(
+            return_value=httpx.Response(200, json={"keys": [jwk]})
+        )
+        token = jwt.encode(
+            {
+                "sub": "user-es",
+                "aud": "authenticated",
+                "iss": f"{SUPABASE_URL}/auth/v1",
+                "exp": int(time.time()) + 600,
+            },
+            private_key,
+            algorithm="ES256",
+            headers={"kid": "key-1"},
+        )
+        verifier = SupabaseJWTVerifier(supabase_url=SUPABASE_URL)
+
+        first = await verifier.verify(token)
+        second = await verifier.verify(token)
+
+        assert first["id"] == second["id"] == "user-es"
+        assert jwks_route.call_count == 1
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_header_alg_must_match_jwks_key(self, supabase_env, monkeypatch):
+        """A token claiming RS256 for an EC key is a 401, not a server error."""
+        import json
+        import time
+        import jwt
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from api.jwt_verifier import SupabaseJWTVerifier
+
+        private_key = ec.generate_private_key(ec.SECP256R1())
+        jwk = json.loads(jwt.algorithms.ECAlgorithm.to_jwk(private_key.public_key()))
+        jwk.update({"kid": "key-1", "alg": "ES256", "use": "sig"})
+        respx.get(f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json").mock(
+            return_value=httpx.Response(200, json={"keys": [jwk]})
+        )
+        remote = respx.get(f"{SUPABASE_URL}/auth/v1/user")
+        monkeypatch.setattr(supabase_env, "AUTH_VERIFY_MODE", "local")
+        monkeypatch.setattr(supabase_env, "jwt_verifier", SupabaseJWTVerifier(supabase_url=SUPABASE_URL))
+        signed = jwt.encode(
+            {"sub": "user-es", "aud": "authenticated", "iss": f"{SUPABASE_URL}/auth/v1", "exp": int(time.time()) + 600},
+            private_key,
+            algorithm="ES256",
+            headers={"kid": "key-1"},
+        )
+        forged_header = jwt.utils.base64url_encode(
+            json.dumps({"alg": "RS256", "kid": "key-1", "typ": "JWT"}).encode()
+        ).decode()
+        token = ".".join([forged_header, *signed.split(".")[1:]])
+
+        with pytest.raises(HTTPException) as exc:
+            await supabase_env.verify_supabase_token(_bearer(token))
+
+        assert exc.value.status_code == 401
+        assert not remote.called
+
+
+class TestTokenCache:
+    """Tests for the verified-identity cache."""
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_repeat_token_served_from_cache(self, supabase_env):
+        """The same token is verified once, then served from cache."""
+        route = respx.get(f"{SUPABASE_URL}/auth/v1/user").mock(
+            return_value=httpx.Response(200, json={"id": "user-1", "user_metadata": {"big": "x" * 100}})
+        )
+
+        first = await supabase_env.verify_supabase_token(_bearer("reused-token"))
+        second = await supabase_env.verify_supabase_token(_bearer("reused-token"))
+
+        assert first["id"] == second["id"] == "user-1"
+        assert first == second
+        assert "user_metadata" not in second
+        assert route.call_count == 1
+        assert supabase_env.token_cache.stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_cached_identity_keeps_app_metadata(self, supabase_env):
+        """Authorization data survives the cache; hits and misses return the same identity."""
+        respx.get(f"{SUPABASE_URL}/auth/v1/user").mock(
+            return_value=httpx.Response(200, json={
+                "id": "admin-1", "role": "authenticated", "app_metadata": {"role": "admin"},
+            })
+        )
+
+        first = await supabase_env.verify_supabase_token(_bearer("admin-token"))
+        second = await supabase_env.verify_supabase_token(_bearer("admin-token"))
+
+        assert first == second
+        assert second["app_metadata"] == {"role": "admin"}
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_rejected_token_negatively_cached(self, supabase_env):
+        """A bad token is only checked upstream once within the negative TTL."""
+        route = respx.get(f"{SUPABASE_URL}/auth/v1/user").mock(
+            return_value=httpx.Response(401, json={"msg": "bad jwt"})
+        )
+
+        for _ in range(3):
+            with pytest.raises(HTTPException) as exc:
+                await supabase_env.verify_supabase_token(_bearer("bad-token"))
+            assert exc.value.status_code == 401
+
+        assert route.call_count == 1
+        assert supabase_env.token_cache.stats()["negative_hits"] == 2
+        assert supabase_env.token_cache.stats()["misses"] == 1
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_service_errors_not_cached(self, supabase_env):
+        """A 503 from an unreachable provider is not remembered as a rejection."""
+        route = respx.get(f"{SUPABASE_URL}/auth/v1/user").mock(
+            side_effect=httpx.ConnectError("boom")
+        )
+
+        for _ in range(2):
+            with pytest.raises(HTTPException):
+                await supabase_env.verify_supabase_token(_bearer("any-token"))
+
+        assert route.call_count == 2
+
+    def test_entry_never_outlives_token_exp(self):
+        """Entries expire at the token's exp even if the TTL is longer."""
+        import time
+        from api.token_cache import TokenCache
+
+        cache = TokenCache(ttl_seconds=3600)
+        cache.put("expired", {"id": "u"}, exp=time.time() - 1)
+        cache.put("fresh", {"id": "u"}, exp=time.time() + 60)
+
+        assert cache.get("expired") is None
+        assert cache.get("fresh") == {"id": "u"}
+
+    def test_memory_ceiling_and_hashed_keys(self):
+        """Both maps stay within their bounds and never hold raw tokens."""
+        from api.token_cache import TokenCache
+
+        cache = TokenCache(max_entries=100, max_negative_entries=10)
+        for i in range(1000):
+            cache.put(f"token-{i}", {"id": str(i)})
+            cache.reject(f"bad-{i}")
+
+        stats = cache.stats()
+        assert stats["entries"] == 100
+        assert stats["negative_entries"] == 10
+        assert cache.get("token-999") == {"id": "999"}
+        assert cache.get("token-0") is None
+        assert all(isinstance(k, bytes) and len(k) == 32 for k in cache._entries)
@@ -0,0 +1,123 @@
+"""
+Tests for the /api/batch endpoint.
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+
+from agents.admission import AdmissionRejected
+
+
+@pytest.fixture
+def client():
+    from main import app
+
+    return TestClient(app)
+
+
+def _post(client, items, **params):
+    return client.post("/api/batch", json={"requests": items}, params=params)
+
+
+class TestBatchEndpoint:
+    """Mixed sub-requests, per-item results and the parallelism cap."""
+
+    def test_mixed_batch_returns_results_in_order(self, client):
+        with patch("api.routes.get_quick_response", return_value=None), \
+             patch("api.routes.answer_question", AsyncMock(return_value={"answer": "Sure"})), \
+             patch("api.routes.get_recommendations", AsyncMock(return_value={"recommendations": "Lisbon"})) as recs, \
+             patch("api.routes.plan_trip", AsyncMock(return_value={"plan": "Day 1"})), \
+             patch("api.routes._remember") as remember:
+            response = _post(client, [
+                {"type": "support", "id": "a", "message": "Can I bring my dog on the Bali tour?"},
+                {"type": "recommend", "id": "b", "query": "sunny city"},
+                {"type": "trip_plan", "id": "c", "destination": "Bali", "duration_days": 3},
+            ], user_id="user-42")
+
+        assert response.status_code == 200
+        results = response.json()["data"]["results"]
+        assert [r["id"] for r in results] == ["a", "b", "c"]
+        assert all(r["success"] and r["status"] == 200 for r in results)
+        assert results[0]["data"] == {"answer": "Sure"}
+        assert results[2]["data"] == {"plan": "Day 1"}
+        assert recs.await_args.kwargs["user_id"] == "user-42"
+        # Each item lands in the history like its single-request route
+        recorded = {c.args[1]: c.args for c in remember.call_args_list}
+        assert recorded["SupportBot"][2:4] == ("Can I bring my dog on the Bali tour?", "Sure")
+        assert recorded["TravelRecommender"][0] == "user-42"
+        assert recorded["TravelRecommender"][2:] == ("sunny city", "Lisbon")
+        assert recorded["TripPlanner"][3] == "Day 1"
+
+    def test_parallelism_is_capped(self, client):
+        running = 0
+        peak = 0
+
+        async def slow_answer(**kwargs):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+            return {"answer": "ok"}
+
+        with patch("api.routes.BATCH_MAX_PARALLEL", 2), \
+             patch("api.routes.get_quick_response", return_value=None), \
+             patch("api.routes.answer_question", side_effect=slow_answer):
+            response = _post(client, [
+                {"type": "support", "message": f"Question number {i} about my itinerary"}
+                for i in range(5)
+            ])
+
+        assert response.status_code == 200
+        assert all(r["success"] for r in response.json()["data"]["results"])
+        assert peak == 2
+
+    def test_item_failures_are_isolated(self, client):
+        with patch("api.routes.get_quick_response", return_value=None), \
+             patch("api.routes.answer_question", AsyncMock(side_effect=RuntimeError("boom"))), \
+             patch("api.routes.plan_trip", AsyncMock(side_effect=AdmissionRejected("gpt-4o", 9))), \
+             patch("api.routes.get_recommendations", AsyncMock(return_value={"ok": True})):
+            response = _post(client, [
+                {"type": "support", "message": "Why was my card charged twice?"},
+                {"type": "trip_plan", "destination": "Rome", "duration_days": 2},
+                {"type": "recommend"},
+            ], user_id="user-1")
+
+        results = response.json()["data"]["results"]
+        assert results[0]["status"] == 500
+        assert "boom" not in results[0]["error"]["detail"]
+        assert results[1]["status"] == 503
+        assert results[1]["error"]["retry_after"] == 9
+        assert results[2]["success"] is True
+
+    def test_dev_user_recommend_requires_user_id(self, client):
+        with patch("api.routes.get_recommendations", AsyncMock(return_value={})):
+            response = _post(client, [{"type": "recommend"}])
+
+        (result,) = response.json()["data"]["results"]
+        assert result["status"] == 400
+
+    def test_each_item_counts_against_rate_limit(self, client, monkeypatch):
+        import api.rate_limit as rate_limit
+
+        monkeypatch.setattr(rate_limit, "RATE_LIMIT_DISABLED", False)
+        limiter = rate_limit.RateLimiter(
+            requests_per_minute=2, requests_per_hour=100, backend=rate_limit.InMemoryBackend(), name="batch-test"
+        )
+        with patch("api.routes.ai_limiter", limiter), \
+             patch("api.routes.get_quick_response", return_value="Quick answer"):
+            response = _post(client, [
+                {"type": "support", "id": str(i), "message": "How do I contact support?"}
+                for i in range(3)
+            ])
+
+        results = response.json()["data"]["results"]
+        assert [r["status"] for r in results] == [200, 200, 429]
+        assert results[2]["error"]["retry_after"] >= 1
+
+    def test_rejects_oversized_and_unknown_items(self, client):
+        too_many = [{"type": "support", "message": "hi"}] * 11
+        assert _post(client, too_many).status_code == 422
+        assert _post(client, []).status_code == 422
+        assert _post(client, [{"type": "weather", "message": "hi"}]).status_code == 422
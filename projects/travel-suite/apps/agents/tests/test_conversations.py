@@ -0,0 +1,315 @@
+"""
+Tests for the conversation history store and endpoint.
+"""
+import os
+import uuid
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+USER_ID = "6f1c7a8e-2b7d-4f7e-9a43-0c4a52e1d001"
+
+
+class FakeConnection:
+    def __init__(self, rows=None):
+        self.batches = []
+        self.queries = []
+        self.rows = rows or []
+
+    async def executemany(self, query, records):
+        self.batches.append(list(records))
+
+    async def fetch(self, query, *args):
+        self.queries.append((query, args))
+        return self.rows
+
+
+class FakePool:
+    def __init__(self, conn=None):
+        self.conn = conn or FakeConnection()
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+def _rows(count, start=None):
+    start = start or datetime(2026, 5, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "id": uuid.UUID(int=i + 1),
+            "session_id": "s1",
+            "agent_name": "SupportBot",
+            "messages": [{"role": "user", "content": f"q{i}"}],
+            "metadata": None,
+            "created_at": start - timedelta(seconds=i),
+        }
+        for i in range(count)
+    ]
+
+
+class TestConversationStore:
+    """Tests for batched writes and keyset reads."""
+
+    @pytest.mark.asyncio
+    async def test_disabled_without_pool(self):
+        """Without a database, record is a no-op and lists are empty."""
+        from api.conversations import ConversationStore
+
+        store = ConversationStore()
+        assert store.record(USER_ID, "SupportBot", "hi", "hello") is False
+        assert await store.list_for_user(USER_ID) == ([], None)
+
+    @pytest.mark.asyncio
+    async def test_turns_written_in_batches(self):
+        """Queued turns are flushed with one executemany per batch."""
+        from api.conversations import ConversationStore
+
+        pool = FakePool()
+        store = ConversationStore(batch_size=10, flush_interval=0.05)
+        await store.start(pool)
+        for i in range(25):
+            assert store.record(USER_ID, "SupportBot", f"q{i}", f"a{i}", session_id="s1")
+        await asyncio.sleep(0.2)
+        await store.stop()
+
+        sizes = [len(batch) for batch in pool.conn.batches]
+        assert sum(sizes) == 25
+        assert max(sizes) <= 10
+        assert len(sizes) == 3
+        assert store.stats()["written"] == 25
+        user_id, session_id, agent, messages, _, started_at, created_at = pool.conn.batches[0][0]
+        assert user_id == uuid.UUID(USER_ID)
+        assert (session_id, agent) == ("s1", "SupportBot")
+        assert messages == [{"role": "user", "content": "q0"}, {"role": "assistant", "content": "a0"}]
+        assert started_at == created_at
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes_queue(self):
+        """Turns still queued at shutdown are written before the store stops."""
+        from api.conversations import ConversationStore
+
+        pool = FakePool()
+        store = ConversationStore(batch_size=100, flush_interval=60)
+        await store.start(pool)
+        store.record(USER_ID, "TripPlanner", "Plan Bali", {"days": []})
+        await store.stop()
+
+        assert sum(len(b) for b in pool.conn.batches) == 1
+        assert pool.conn.batches[0][0][3][1]["content"] == '{"days": []}'
+
+    @pytest.mark.asyncio
+    async def test_stop_writes_batch_in_progress(self):
+        """Turns the writer already took off the queue are written, not lost, at shutdown."""
+        from api.conversations import ConversationStore
+
+        pool = FakePool()
+        store = ConversationStore(batch_size=100, flush_interval=60)
+        await store.start(pool)
+        store.record(USER_ID, "SupportBot", "q1", "a1")
+        store.record(USER_ID, "SupportBot", "q2", "a2")
+        await asyncio.sleep(0.05)  # the writer is now waiting to fill its batch
+        assert store.stats()["queued"] == 0
+        await store.stop()
+
+        assert [len(b) for b in pool.conn.batches] == [2]
+        assert store.stats()["written"] == 2
+
+    @pytest.mark.asyncio
+    async def test_bad_row_only_fails_itself(self):
+        """A foreign-key violation is narrowed down to the offending turn."""
+        import asyncpg
+        from api.conversations import ConversationStore
+
+        orphan = uuid.UUID(int=404)
+        pool = FakePool()
+        write = pool.conn.executemany
+
+        async def executemany(query, records):
+            records = list(records)
+            if any(record[0] == orphan for record in records):
+                raise asyncpg.ForeignKeyViolationError("user_id not in profiles")
+            await write(query, records)
+
+        pool.conn.executemany = executemany
+        store = ConversationStore(batch_size=100, flush_interval=60)
+        await store.start(pool)
+        for i in range(10):
+            store.record(str(orphan) if i == 6 else USER_ID, "SupportBot", f"q{i}", f"a{i}")
+        await store.stop()
+
+        assert store.stats()["written"] == 9
+        assert store.stats()["failed"] == 1
+        written = [record[3][0]["content"] for batch in pool.conn.batches for record in batch]
+        assert sorted(written) == sorted(f"q{i}" for i in range(10) if i != 6)
+
+    @pytest.mark.asyncio
+    async def test_full_queue_drops_instead_of_blocking(self):
+        """When the queue is full new turns are dropped and counted."""
+        from api.conversations import ConversationStore
+
+        store = ConversationStore(max_queue=2, flush_interval=60)
+        await store.start(FakePool())
+        store._writer_task.cancel()  # keep the queue from draining
+        results = [store.record(USER_ID, "SupportBot", "q", "a") for _ in range(4)]
+        store._writer_task = None
+
+        assert results == [True, True, False, False]
+        assert store.stats()["dropped"] == 2
+
+    @pytest.mark.asyncio
+    async def test_non_uuid_users_are_not_recorded(self):
+        """The dev identity and other non-UUID ids cannot be stored against profiles."""
+        from api.conversations import ConversationStore
+
+        store = ConversationStore()
+        await store.start(FakePool())
+        assert store.record("dev-user", "SupportBot", "q", "a") is False
+        await store.stop()
+
+    @pytest.mark.asyncio
+    async def test_write_failure_is_counted_not_raised(self):
+        """A failed batch is logged and counted; chats are unaffected."""
+        from api.conversations import ConversationStore
+
+        pool = FakePool()
+        pool.conn.executemany = AsyncMock(side_effect=OSError("connection reset"))
+        store = ConversationStore(flush_interval=60)
+        await store.start(pool)
+        store.record(USER_ID, "SupportBot", "q", "a")
+        await store.stop()
+
+        assert store.stats()["failed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_keyset_pagination(self):
+        """Pages fetch limit+1 rows and continue strictly after the cursor."""
+        from api.conversations import ConversationStore, decode_cursor
+
+        conn = FakeConnection(rows=_rows(3))
+        store = ConversationStore()
+        store._pool = FakePool(conn)
+
+        page, next_cursor = await store.list_for_user(USER_ID, limit=2)
+        assert [c["messages"][0]["content"] for c in page] == ["q0", "q1"]
+        assert decode_cursor(next_cursor) == (_rows(3)[1]["created_at"], uuid.UUID(int=2))
+        query, args = conn.queries[0]
+        assert "OFFSET" not in query
+        assert args[-1] == 3
+
+        conn.rows = _rows(1)
+        page, last_cursor = await store.list_for_user(USER_ID, limit=2, cursor=next_cursor)
+        query, args = conn.queries[1]
+        assert "(created_at, id) < ($2, $3)" in query
+        assert args[1:3] == decode_cursor(next_cursor)
+        assert last_cursor is None
+
+    def test_cursor_round_trip_and_rejection(self):
+        from api.conversations import InvalidCursor, decode_cursor, encode_cursor
+
+        created_at = datetime(2026, 5, 1, 12, 30, 0, 123456, tzinfo=timezone.utc)
+        row_id = uuid.uuid4()
+        assert decode_cursor(encode_cursor(created_at, row_id)) == (created_at, row_id)
+        with pytest.raises(InvalidCursor):
+            decode_cursor("not-a-cursor")
+
+
+class TestConversationsEndpoint:
+    """Tests for GET /api/conversations/{user_id}."""
+
+    def test_pages_through_store(self):
+        from fastapi.testclient import TestClient
+        from main import app
+        from api.conversations import conversation_store
+
+        client = TestClient(app)
+        with patch.object(conversation_store, "_pool", FakePool()), \
+             patch.object(conversation_store, "list_for_user", AsyncMock(return_value=([{"id": "1"}], "abc"))) as lookup:
+            response = client.get(f"/api/conversations/{USER_ID}?limit=5&cursor=xyz&agent=SupportBot")
+
+        assert response.status_code == 200
+        assert response.json()["data"]["next_cursor"] == "abc"
+        lookup.assert_awaited_once_with(USER_ID, limit=5, cursor="xyz", agent_name="SupportBot")
+
+    def test_bad_cursor_is_400(self):
+        from fastapi.testclient import TestClient
+        from main import app
+        from api.conversations import conversation_store
+
+        client = TestClient(app)
+        with patch.object(conversation_store, "_pool", FakePool()):
+            response = client.get(f"/api/conversations/{USER_ID}?cursor=%%%")
+
+        assert response.status_code == 400
+
+    def test_limit_is_bounded(self):
+        from fastapi.testclient import TestClient
+        from main import app
+
+        response = TestClient(app).get(f"/api/conversations/{USER_ID}?limit=1000")
+        assert response.status_code == 422
+
+    def test_support_chat_is_recorded(self):
+        """A support answer is queued as one turn in the caller's history."""
+        from fastapi.testclient import TestClient
+        from main import app
+
+        with patch("api.routes.answer_question", AsyncMock(return_value={"answer": "Yes", "agent": "SupportBot"})), \
+             patch("api.routes.conversation_store") as store:
+            response = TestClient(app).post(
+                "/api/chat/support",
+                json={"message": "Can I change my dates?", "context": {"session_id": "chat-1"}},
+            )
+
+        assert response.status_code == 200
+        store.record.assert_called_once_with(
+            "dev-user", "SupportBot", "Can I change my dates?", "Yes", session_id="chat-1"
+        )
+
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL not set")
+class TestConversationStorePostgres:
+    """Round trip against a local Postgres (set TEST_DATABASE_URL to run)."""
+
+    @pytest.mark.asyncio
+    async def test_write_then_page(self):
+        from api.db import create_db_pool
+        from api.conversations import ConversationStore
+
+        pool = await create_db_pool(os.environ["TEST_DATABASE_URL"])
+        table = f"conversations_test_{uuid.uuid4().hex[:8]}"
+        try:
+            async with pool.acquire() as conn:
+                await conn.execute(f"""
+                    CREATE TABLE {table} (
+                        id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+                        user_id UUID, session_id TEXT NOT NULL, agent_name TEXT,
+                        messages JSONB, summary TEXT, metadata JSONB,
+                        started_at TIMESTAMPTZ, ended_at TIMESTAMPTZ,
+                        created_at TIMESTAMPTZ DEFAULT NOW()
+                    )""")
+                await conn.execute(f"CREATE INDEX ON {table}(user_id, created_at DESC, id DESC)")
+
+            store = ConversationStore(table=table, batch_size=50, flush_interval=0.01)
+            await store.start(pool)
+            for i in range(120):
+                store.record(USER_ID, "SupportBot", f"q{i}", f"a{i}", session_id="s1")
+            await store.stop()
+
+            seen, cursor = [], None
+            while True:
+                store._pool = pool
+                page, cursor = await store.list_for_user(USER_ID, limit=25, cursor=cursor)
+                seen += page
+                if cursor is None:
+                    break
+
+            assert len(seen) == 120
+            assert len({c["id"] for c in seen}) == 120
+            assert seen[0]["messages"][0]["content"] == "q119"
+        finally:
+            async with pool.acquire() as conn:
+                await conn.execute(f"DROP TABLE IF EXISTS {table}")
+            await pool.close()
@@ -0,0 +1,110 @@
+"""
+Tests for response encoding and compression.
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from fastapi.testclient import TestClient
+
+
+def _large_plan() -> dict:
+    from benchmarks.encoding import sample_itinerary
+
+    return sample_itinerary(14).model_dump()
+
+
+@pytest.fixture
+def client():
+    from main import app
+
+    with patch("api.routes.plan_trip", AsyncMock(return_value=_large_plan())):
+        yield TestClient(app)
+
+
+def _plan(client, **headers):
+    return client.post(
+        "/api/chat/trip-planner",
+        json={"destination": "Bali", "duration_days": 14},
+        headers=headers,
+    )
+
+
+class TestNegotiation:
+    """Tests for Accept-Encoding / Accept handling."""
+
+    @pytest.mark.parametrize(
+        "header, expected",
+        [
+            ("gzip, deflate, br", "br"),
+            ("br;q=0.5, gzip", "gzip"),
+            ("gzip;q=0, br;q=0", None),
+            ("*", "br"),
+            ("identity", None),
+            ("", None),
+        ],
+    )
+    def test_choose_encoding(self, header, expected):
+        from api.encoding import choose_encoding
+
+        assert choose_encoding(header) == expected
+
+    def test_large_response_is_brotli_compressed(self, client):
+        response = _plan(client, **{"Accept-Encoding": "br"})
+
+        assert response.headers["content-encoding"] == "br"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert response.json()["data"]["duration_days"] == 14
+
+    def test_gzip_body_is_smaller_and_decodes(self, client):
+        import orjson
+
+        response = _plan(client, **{"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert int(response.headers["content-length"]) < len(orjson.dumps(response.json())) / 4
+        assert response.json()["data"]["destination"] == "Bali, Indonesia"
+
+    def test_small_response_is_not_compressed(self):
+        from main import app
+
+        response = TestClient(app).get("/livez", headers={"Accept-Encoding": "gzip, br"})
+
+        assert "content-encoding" not in response.headers
+
+    def test_identity_only_client_gets_plain_body(self, client):
+        response = _plan(client, **{"Accept-Encoding": "identity"})
+
+        assert "content-encoding" not in response.headers
+        assert response.json()["success"] is True
+
+    def test_msgpack_via_accept(self, client):
+        import msgpack
+
+        response = _plan(client, **{"Accept": "application/msgpack", "Accept-Encoding": "identity"})
+
+        assert response.headers["content-type"] == "application/msgpack"
+        assert "Accept" in response.headers["vary"]
+        body = msgpack.unpackb(response.content)
+        assert body["data"] == _large_plan()
+
+    def test_json_is_default(self, client):
+        response = _plan(client)
+
+        assert response.headers["content-type"] == "application/json"
+        assert response.json()["data"]["days"][0]["day_number"] == 1
+
+    def test_event_stream_is_not_buffered_or_compressed(self):
+        from main import app
+
+        async def events(**kwargs):
+            yield {"event": "result", "data": {"answer": "x" * 5000}}
+
+        with patch("api.routes.stream_answer", events):
+            response = TestClient(app).post(
+                "/api/chat/support",
+                json={"message": "Tell me about refunds and cancellations"},
+                headers={"Accept": "text/event-stream", "Accept-Encoding": "gzip"},
+            )
+
+        assert "content-encoding" not in response.headers
+        assert "event: result" in response.text
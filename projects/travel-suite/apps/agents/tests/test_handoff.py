@@ -0,0 +1,88 @@
+"""
+Tests for token-budgeted context handoff between team members.
+"""
+import logging
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from agents.handoff import ContextHandoff, estimate_tokens, extract
+
+
+def _research(filler_lines: int = 60) -> str:
+    lines = ["## Getting around", "The metro runs 05:00-24:00 and a day pass costs $8."]
+    lines += [f"Historical aside number {i} about the founding dynasty and its poets." for i in range(filler_lines)]
+    lines += ["## Food", "Try the night market in the old district; stalls close around 23:00."]
+    return "\n".join(lines)
+
+
+class TestExtract:
+    def test_short_text_passes_unchanged(self):
+        """Text within budget is not touched."""
+        assert extract("Temples open at 08:00.", 100) == "Temples open at 08:00."
+
+    def test_keeps_relevant_lines_with_headings_in_order(self):
+        """Focus hits outrank filler, headings ride along, and the budget holds."""
+        text = _research()
+
+        result = extract(text, 60, focus=("metro", "market", "close", "$"))
+
+        assert estimate_tokens(result) <= 60 < estimate_tokens(text)
+        lines = result.splitlines()
+        assert lines[:2] == ["## Getting around", "The metro runs 05:00-24:00 and a day pass costs $8."]
+        assert "## Food" in lines
+        assert lines.index("## Food") < lines.index(
+            "Try the night market in the old district; stalls close around 23:00."
+        )
+
+    def test_query_terms_rank_lines_without_focus(self):
+        """Consumers without focus keywords are served lines matching the request."""
+        text = "\n".join(["Generic filler sentence about nothing much."] * 40 + ["Snorkelling at Amed is superb."])
+
+        result = extract(text, 30, query="Plan a 5-day trip to Bali. Interests: snorkelling.")
+
+        assert "Snorkelling at Amed is superb." in result
+
+
+class TestContextHandoff:
+    def test_budget_shared_between_upstreams(self):
+        """A short input passes whole; the long one is trimmed to what is left."""
+        handoff = ContextHandoff(token_budget=120, focus={"Planner": ("metro", "market")})
+
+        selected, stats = handoff.select(
+            "Planner", "plan", {"Researcher": _research(), "Budgeter": "Total: $900."}
+        )
+
+        assert list(selected) == ["Researcher", "Budgeter"]
+        assert selected["Budgeter"] == "Total: $900."
+        assert stats.passed_tokens <= 120
+        assert stats.saved_tokens == stats.original_tokens - stats.passed_tokens > 0
+
+    @pytest.mark.asyncio
+    async def test_team_passes_extract_and_logs_savings(self, caplog):
+        """Dependents get the trimmed output, and the run logs the tokens saved."""
+        from agents.trip_planner import TeamShim
+
+        researcher = MagicMock()
+        researcher.name = "Researcher"
+        researcher.arun = AsyncMock(return_value=MagicMock(content=_research()))
+        planner = MagicMock()
+        planner.name = "Planner"
+        planner.arun = AsyncMock(return_value=MagicMock(content="Day 1"))
+        team = TeamShim(
+            name="T",
+            agents=[researcher, planner],
+            instructions=[],
+            mode="dag",
+            depends_on={"Planner": ["Researcher"]},
+            handoff=ContextHandoff(token_budget=60, focus={"Planner": ("metro", "market")}),
+        )
+
+        with caplog.at_level(logging.INFO, logger="gobuddy.trip_planner"):
+            response = await team.arun("plan")
+
+        planner_prompt = planner.arun.call_args[0][0]
+        assert "The metro runs" in planner_prompt
+        assert "Historical aside number 30" not in planner_prompt
+        # The transcript itself is never trimmed
+        assert "Historical aside number 30" in response.content
+        assert any("saved" in record.getMessage() for record in caplog.records)
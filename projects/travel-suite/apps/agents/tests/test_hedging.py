@@ -0,0 +1,197 @@
+"""
+Tests for hedged agent runs (backup model when the primary is slow).
+"""
+import asyncio
+from dataclasses import dataclass
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@dataclass
+class _Model:
+    id: str
+
+
+class _Agent:
+    """Fake agno agent whose answer time (or error) depends on its model id."""
+
+    def __init__(self, model: _Model, behaviour: dict, calls: list):
+        self.name = "Hedged"
+        self.model = model
+        self.memory = None
+        self.knowledge = None
+        self.stream = False
+        self.run_response = None
+        self._behaviour = behaviour
+        self._calls = calls
+
+    def deep_copy(self, *, update=None):
+        return _Agent((update or {}).get("model", self.model), self._behaviour, self._calls)
+
+    async def arun(self, prompt, stream=False, **kwargs):
+        self._calls.append(self.model.id)
+        delay = self._behaviour[self.model.id]
+        if stream:
+            return self._stream(delay)
+        await self._wait(delay)
+        return SimpleNamespace(content=f"from {self.model.id}", metrics={})
+
+    async def _wait(self, delay):
+        if isinstance(delay, Exception):
+            raise delay
+        await asyncio.sleep(delay)
+
+    async def _stream(self, delay):
+        await self._wait(delay)
+        yield SimpleNamespace(content=f"from {self.model.id}")
+        yield SimpleNamespace(content=" (done)")
+
+
+def _hedged_agent(name: str, behaviour: dict, calls: list):
+    from agents.lazy import LazyAgent
+
+    return LazyAgent(name, lambda: _Agent(_Model("primary-test"), behaviour, calls), register=False)
+
+
+def _policy(name: str, first_token: float = 0.05, response: float = 0.05):
+    from agents.hedging import HedgePolicy
+
+    return patch.dict("agents.hedging.hedge_policies", {name: HedgePolicy("backup-test", first_token, response)})
+
+
+def _hedges(outcome: str) -> float:
+    return sample("gobuddy_hedged_runs_total", agent="Hedged", backup_model="backup-test", outcome=outcome)
+
+
+class TestHedgedRuns:
+    """run_agent fires a backup after the policy threshold and keeps the first answer."""
+
+    async def test_slow_primary_loses_to_backup(self):
+        from agents.admission import admission
+        from agents.runtime import run_agent
+
+        calls = []
+        agent = _hedged_agent("test-hedge-slow", {"primary-test": 5, "backup-test": 0.01}, calls)
+        before = _hedges("backup_won")
+
+        with _policy("test-hedge-slow"):
+            response = await run_agent(agent, "plan")
+
+        assert response.content == "from backup-test"
+        assert calls == ["primary-test", "backup-test"]
+        assert _hedges("backup_won") == before + 1
+        # The cancelled primary gave its admission slot back
+        assert admission.gate_for("primary-test").stats()["active"] == 0
+
+    async def test_fast_primary_never_fires_backup(self):
+        from agents.runtime import run_agent
+
+        calls = []
+        agent = _hedged_agent("test-hedge-fast", {"primary-test": 0, "backup-test": 0}, calls)
+        before = _hedges("not_fired")
+
+        with _policy("test-hedge-fast", response=1):
+            response = await run_agent(agent, "plan")
+
+        assert response.content == "from primary-test"
+        assert calls == ["primary-test"]
+        assert _hedges("not_fired") == before + 1
+
+    async def test_failed_backup_waits_for_primary(self):
+        """A backup error only loses the race; the slow primary still answers."""
+        from agents.runtime import run_agent
+
+        calls = []
+        behaviour = {"primary-test": 0.15, "backup-test": RuntimeError("backup down")}
+        agent = _hedged_agent("test-hedge-backup-fails", behaviour, calls)
+        before = _hedges("primary_won")
+
+        with _policy("test-hedge-backup-fails"):
+            response = await run_agent(agent, "plan")
+
+        assert response.content == "from primary-test"
+        assert _hedges("primary_won") == before + 1
+
+    async def test_both_failing_raises_primary_error(self):
+        from agents.runtime import run_agent
+
+        behaviour = {"primary-test": ValueError("primary down"), "backup-test": RuntimeError("backup down")}
+        agent = _hedged_agent("test-hedge-both-fail", behaviour, [])
+
+        with _policy("test-hedge-both-fail", response=0), pytest.raises(ValueError, match="primary down"):
+            await run_agent(agent, "plan")
+
+    async def test_stream_commits_to_first_model_to_start(self):
+        """A stream with no first token by the threshold switches to the backup's stream."""
+        from agents.runtime import stream_agent
+
+        calls = []
+        agent = _hedged_agent("test-hedge-stream", {"primary-test": 5, "backup-test": 0.01}, calls)
+        before = _hedges("backup_won")
+
+        with _policy("test-hedge-stream", response=None):
+            chunks = [c async for c in stream_agent(agent, "plan")]
+
+        assert "".join(chunks) == "from backup-test (done)"
+        assert _hedges("backup_won") == before + 1
+
+    async def test_stream_without_hedge_when_primary_starts_in_time(self):
+        from agents.runtime import stream_agent
+
+        calls = []
+        agent = _hedged_agent("test-hedge-stream-fast", {"primary-test": 0, "backup-test": 0}, calls)
+
+        with _policy("test-hedge-stream-fast", first_token=1):
+            chunks = [c async for c in stream_agent(agent, "plan")]
+
+        assert "".join(chunks) == "from primary-test (done)"
+        assert calls == ["primary-test"]
+
+
+class TestHedgePolicies:
+    """Policy configuration and which agents are eligible."""
+
+    def test_parse_policies(self):
+        from agents.hedging import HedgePolicy, _parse_policies
+
+        policies = _parse_policies("planner=gpt-4o-mini:4:45, support_agent = ft:gpt-4o-mini:acme:3")
+
+        assert policies == {
+            "planner": HedgePolicy("gpt-4o-mini", 4, 45),
+            "support_agent": HedgePolicy("ft:gpt-4o-mini:acme", 3, None),
+        }
+        with pytest.raises(ValueError, match="threshold"):
+            _parse_policies("planner=gpt-4o-mini")
+
+    def test_only_lazy_agents_on_another_model_are_hedged(self):
+        from agents.hedging import HedgePolicy, policy_for
+
+        agent = _hedged_agent("test-hedge-eligible", {}, [])
+        assert policy_for(agent) is None
+        with _policy("test-hedge-eligible"):
+            assert policy_for(agent) is not None
+            assert policy_for(MagicMock()) is None
+        # A backup on the agent's own model would only double the load
+        with patch.dict("agents.hedging.hedge_policies", {"test-hedge-eligible": HedgePolicy("primary-test", 1)}):
+            assert policy_for(agent) is None
+
+    def test_backup_variant_keeps_agent_settings(self):
+        """The backup is the same agno agent on another model id, JSON mode included."""
+        from agents.lazy import LazyAgent
+        from agents.trip_planner import build_structured_planner
+
+        planner = LazyAgent("test-hedge-variant", build_structured_planner, register=False)
+        backup = planner.on_model("gpt-4o-mini")
+
+        assert backup.model.id == "gpt-4o-mini"
+        assert backup.model.response_format == {"type": "json_object"}
+        assert backup.instructions == planner.instructions
+        assert planner.on_model("gpt-4o-mini") is backup
+        assert planner.model.id == "gpt-4o"
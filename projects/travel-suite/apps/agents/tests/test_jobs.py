@@ -0,0 +1,168 @@
+"""
+Tests for the background job pool and the trip planner job API.
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+async def manager():
+    from api.jobs import JobManager
+
+    jm = JobManager(max_workers=2, max_queue=2, result_ttl=60)
+    await jm.start()
+    yield jm
+    await jm.stop()
+
+
+async def _wait_for(job, status="succeeded"):
+    for _ in range(200):
+        if job.status == status:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job stuck in {job.status}")
+
+
+class TestJobManager:
+    """Tests for JobManager."""
+
+    async def test_job_runs_and_keeps_result(self, manager):
+        async def run():
+            return {"plan": "Day 1"}
+
+        job = manager.submit("user-1", "trip_plan", run)
+        assert job.status == "queued"
+
+        await _wait_for(job)
+        assert manager.get(job.id).result == {"plan": "Day 1"}
+
+    async def test_concurrency_bounded_by_workers(self, manager):
+        """Never more than max_workers jobs run at once."""
+        running = 0
+        peak = 0
+        release = asyncio.Event()
+
+        async def run():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await release.wait()
+            running -= 1
+
+        jobs = [manager.submit("u", "trip_plan", run) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        jobs += [manager.submit("u", "trip_plan", run) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert peak == 2
+        assert manager.stats()["queue_depth"] == 2
+
+        release.set()
+        for job in jobs:
+            await _wait_for(job)
+        assert peak == 2
+
+    async def test_queue_full_rejected(self, manager):
+        from api.jobs import QueueFull
+
+        release = asyncio.Event()
+
+        async def run():
+            await release.wait()
+
+        for _ in range(2):
+            manager.submit("u", "trip_plan", run)
+        await asyncio.sleep(0.05)  # both picked up by workers
+        for _ in range(2):
+            manager.submit("u", "trip_plan", run)
+
+        with pytest.raises(QueueFull):
+            manager.submit("u", "trip_plan", run)
+        release.set()
+
+    async def test_failure_recorded_without_details(self, manager):
+        async def run():
+            raise RuntimeError("openai key leaked in message")
+
+        job = manager.submit("u", "trip_plan", run)
+        await _wait_for(job, "failed")
+        assert "openai" not in job.error
+
+    async def test_admission_rejection_is_retryable(self, manager):
+        from agents.admission import AdmissionRejected
+
+        async def run():
+            raise AdmissionRejected("gpt-4o", retry_after=7)
+
+        job = manager.submit("u", "trip_plan", run)
+        await _wait_for(job, "retryable")
+        assert job.to_dict()["retry_after"] == 7
+        assert job.error
+
+    async def test_results_expire_after_ttl(self, manager):
+        async def run():
+            return "done"
+
+        job = manager.submit("u", "trip_plan", run)
+        await _wait_for(job)
+        job.finished_at -= 61
+
+        assert manager.get(job.id) is None
+
+    async def test_submit_requires_running_pool(self):
+        from api.jobs import JobManager, JobQueueNotRunning
+
+        async def run():
+            return None
+
+        with pytest.raises(JobQueueNotRunning):
+            JobManager().submit("u", "trip_plan", run)
+
+
+class TestJobEndpoints:
+    """Tests for /api/jobs routes (lifespan starts the worker pool)."""
+
+    @pytest.fixture
+    def live_client(self):
+        with patch("agents.support_bot.load_knowledge"):
+            from main import app
+
+            with TestClient(app) as client:
+                yield client
+
+    def test_submit_and_poll(self, live_client):
+        import time
+
+        with patch("api.routes.plan_trip") as mock_plan, patch("api.routes._remember") as remember:
+            mock_plan.return_value = {"destination": "Bali", "plan": "Day 1"}
+            response = live_client.post(
+                "/api/jobs/trip-planner",
+                json={"destination": "Bali", "duration_days": 5},
+            )
+            assert response.status_code == 202
+            job_id = response.json()["data"]["job_id"]
+
+            for _ in range(100):
+                status = live_client.get(f"/api/jobs/{job_id}").json()["data"]
+                if status["status"] == "succeeded":
+                    break
+                time.sleep(0.01)
+
+        assert status["result"]["destination"] == "Bali"
+        remember.assert_called_once()
+        assert remember.call_args.args[1:] == ("TripPlanner", "Plan a 5-day trip to Bali (balanced)", "Day 1")
+
+    def test_unknown_job_404(self, live_client):
+        assert live_client.get("/api/jobs/does-not-exist").status_code == 404
+
+    def test_disallowed_callback_rejected(self, live_client):
+        response = live_client.post(
+            "/api/jobs/trip-planner",
+            json={
+                "destination": "Bali",
+                "duration_days": 5,
+                "callback_url": "http://169.254.169.254/latest",
+            },
+        )
+        assert response.status_code == 400
@@ -0,0 +1,96 @@
+"""
+Tests for the offline load-test harness and the fake LLM it runs against.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def fake_llm():
+    from benchmarks.fake_llm import FakeLLMConfig, install_fakes
+
+    with install_fakes(FakeLLMConfig(ttft_ms=1, token_ms=0, output_tokens=12)) as config:
+        yield config
+
+
+class TestFakeLLM:
+    """FakeChat behaves like a model behind a real agno Agent."""
+
+    async def test_run_reports_content_and_usage(self, fake_llm):
+        from agents.lazy import LazyAgent
+        from agents.runtime import run_agent
+        from agents.trip_planner import build_researcher
+
+        response = await run_agent(LazyAgent("test-fake-run", build_researcher), "Bali in July")
+
+        assert len(response.content.split()) == 12
+        assert response.metrics["output_tokens"] == [12]
+
+    async def test_json_mode_returns_matching_sample(self, fake_llm):
+        from agents.runtime import run_agent
+        from agents.trip_planner import TripItinerary, build_trip_formatter
+
+        response = await run_agent(build_trip_formatter(), "format this plan")
+
+        assert isinstance(response.content, TripItinerary)
+
+    async def test_json_response_after_stream_on_same_agent(self, fake_llm):
+        """Regression: a streamed run must not break later non-streamed runs of the shared agent."""
+        from agents.lazy import LazyAgent
+        from agents.runtime import run_agent, stream_agent
+        from agents.trip_planner import build_planner
+
+        planner = LazyAgent("test-fake-stream", build_planner)
+        chunks = [c async for c in stream_agent(planner, "Plan Lisbon")]
+        response = await run_agent(planner, "Plan Lisbon")
+
+        assert len(chunks) == 12
+        assert response.content == "".join(chunks)
+
+    async def test_invoke_methods_match_responses(self):
+        """The raw invoke methods are implemented too, so FakeChat is a complete Model."""
+        from agno.models.message import Message
+        from benchmarks.fake_llm import FakeChat, FakeLLMConfig
+
+        model = FakeChat(config=FakeLLMConfig(ttft_ms=0, token_ms=0, output_tokens=6))
+
+        def ask():
+            return [Message(role="user", content="Plan Lisbon")]
+
+        expected = model.response(ask()).content
+        assert model.invoke(ask()).content == expected
+        assert (await model.ainvoke(ask())).content == expected
+        assert "".join(r.content for r in model.invoke_stream(ask())) == expected
+        assert "".join([r.content async for r in model.ainvoke_stream(ask())]) == expected
+
+@pytest.mark.slow
+def test_loadtest_smoke(tmp_path):
+    """A short run of every route: no unexpected errors and no long event-loop stalls."""
+    report_path = tmp_path / "report.json"
+    env = {k: v for k, v in os.environ.items() if k not in {"ENV", "ALLOW_DEV_AUTH_BYPASS"}}
+    result = subprocess.run(
+        [
+            sys.executable, "-m", "benchmarks.loadtest",
+            "--duration", "3", "--concurrency", "8",
+            "--ttft-ms", "20", "--token-ms", "0", "--output-tokens", "20",
+            "--json", str(report_path), "--max-error-rate", "0",
+        ],
+        cwd=APP_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=180,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    report = json.loads(report_path.read_text())
+    assert report["requests"] > 0
+    assert set(report["routes"]) >= {"support", "recommend", "trip_plan", "batch", "health"}
+    assert report["loop_lag"]["p99_ms"] < 1000
@@ -0,0 +1,120 @@
+"""
+Tests for Prometheus metrics.
+"""
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestMetricsEndpoint:
+    """The /metrics exposition and HTTP instrumentation."""
+
+    def test_metrics_exposes_route_latency(self):
+        from main import app
+
+        client = TestClient(app)
+        labels = {"method": "GET", "route": "/api/health", "status": "200"}
+        before = sample("gobuddy_http_request_duration_seconds_count", **labels)
+
+        client.get("/api/health")
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "gobuddy_http_request_duration_seconds_bucket" in response.text
+        assert sample("gobuddy_http_request_duration_seconds_count", **labels) == before + 1
+
+    def test_unmatched_paths_share_one_label(self):
+        from main import app
+
+        client = TestClient(app)
+        labels = {"method": "GET", "route": "unmatched", "status": "404"}
+        before = sample("gobuddy_http_request_duration_seconds_count", **labels)
+
+        client.get("/no-such-path-1")
+        client.get("/no-such-path-2")
+
+        assert sample("gobuddy_http_request_duration_seconds_count", **labels) == before + 2
+
+    def test_metrics_token_required_when_configured(self):
+        from main import app
+
+        client = TestClient(app)
+        with patch("api.metrics.METRICS_TOKEN", "scrape-secret"):
+            assert client.get("/metrics").status_code == 401
+            response = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+            assert response.status_code == 200
+
+
+class TestAgentMetrics:
+    """Agent latency, token usage and quick-response counters."""
+
+    async def test_run_agent_records_latency_and_tokens(self):
+        from agents.runtime import run_agent
+
+        agent = SimpleNamespace(
+            name="Planner",
+            model=SimpleNamespace(id="gpt-4o-test"),
+            arun=AsyncMock(return_value=SimpleNamespace(
+                content="ok",
+                metrics={"input_tokens": [100, 20], "output_tokens": [50]},
+            )),
+        )
+        before = sample("gobuddy_agent_run_seconds_count", agent="Planner", model="gpt-4o-test", outcome="ok")
+
+        await run_agent(agent, "plan")
+
+        assert sample("gobuddy_agent_run_seconds_count", agent="Planner", model="gpt-4o-test", outcome="ok") == before + 1
+        assert sample("gobuddy_llm_tokens_total", model="gpt-4o-test", kind="input") >= 120
+        assert sample("gobuddy_llm_tokens_total", model="gpt-4o-test", kind="output") >= 50
+
+    async def test_failed_run_recorded_as_error(self):
+        from agents.runtime import run_agent
+
+        agent = SimpleNamespace(
+            name="Budgeter",
+            model=SimpleNamespace(id="gpt-4o-test"),
+            arun=AsyncMock(side_effect=RuntimeError("boom")),
+        )
+        before = sample("gobuddy_agent_run_seconds_count", agent="Budgeter", model="gpt-4o-test", outcome="error")
+
+        with pytest.raises(RuntimeError):
+            await run_agent(agent, "budget")
+
+        assert sample("gobuddy_agent_run_seconds_count", agent="Budgeter", model="gpt-4o-test", outcome="error") == before + 1
+
+    def test_quick_response_hit_counted(self):
+        from agents.support_bot import get_quick_response
+
+        before = sample("gobuddy_quick_response_hits_total", category="contact")
+        assert get_quick_response("How can I contact support?") is not None
+        assert sample("gobuddy_quick_response_hits_total", category="contact") == before + 1
+
+
+class TestRateLimitMetrics:
+    """429s are counted per limiter and window."""
+
+    async def test_rejection_counted(self, monkeypatch):
+        import api.rate_limit as rate_limit
+
+        monkeypatch.setattr(rate_limit, "RATE_LIMIT_DISABLED", False)
+        limiter = rate_limit.RateLimiter(
+            requests_per_minute=1,
+            requests_per_hour=100,
+            backend=rate_limit.InMemoryBackend(),
+            name="metrics-test",
+        )
+        before = sample("gobuddy_rate_limit_rejections_total", limiter="metrics-test", window="minute")
+
+        await limiter.check("user-1")
+        with pytest.raises(HTTPException):
+            await limiter.check("user-1")
+
+        assert sample("gobuddy_rate_limit_rejections_total", limiter="metrics-test", window="minute") == before + 1
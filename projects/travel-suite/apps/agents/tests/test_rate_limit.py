@@ -0,0 +1,193 @@
+"""
+Tests for the sliding-window-counter rate limiter.
+"""
+import pytest
+from unittest.mock import patch
+from fastapi import HTTPException
+
+
+@pytest.fixture
+def limiter_enabled(monkeypatch):
+    """Rate limiting is disabled under ENV=test; turn it back on."""
+    import api.rate_limit as rate_limit
+
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_DISABLED", False)
+    return rate_limit
+
+
+@pytest.fixture
+def clock():
+    """Controllable wall clock for the limiter, starting at a window boundary."""
+    now = [1_800_000_000.0]
+    with patch("api.rate_limit.time.time", side_effect=lambda: now[0]):
+        yield now
+
+
+class TestRateLimiter:
+    """Tests for RateLimiter.check and get_remaining."""
+
+    async def test_per_minute_limit(self, limiter_enabled, clock):
+        """The N+1th request within a minute is rejected with Retry-After."""
+        limiter = limiter_enabled.RateLimiter(requests_per_minute=3, requests_per_hour=100)
+        for _ in range(3):
+            await limiter.check("user:a")
+
+        with pytest.raises(HTTPException) as exc:
+            await limiter.check("user:a")
+
+        assert exc.value.status_code == 429
+        assert int(exc.value.headers["Retry-After"]) >= 1
+        await limiter.check("user:b")  # other keys are unaffected
+
+    async def test_per_hour_limit(self, limiter_enabled, clock):
+        """The hourly window is enforced independently of the minute window."""
+        limiter = limiter_enabled.RateLimiter(requests_per_minute=100, requests_per_hour=2)
+        await limiter.check("user:a")
+        await limiter.check("user:a")
+
+        with pytest.raises(HTTPException) as exc:
+            await limiter.check("user:a")
+        assert "Hourly" in exc.value.detail
+
+    async def test_previous_window_weighted_into_sliding_count(self, limiter_enabled, clock):
+        """Requests from the previous minute still count, decaying linearly."""
+        limiter = limiter_enabled.RateLimiter(requests_per_minute=4, requests_per_hour=100)
+        for _ in range(4):
+            await limiter.check("user:a")
+
+        clock[0] += 60 + 15  # 75% of the previous minute still overlaps: 3 of 4 used
+        await limiter.check("user:a")
+        with pytest.raises(HTTPException):
+            await limiter.check("user:a")
+
+        clock[0] += 45  # previous minute fully slid out
+        await limiter.check("user:a")
+
+    async def test_rejected_requests_not_counted(self, limiter_enabled, clock):
+        """A rejected request does not consume quota."""
+        limiter = limiter_enabled.RateLimiter(requests_per_minute=1, requests_per_hour=100)
+        await limiter.check("user:a")
+        for _ in range(5):
+            with pytest.raises(HTTPException):
+                await limiter.check("user:a")
+
+        assert (await limiter.get_remaining("user:a"))["hour"]["used"] == 1
+
+    async def test_get_remaining(self, limiter_enabled, clock):
+        """get_remaining reports used quota without mutating state."""
+        limiter = limiter_enabled.RateLimiter(requests_per_minute=5, requests_per_hour=50)
+        await limiter.check("user:a")
+        await limiter.check("user:a")
+
+        remaining = await limiter.get_remaining("user:a")
+        assert remaining["minute"] == {"used": 2, "limit": 5}
+        assert remaining["hour"] == {"used": 2, "limit": 50}
+        assert (await limiter.get_remaining("user:unknown"))["minute"]["used"] == 0
+
+    async def test_idle_keys_evicted(self, limiter_enabled, clock):
+        """Keys idle past two hour-windows are dropped on later checks."""
+        limiter = limiter_enabled.RateLimiter(requests_per_minute=5, requests_per_hour=50)
+        for i in range(1000):
+            await limiter.check(f"ip:{i}")
+        clock[0] += 1800
+        await limiter.check("ip:0")  # recently seen keys survive
+        assert len(limiter.backend) == 1000
+
+        clock[0] += 2 * 3600 - 1800 + 1
+        await limiter.check("ip:new")
+
+        assert len(limiter.backend) == 2  # ip:0 (seen 30 min later) and ip:new
+        clock[0] += 1800
+        await limiter.check("ip:new")
+        assert len(limiter.backend) == 1
+
+    async def test_disabled(self, clock):
+        """Under ENV=test the limiter is a no-op."""
+        from api.rate_limit import RateLimiter
+
+        limiter = RateLimiter(requests_per_minute=1, requests_per_hour=1)
+        for _ in range(5):
+            await limiter.check("user:a")
+
+
+class TestRedisBackend:
+    """Tests for the shared Redis backend (against fakeredis)."""
+
+    @pytest.fixture
+    def redis_server(self):
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        return fakeredis.FakeServer()
+
+    def _worker(self, rate_limit, server, **limits):
+        """A limiter as one uvicorn worker would build it: own client, shared server."""
+        import fakeredis
+
+        backend = rate_limit.RedisBackend(client=fakeredis.FakeAsyncRedis(server=server))
+        return rate_limit.RateLimiter(backend=backend, name="ai", **limits)
+
+    async def test_limit_holds_across_workers(self, limiter_enabled, clock, redis_server):
+        """N workers share one per-key budget instead of N budgets."""
+        workers = [
+            self._worker(limiter_enabled, redis_server, requests_per_minute=4, requests_per_hour=100)
+            for _ in range(3)
+        ]
+        for i in range(4):
+            await workers[i % 3].check("user:a")
+
+        for worker in workers:
+            with pytest.raises(HTTPException) as exc:
+                await worker.check("user:a")
+            assert exc.value.status_code == 429
+            assert int(exc.value.headers["Retry-After"]) >= 1
+
+        remaining = await workers[0].get_remaining("user:a")
+        assert remaining["minute"] == {"used": 4, "limit": 4}
+
+    async def test_matches_in_memory_sliding_window(self, limiter_enabled, clock, redis_server):
+        """Redis and in-memory backends make the same decisions over time."""
+        redis_limiter = self._worker(
+            limiter_enabled, redis_server, requests_per_minute=4, requests_per_hour=100
+        )
+        memory_limiter = limiter_enabled.RateLimiter(requests_per_minute=4, requests_per_hour=100)
+
+        async def allowed(limiter):
+            try:
+                await limiter.check("user:a")
+                return True
+            except HTTPException:
+                return False
+
+        for step in [0, 1, 1, 1, 1, 70, 0, 0, 30, 0, 0, 0]:
+            clock[0] += step
+            assert await allowed(redis_limiter) == await allowed(memory_limiter)
+
+    async def test_script_declares_every_key_in_one_slot(self, limiter_enabled, clock, redis_server):
+        """Counters are passed in KEYS and share one hash-tag slot, so Redis Cluster can route the script."""
+        from redis.crc import key_slot
+
+        limiter = self._worker(limiter_enabled, redis_server, requests_per_minute=4, requests_per_hour=100)
+        script = limiter.backend._script
+        calls = []
+
+        async def spy(keys, args):
+            calls.append(keys)
+            return await script(keys=keys, args=args)
+
+        limiter.backend._script = spy
+        await limiter.check("user:a")
+
+        (keys,) = calls
+        assert len(keys) == 4
+        assert len({key_slot(k.encode()) for k in keys}) == 1
+        assert all("{ai:user:a}" in k for k in keys)
+
+    async def test_backend_error_fails_open(self, limiter_enabled, clock):
+        """An unreachable backend lets traffic through by default."""
+        from unittest.mock import AsyncMock
+
+        backend = AsyncMock(spec=limiter_enabled.RateLimitBackend)
+        backend.hit.side_effect = ConnectionError("redis down")
+        limiter = limiter_enabled.RateLimiter(backend=backend)
+
+        await limiter.check("user:a")
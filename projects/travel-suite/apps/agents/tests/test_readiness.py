@@ -0,0 +1,186 @@
+"""
+Tests for background knowledge loading, liveness/readiness probes and the
+degraded support bot.
+"""
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client():
+    from main import app
+
+    return TestClient(app)
+
+
+class TestProbes:
+    """/livez always answers; /readyz tracks the knowledge index."""
+
+    def test_livez(self, client):
+        response = client.get("/livez")
+
+        assert response.status_code == 200
+        assert response.json() == {"status": "alive"}
+
+    def test_readyz_not_ready_while_loading(self, client, _knowledge_ready):
+        _knowledge_ready.state = "loading"
+
+        response = client.get("/readyz")
+
+        assert response.status_code == 503
+        body = response.json()
+        assert body["status"] == "not_ready"
+        assert body["knowledge"]["state"] == "loading"
+        assert body["agents"]["support_bot"] == "degraded"
+
+    def test_readyz_ready_with_index_details(self, client, _knowledge_ready):
+        _knowledge_ready.state = "ready"
+        _knowledge_ready.sources = 3
+        _knowledge_ready.documents = 42
+        _knowledge_ready.load_seconds = 1.5
+
+        response = client.get("/readyz")
+
+        assert response.status_code == 200
+        knowledge = response.json()["knowledge"]
+        assert knowledge["documents"] == 42
+        assert knowledge["sources"] == 3
+        assert knowledge["load_seconds"] == 1.5
+
+    def test_readyz_waits_for_warmup(self, client):
+        with patch("main.AGENT_WARMUP", "background"), patch("main.warmup_finished", return_value=False):
+            response = client.get("/readyz")
+
+        assert response.status_code == 503
+        assert response.json()["warmup"] == "running"
+
+    def test_health_reports_real_agent_states(self, client):
+        data = client.get("/api/health").json()
+
+        assert data["agents"]["trip_planner"] in {"ready", "not_built", "failed"}
+        assert "knowledge" in data
+
+    def test_startup_does_not_wait_for_knowledge(self):
+        """The lifespan finishes while the knowledge load is still running."""
+        import asyncio
+        from main import app
+
+        release = asyncio.Event()
+
+        async def slow_load():
+            await release.wait()
+
+        with patch("agents.support_bot.load_knowledge", slow_load):
+            with TestClient(app) as client:
+                assert client.get("/livez").status_code == 200
+
+
+class TestKnowledgeLoading:
+    """load_knowledge records state, counts and duration."""
+
+    async def test_records_ready_state(self, _knowledge_ready):
+        from agents.support_bot import load_knowledge
+
+        kb = MagicMock(spec=["aload", "vector_db"])
+        kb.aload = AsyncMock()
+        kb.vector_db.get_count.return_value = 17
+        with patch("agents.support_bot.get_knowledge", return_value=kb):
+            await load_knowledge()
+
+        assert _knowledge_ready.state == "ready"
+        assert _knowledge_ready.documents == 17
+        assert _knowledge_ready.load_seconds is not None
+
+    async def test_uses_sync_loader_when_no_aload(self, _knowledge_ready):
+        from agents.support_bot import load_knowledge
+
+        kb = SimpleNamespace(load=MagicMock(), vector_db=None, document_lists=iter([[1, 2], [3]]))
+        with patch("agents.support_bot.get_knowledge", return_value=kb):
+            await load_knowledge()
+
+        kb.load.assert_called_once_with(recreate=False)
+        assert _knowledge_ready.state == "ready"
+        assert _knowledge_ready.documents == 3
+
+    async def test_records_failure(self, _knowledge_ready):
+        from agents.support_bot import load_knowledge, knowledge_ready
+
+        kb = MagicMock(spec=["aload"])
+        kb.aload = AsyncMock(side_effect=RuntimeError("embedder down"))
+        with patch("agents.support_bot.get_knowledge", return_value=kb):
+            await load_knowledge()
+
+        assert _knowledge_ready.state == "failed"
+        assert "embedder down" in _knowledge_ready.error
+        assert not knowledge_ready()
+
+    async def test_empty_knowledge_is_ready(self, _knowledge_ready):
+        from agents.support_bot import load_knowledge, knowledge_ready
+
+        with patch("agents.support_bot.get_knowledge", return_value=None):
+            await load_knowledge()
+
+        assert _knowledge_ready.state == "empty"
+        assert knowledge_ready()
+
+
+class TestDegradedSupportBot:
+    """While the index is loading the bot answers without the LLM."""
+
+    async def test_quick_response_in_degraded_mode(self, _knowledge_ready):
+        from agents.support_bot import answer_question
+
+        _knowledge_ready.state = "loading"
+        with patch("agents.support_bot.support_agent") as agent:
+            agent.arun = AsyncMock()
+            result = await answer_question("How do I cancel my booking?")
+
+        agent.arun.assert_not_called()
+        assert result["degraded"] is True
+        assert result["quick_response"] is True
+        assert "cancel" in result["answer"].lower()
+
+    async def test_fallback_message_without_quick_response(self, _knowledge_ready):
+        from agents.support_bot import DEGRADED_RESPONSE, stream_answer
+
+        _knowledge_ready.state = "loading"
+        events = [e async for e in stream_answer("Which temples in Kyoto are best at dawn?")]
+
+        assert events == [{"event": "result", "data": {
+            "answer": DEGRADED_RESPONSE,
+            "sources_used": False,
+            "agent": "SupportBot",
+            "quick_response": False,
+            "degraded": True,
+        }}]
+
+    async def test_failed_load_answers_without_knowledge(self, _knowledge_ready):
+        """A failed index load falls back to the LLM without RAG, not canned replies."""
+        from agents.support_bot import answer_question
+
+        _knowledge_ready.state = "failed"
+        with patch("agents.support_bot.support_agent") as rag_agent, \
+             patch("agents.support_bot.plain_support_agent") as plain_agent:
+            rag_agent.arun = AsyncMock()
+            plain_agent.arun = AsyncMock(return_value=SimpleNamespace(content="Kyoto at dawn: Fushimi Inari."))
+            result = await answer_question("Which temples in Kyoto are best at dawn?")
+
+        rag_agent.arun.assert_not_called()
+        assert result == {"answer": "Kyoto at dawn: Fushimi Inari.", "sources_used": False, "agent": "SupportBot"}
+
+    async def test_not_loaded_still_answers(self, _knowledge_ready):
+        """Without a startup load (no lifespan) the bot answers as before."""
+        from agents.support_bot import stream_answer
+
+        async def chunks():
+            yield SimpleNamespace(content="Dawn")
+
+        _knowledge_ready.state = "not_loaded"
+        with patch("agents.support_bot.support_agent") as agent:
+            agent.arun = AsyncMock(return_value=chunks())
+            events = [e async for e in stream_answer("Which temples in Kyoto are best at dawn?")]
+
+        assert events[-1]["data"]["answer"] == "Dawn"
+        assert "degraded" not in events[-1]["data"]
@@ -0,0 +1,137 @@
+"""
+Tests for local validation and repair of model-written itineraries.
+"""
+import json
+import pytest
+
+from agents.repair import (
+    DayStreamParser,
+    ItineraryRepairError,
+    coerce_amount,
+    coerce_minutes,
+    parse_json_object,
+    repair_day,
+    repair_itinerary,
+)
+
+
+def _day(number, **overrides):
+    day = {
+        "day_number": number,
+        "theme": f"Theme {number}",
+        "activities": [{
+            "time": "09:00", "title": "Temple", "description": "Visit", "duration_minutes": 90,
+            "location": "Ubud", "cost_estimate": 10,
+        }],
+    }
+    day.update(overrides)
+    return day
+
+
+class TestParsing:
+    def test_parses_fenced_and_wrapped_json(self):
+        assert parse_json_object('```json\n{"a": 1}\n```') == {"a": 1}
+        assert parse_json_object('Here you go: {"a": 1} Enjoy!') == {"a": 1}
+
+    @pytest.mark.parametrize("reply", ["no json here", "[1, 2]", '{"a": '])
+    def test_rejects_non_objects(self, reply):
+        with pytest.raises(ItineraryRepairError):
+            parse_json_object(reply)
+
+    @pytest.mark.parametrize("value, expected", [
+        (25, 25.0), ("$25", 25.0), ("USD 1,200", 1200.0), ("10-20", 15.0), ("Free", 0.0), ("n/a", None),
+    ])
+    def test_coerce_amount(self, value, expected):
+        assert coerce_amount(value) == expected
+
+    @pytest.mark.parametrize("value, expected", [
+        (90, 90), ("90 min", 90), ("1.5 hours", 90), ("2h 30m", 150), ("45", 45), ("a while", None),
+    ])
+    def test_coerce_minutes(self, value, expected):
+        assert coerce_minutes(value) == expected
+
+
+class TestRepairItinerary:
+    def test_fills_defaults_and_coerces_values(self):
+        """Missing top-level fields and string numbers are fixed without the model."""
+        data = {"days": [_day(1, activities=[{"title": "Market", "cost_estimate": "$12", "duration_minutes": "2 hours"}])]}
+
+        repaired, fixes = repair_itinerary(data, "Bali", 1, budget=800)
+
+        assert repaired["destination"] == "Bali"
+        assert repaired["total_budget"] == 800
+        assert repaired["best_time_to_visit"] == ""
+        activity = repaired["days"][0]["activities"][0]
+        assert activity == {
+            "time": "", "title": "Market", "description": "", "location": "",
+            "duration_minutes": 120, "cost_estimate": 12.0,
+        }
+        assert {"cost_estimate", "duration_minutes", "total_budget", "destination"} <= set(fixes)
+
+    def test_renumbers_days_and_trims_extras(self):
+        """Gaps and out-of-order day numbers become 1..n; days past the trip are dropped."""
+        data = {"days": [_day(4), _day(1), _day(2), _day(9)], "total_budget": 500}
+
+        repaired, fixes = repair_itinerary(data, "Bali", 3)
+
+        assert [d["day_number"] for d in repaired["days"]] == [1, 2, 3]
+        assert [d["theme"] for d in repaired["days"]] == ["Theme 1", "Theme 2", "Theme 4"]
+        assert {"day_number", "extra days"} <= set(fixes)
+
+    def test_clean_itinerary_needs_no_fixes(self):
+        data = {
+            "destination": "Bali", "duration_days": 2, "total_budget": 500.0,
+            "best_time_to_visit": "May-October", "days": [_day(1), _day(2)],
+        }
+
+        repaired, fixes = repair_itinerary(json.loads(json.dumps(data)), "Bali", 2)
+
+        assert fixes == []
+        assert repaired["days"][1]["activities"][0]["cost_estimate"] == 10
+
+    @pytest.mark.parametrize("data", [{}, {"days": []}, {"days": [_day(1)]}])
+    def test_missing_days_are_hard_failures(self, data):
+        with pytest.raises(ItineraryRepairError):
+            repair_itinerary(data, "Bali", 2)
+
+
+class TestDayStreamParser:
+    def _feed_chars(self, text):
+        """Feed one character at a time; return (index of the char that completed it, day)."""
+        parser = DayStreamParser()
+        return [(index, day) for index, char in enumerate(text) for day in parser.feed(char)]
+
+    def test_each_day_emitted_when_its_object_closes(self):
+        reply = json.dumps({"destination": "Bali", "days": [_day(1), _day(2)], "local_tips": ["Tip"]})
+
+        found = self._feed_chars(reply)
+
+        assert [day for _, day in found] == [_day(1), _day(2)]
+        day_one_end = reply.index('}]}, {"day_number": 2') + 2
+        assert found[0][0] == day_one_end
+        assert found[1][0] < reply.index('"local_tips"')
+
+    def test_ignores_prose_fences_and_braces_in_strings(self):
+        tricky = _day(1, theme='Braces } { and "quotes"', notes="back\\slash")
+        reply = (
+            'Here is the plan:\n```json\n'
+            + json.dumps({"destination": 'The "days" [ {', "days": [tricky]})
+            + '\n```\nMore: {"days": [{"day_number": 9}]}'
+        )
+
+        assert [day for _, day in self._feed_chars(reply)] == [tricky]
+
+    def test_nested_days_keys_are_not_the_itinerary_days(self):
+        reply = json.dumps({"meta": {"days": [{"x": 1}]}, "days": [_day(1)]})
+
+        assert DayStreamParser().feed(reply) == [_day(1)]
+
+    def test_repair_day_numbers_and_coerces(self):
+        fixes = []
+
+        day = repair_day({"activities": [{"title": "Market", "cost_estimate": "$5"}]}, 3, fixes)
+
+        assert day["day_number"] == 3
+        assert day["theme"] == "Day 3"
+        assert day["activities"][0]["cost_estimate"] == 5.0
+        assert "theme" in fixes
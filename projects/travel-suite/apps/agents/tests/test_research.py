@@ -0,0 +1,260 @@
+"""
+Tests for the shared destination-research cache.
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+
+from agents.research import ResearchCache
+
+
+class FakeTablePool:
+    """Just enough of asyncpg.Pool for the research table."""
+
+    def __init__(self, fail: bool = False):
+        self.rows = {}
+        self.fail = fail
+
+    async def fetchrow(self, query, destination, month, newer_than):
+        if self.fail:
+            raise ConnectionError("db down")
+        row = self.rows.get((destination, month))
+        return row if row and row["created_at"] > newer_than else None
+
+    async def execute(self, query, *args):
+        if self.fail:
+            raise ConnectionError("db down")
+        if query.startswith("INSERT"):
+            destination, month, content, created_at = args
+            self.rows[(destination, month)] = {"content": content, "created_at": created_at}
+        else:
+            self.rows = {
+                key: row for key, row in self.rows.items()
+                if not (key[0] == args[0] and (len(args) == 1 or key[1] == args[1]))
+            }
+
+
+class TestResearchCache:
+    @pytest.mark.asyncio
+    async def test_hit_miss_and_ttl(self):
+        cache = ResearchCache(ttl_seconds=60)
+
+        assert await cache.get("bali", 7) is None
+        await cache.put("bali", 7, "Dry season")
+        entry = await cache.get("bali", 7)
+
+        assert entry.content == "Dry season"
+        assert entry.age_seconds() == 0
+        assert await cache.get("bali", 1) is None
+
+        entry.created_at -= timedelta(seconds=61)
+        assert await cache.get("bali", 7) is None
+        assert cache.stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_survives_restart_through_the_table(self):
+        pool = FakeTablePool()
+        first = ResearchCache()
+        await first.start(pool)
+        await first.put("lisbon", 0, "Trams and tascas")
+
+        restarted = ResearchCache()
+        await restarted.start(pool)
+        entry = await restarted.get("lisbon", 0)
+
+        assert entry.content == "Trams and tascas"
+        assert restarted.stats()["persistent"] is True
+
+    @pytest.mark.asyncio
+    async def test_invalidate_forces_refresh(self):
+        pool = FakeTablePool()
+        cache = ResearchCache()
+        await cache.start(pool)
+        await cache.put("tokyo", 3, "Cherry blossoms")
+        await cache.put("tokyo", 11, "Autumn leaves")
+
+        await cache.invalidate("tokyo", 3)
+        assert await cache.get("tokyo", 3) is None
+        assert (await cache.get("tokyo", 11)).content == "Autumn leaves"
+
+        await cache.invalidate("tokyo")
+        assert await cache.get("tokyo", 11) is None
+        assert pool.rows == {}
+
+    @pytest.mark.asyncio
+    async def test_database_errors_are_misses(self):
+        cache = ResearchCache()
+        await cache.start(FakeTablePool(fail=True))
+
+        await cache.put("rome", 0, "Forum")
+        cache.clear()
+
+        assert await cache.get("rome", 0) is None
+        assert cache.stats()["failed"] == 2
+
+
+def _agent(name: str, content: str):
+    agent = MagicMock()
+    agent.name = name
+    agent.arun = AsyncMock(return_value=MagicMock(content=content))
+    return agent
+
+
+def _trip_team(researcher):
+    from agents.trip_planner import TeamShim
+
+    return TeamShim(
+        name="T",
+        agents=[researcher, _agent("Planner", "Day 1"), _agent("Budgeter", "$500")],
+        instructions=[],
+        mode="dag",
+        depends_on={"Planner": ["Researcher", "Budgeter"]},
+    )
+
+
+class TestPlanTripResearch:
+    @pytest.mark.asyncio
+    async def test_research_shared_across_requests(self):
+        """A different trip to the same place and month skips the Researcher."""
+        from agents.trip_planner import plan_trip
+
+        researcher = _agent("Researcher", "Bali facts")
+        with patch("agents.trip_planner.trip_planner_team", _trip_team(researcher)):
+            first = await plan_trip(destination="Bali", duration_days=5, travel_month=7, interests=["food"])
+            second = await plan_trip(destination="bali", duration_days=3, travel_month=7, interests=["surf"])
+            other_month = await plan_trip(destination="Bali", duration_days=3, travel_month=1)
+
+        assert researcher.arun.call_count == 2
+        assert first["research"] == {"cached": False, "age_seconds": 0}
+        assert second["research"]["cached"] is True
+        assert "Researcher:\nBali facts" in second["plan"]
+        assert other_month["research"]["cached"] is False
+
+    @pytest.mark.asyncio
+    async def test_researcher_prompt_only_has_the_cache_key(self):
+        """Budget, interests and style reach the Planner but never the shared research."""
+        from agents.trip_planner import plan_trip
+
+        researcher = _agent("Researcher", "Bali facts")
+        team = _trip_team(researcher)
+        with patch("agents.trip_planner.trip_planner_team", team):
+            await plan_trip(
+                destination="Bali", duration_days=5, budget=900, interests=["surf"],
+                travel_style="luxury", travel_month=7,
+            )
+
+        researcher_prompt = researcher.arun.call_args.args[0]
+        assert "Bali" in researcher_prompt and "July" in researcher_prompt
+        for private in ("900", "surf", "luxury", "5-day"):
+            assert private not in researcher_prompt
+        planner_prompt = team.agents[1].arun.call_args.args[0]
+        assert "surf" in planner_prompt and "Bali facts" in planner_prompt
+
+    @pytest.mark.asyncio
+    async def test_refresh_research_reruns_researcher(self):
+        from agents.trip_planner import plan_trip
+
+        researcher = _agent("Researcher", "Bali facts")
+        with patch("agents.trip_planner.trip_planner_team", _trip_team(researcher)):
+            await plan_trip(destination="Bali", duration_days=5)
+            refreshed = await plan_trip(destination="Bali", duration_days=5, refresh_research=True)
+
+        assert researcher.arun.call_count == 2
+        assert refreshed["research"]["cached"] is False
+
+    @pytest.mark.asyncio
+    async def test_failed_research_not_cached(self):
+        from agents.research import research_cache
+        from agents.trip_planner import plan_trip
+
+        researcher = _agent("Researcher", "")
+        researcher.arun.side_effect = RuntimeError("search down")
+        with patch("agents.trip_planner.trip_planner_team", _trip_team(researcher)):
+            result = await plan_trip(destination="Oslo", duration_days=2)
+
+        assert result["research"] is None
+        assert await research_cache.get("oslo", 0) is None
+
+    @pytest.mark.asyncio
+    async def test_stream_reports_cached_researcher(self):
+        from agents.research import research_cache
+        from agents.trip_planner import stream_trip_plan
+
+        await research_cache.put("bali", 0, "Bali facts")
+        researcher = _agent("Researcher", "unused")
+        with patch("agents.trip_planner.trip_planner_team", _trip_team(researcher)):
+            events = [e async for e in stream_trip_plan(destination="Bali", duration_days=2)]
+
+        assert {"event": "agent_completed", "agent": "Researcher", "cached": True} in events
+        assert ("agent_started", "Researcher") not in [(e["event"], e.get("agent")) for e in events]
+        assert events[-1]["data"]["research"]["cached"] is True
+        researcher.arun.assert_not_called()
+
+
+class TestResearchEndpoints:
+    @pytest.fixture
+    def client(self):
+        from main import app
+
+        return TestClient(app)
+
+    def test_reports_age_and_invalidates(self, client):
+        import asyncio
+        from agents.research import research_cache
+
+        asyncio.run(research_cache.put("bali, indonesia", 7, "Dry season"))
+        research_cache._local[("bali, indonesia", 7)][1].created_at = datetime.now(timezone.utc) - timedelta(hours=2)
+
+        status = client.get("/api/research/Bali, Indonésia", params={"month": 7}).json()["data"]
+        assert status["destination"] == "bali, indonesia"
+        assert status["cached"] is True
+        assert 7200 <= status["age_seconds"] < 7260
+
+        assert client.delete("/api/research/Bali, Indonesia", params={"month": 7}).status_code == 200
+        assert client.get("/api/research/Bali, Indonesia", params={"month": 7}).json()["data"]["cached"] is False
+
+    def test_invalidation_drops_cached_plans(self, client):
+        from agents.trip_planner import normalize_trip_request, plan_cache
+
+        keys = {
+            "bali_july": normalize_trip_request("Bali, Indonesia", 3, None, [], "balanced", 7),
+            "bali_july_structured": ("structured", *normalize_trip_request("bali, indonesia", 5, None, [], "luxury", 7)),
+            "bali_august": normalize_trip_request("Bali, Indonesia", 3, None, [], "balanced", 8),
+            "lisbon_july": normalize_trip_request("Lisbon", 3, None, [], "balanced", 7),
+        }
+        for key in keys.values():
+            plan_cache.set(key, "plan")
+
+        response = client.delete("/api/research/Bali, Indonésia", params={"month": 7})
+
+        assert response.json()["data"]["plans_invalidated"] == 2
+        # Inspect the entries directly so the shared hit/miss counters stay untouched
+        assert set(plan_cache._entries) == {keys["bali_august"], keys["lisbon_july"]}
+
+    @pytest.mark.parametrize(
+        "user, status",
+        [
+            ({"id": "user-1", "role": "authenticated", "app_metadata": {}}, 403),
+            ({"id": "user-1", "role": "authenticated", "app_metadata": {"role": "admin"}}, 200),
+            ({"sub": "svc", "role": "service_role"}, 200),
+        ],
+        ids=["end-user", "admin", "service"],
+    )
+    def test_invalidation_needs_admin(self, client, user, status):
+        from main import app
+        from api.auth import verify_supabase_token
+
+        app.dependency_overrides[verify_supabase_token] = lambda: user
+        try:
+            assert client.delete("/api/research/Bali").status_code == status
+        finally:
+            app.dependency_overrides.pop(verify_supabase_token, None)
+
+    def test_refresh_not_accepted_from_clients(self, client):
+        """Plan requests cannot force a Researcher run past the shared cache."""
+        from api.routes import TripPlanRequest
+
+        request = TripPlanRequest(destination="Bali", duration_days=3, refresh_research=True)
+        assert "refresh_research" not in request.model_dump()
+
@@ -0,0 +1,150 @@
+"""
+Cold-start tests: importing the server must not build agents.
+"""
+import os
+import sys
+import json
+import subprocess
+import threading
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+# Generous enough for slow CI; the eager-construction import took roughly twice the lazy one
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "2.5"))
+
+# Pulled in only when an agent is actually built
+HEAVY_MODULES = ("agno", "openai", "duckduckgo_search")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+class TestImportBudget:
+    """`import main` stays cheap so autoscaling and reload loops start fast."""
+
+    @pytest.fixture(scope="class")
+    def probe(self):
+        env = {**os.environ, "ENV": "test", "AGENT_WARMUP": "off"}
+        result = subprocess.run(
+            [sys.executable, "-c", _PROBE],
+            cwd=APP_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=120,
+            check=True,
+        )
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def test_import_does_not_load_agent_dependencies(self, probe):
+        loaded = [m for m in probe["modules"] if m.split(".")[0] in HEAVY_MODULES]
+        assert loaded == []
+
+    def test_import_within_budget(self, probe):
+        assert probe["elapsed"] < IMPORT_BUDGET_SECONDS
+
+
+class TestLazyAgent:
+    """Deferred construction and forwarding."""
+
+    @pytest.fixture(autouse=True)
+    def _restore_registry(self):
+        """Keep test-only agents out of the registry that health checks report."""
+        from agents import lazy
+
+        saved = list(lazy._lazy_agents)
+        yield
+        lazy._lazy_agents[:] = saved
+
+    def test_builds_once_on_first_use(self):
+        from agents.lazy import LazyAgent
+
+        factory = MagicMock(return_value=MagicMock(name="agent"))
+        lazy = LazyAgent("test-once", factory)
+
+        assert not lazy.built
+        factory.assert_not_called()
+        lazy.arun
+        lazy.name
+        assert lazy.built
+        factory.assert_called_once()
+
+    def test_concurrent_first_use_builds_once(self):
+        from agents.lazy import LazyAgent
+
+        calls = []
+        gate = threading.Event()
+
+        def factory():
+            calls.append(1)
+            gate.wait(1)
+            return object()
+
+        lazy = LazyAgent("test-concurrent", factory)
+        threads = [threading.Thread(target=lazy.get) for _ in range(4)]
+        for t in threads:
+            t.start()
+        gate.set()
+        for t in threads:
+            t.join()
+
+        assert len(calls) == 1
+
+    async def test_warm_up_builds_registered_agents(self):
+        from agents.lazy import LazyAgent, agent_states, warm_up_agents
+
+        lazy = LazyAgent("test-warm", lambda: object())
+        assert agent_states()["test-warm"]["state"] == "not_built"
+
+        await warm_up_agents()
+
+        assert lazy.built
+        assert agent_states()["test-warm"]["state"] == "ready"
+
+    def test_lease_hands_out_exclusive_reusable_copies(self):
+        """Concurrent leases get separate copies that share memory; copies are reused."""
+        from agents.lazy import LazyAgent
+
+        class Copyable:
+            memory = object()
+            knowledge = None
+            stream = None
+
+            def deep_copy(self, *, update=None):
+                copy = Copyable()
+                for key, value in (update or {}).items():
+                    setattr(copy, key, value)
+                return copy
+
+        lazy = LazyAgent("test-lease", Copyable)
+        with lazy.lease() as first, lazy.lease() as second:
+            assert first is not second
+            assert first is not lazy.get()
+            assert first.memory is second.memory is lazy.get().memory
+            first.stream = True
+
+        with lazy.lease() as again:
+            assert again in (first, second)
+            assert again.stream is False
+
+    def test_lease_passes_through_objects_without_deep_copy(self):
+        from agents.lazy import LazyAgent
+
+        agent = MagicMock()
+        lazy = LazyAgent("test-lease-mock", lambda: agent)
+        with lazy.lease() as leased:
+            assert leased is agent
+
+    def test_agents_build_on_first_use(self):
+        from agents.trip_planner import trip_planner_team
+
+        assert [agent.name for agent in trip_planner_team.agents] == ["Researcher", "Planner", "Budgeter"]
@@ -0,0 +1,213 @@
+"""
+Tests for OpenTelemetry tracing spans.
+"""
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+
+def _agent(name: str, content: str = "ok", model: str = "gpt-4o-mini"):
+    return SimpleNamespace(
+        name=name,
+        model=SimpleNamespace(id=model),
+        arun=AsyncMock(return_value=SimpleNamespace(
+            content=content, metrics={"input_tokens": [10], "output_tokens": [5]}
+        )),
+    )
+
+
+def _by_name(spans, name):
+    return [s for s in spans.get_finished_spans() if s.name == name]
+
+
+class TestAgentSpans:
+    """Team and agent runs produce a nested per-stage breakdown."""
+
+    async def test_team_run_nests_agent_spans(self, spans):
+        from agents.tracing import request_id_var
+        from agents.trip_planner import TeamShim
+
+        team = TeamShim(
+            name="T",
+            agents=[_agent("Researcher"), _agent("Planner", model="gpt-4o")],
+            instructions=[],
+        )
+        token = request_id_var.set("req-123")
+        try:
+            await team.arun("plan")
+        finally:
+            request_id_var.reset(token)
+
+        (team_span,) = _by_name(spans, "team.run")
+        (researcher,) = _by_name(spans, "agent.run Researcher")
+        (planner,) = _by_name(spans, "agent.run Planner")
+
+        assert researcher.parent.span_id == team_span.context.span_id
+        assert planner.parent.span_id == team_span.context.span_id
+        assert planner.attributes["gen_ai.request.model"] == "gpt-4o"
+        assert planner.attributes["gen_ai.usage.input_tokens"] == 10
+        assert "admission.wait_ms" in planner.attributes
+        assert team_span.attributes["request.id"] == "req-123"
+        assert researcher.attributes["request.id"] == "req-123"
+
+    async def test_failed_agent_span_marked_error(self, spans):
+        from opentelemetry.trace import StatusCode
+        from agents.trip_planner import TeamShim
+
+        broken = MagicMock()
+        broken.name = "Budgeter"
+        broken.arun = AsyncMock(side_effect=RuntimeError("quota"))
+        team = TeamShim(name="T", agents=[broken], instructions=[])
+
+        response = await team.arun("plan")
+
+        assert response.failed_agents == ["Budgeter"]
+        (budgeter,) = _by_name(spans, "agent.run Budgeter")
+        assert budgeter.status.status_code == StatusCode.ERROR
+        (team_span,) = _by_name(spans, "team.run")
+        assert list(team_span.attributes["team.failed_agents"]) == ["Budgeter"]
+
+    async def test_structured_plan_includes_formatter_span(self, spans):
+        from agents.trip_planner import TeamShim, plan_trip_structured
+
+        team = TeamShim(name="T", agents=[_agent("Planner")], instructions=[])
+        formatter = _agent("TripFormatter", model="gpt-4o")
+        with patch("agents.trip_planner.STRUCTURED_PLAN_MODE", "formatter"), \
+             patch("agents.trip_planner.trip_planner_team", team), \
+             patch("agents.trip_planner.build_trip_formatter", return_value=formatter):
+            await plan_trip_structured(destination="Lisbon", duration_days=2)
+
+        names = [s.name for s in spans.get_finished_spans()]
+        assert "trip.plan" in names
+        assert "team.run" in names
+        assert "agent.run TripFormatter" in names
+
+    async def test_streamed_agent_run_traced(self, spans):
+        from agents.runtime import stream_agent
+
+        async def chunks():
+            yield SimpleNamespace(content="Day ")
+            yield SimpleNamespace(content="1")
+
+        agent = SimpleNamespace(
+            name="Planner", model=SimpleNamespace(id="gpt-4o"), arun=AsyncMock(return_value=chunks())
+        )
+
+        assert [d async for d in stream_agent(agent, "plan")] == ["Day ", "1"]
+        (run_span,) = _by_name(spans, "agent.run Planner")
+        assert run_span.attributes["gen_ai.stream"] is True
+
+
+class TestRequestSpans:
+    """Request id propagation and the root server span."""
+
+    def test_request_id_echoed_and_tagged(self, spans):
+        from main import app
+
+        client = TestClient(app)
+        response = client.get("/api/health", headers={"X-Request-ID": "abc-123"})
+
+        assert response.headers["x-request-id"] == "abc-123"
+        (server,) = _by_name(spans, "GET /api/health")
+        assert server.attributes["request.id"] == "abc-123"
+        assert server.attributes["http.response.status_code"] == 200
+
+    def test_invalid_request_id_replaced(self, spans):
+        from main import app
+
+        client = TestClient(app)
+        response = client.get("/api/health", headers={"X-Request-ID": "bad id\twith spaces"})
+
+        assert response.headers["x-request-id"] != "bad id\twith spaces"
+        assert len(response.headers["x-request-id"]) == 32
+
+    async def test_auth_span_records_cache_hit(self, spans):
+        from fastapi.security import HTTPAuthorizationCredentials
+        import api.auth as auth
+
+        user = {"id": "user-1", "role": "authenticated"}
+        with patch.object(auth, "SUPABASE_URL", "https://example.supabase.co"), \
+             patch.object(auth, "SUPABASE_ANON_KEY", "anon"), \
+             patch.object(auth.token_cache, "get", return_value=user):
+            result = await auth.verify_supabase_token(
+                HTTPAuthorizationCredentials(scheme="Bearer", credentials="tok")
+            )
+
+        assert result == user
+        (auth_span,) = _by_name(spans, "auth.verify")
+        assert auth_span.attributes["auth.cache"] == "hit"
+
+    async def test_rate_limit_span_records_rejection(self, spans, monkeypatch):
+        import api.rate_limit as rate_limit
+
+        monkeypatch.setattr(rate_limit, "RATE_LIMIT_DISABLED", False)
+        limiter = rate_limit.RateLimiter(
+            requests_per_minute=1, requests_per_hour=10, backend=rate_limit.InMemoryBackend(), name="trace-test"
+        )
+        await limiter.check("user-1")
+        with pytest.raises(HTTPException):
+            await limiter.check("user-1")
+
+        allowed = [s.attributes["rate_limit.allowed"] for s in _by_name(spans, "rate_limit.check")]
+        assert allowed == [True, False]
+
+
+class TestTracingDisabled:
+    """Without an exporter no spans are created, so the hot paths stay cheap."""
+
+    async def test_no_spans_without_exporter(self, spans, monkeypatch):
+        import agents.tracing as tracing
+        import api.rate_limit as rate_limit
+
+        monkeypatch.setattr(tracing, "_recording", False)
+        monkeypatch.setattr(rate_limit, "RATE_LIMIT_DISABLED", False)
+        limiter = rate_limit.RateLimiter(
+            requests_per_minute=5, requests_per_hour=10, backend=rate_limit.InMemoryBackend(), name="untraced"
+        )
+
+        with tracing.span("untraced.block") as s:
+            assert not s.is_recording()
+        await limiter.check("user-1")
+
+        assert spans.get_finished_spans() == ()
+
+    def test_request_id_still_echoed(self, spans, monkeypatch):
+        import agents.tracing as tracing
+        from main import app
+
+        monkeypatch.setattr(tracing, "_recording", False)
+        response = TestClient(app).get("/api/health", headers={"X-Request-ID": "abc-123"})
+
+        assert response.headers["x-request-id"] == "abc-123"
+        assert spans.get_finished_spans() == ()
+
+
+class TestJobTracing:
+    """Queued jobs keep the request id of the request that submitted them."""
+
+    async def test_job_runs_in_submitting_context(self):
+        import asyncio
+        from agents.tracing import request_id_var
+        from api.jobs import JobManager
+
+        manager = JobManager(max_workers=1, max_queue=5)
+        await manager.start()
+        try:
+            async def run():
+                return request_id_var.get()
+
+            token = request_id_var.set("req-job")
+            try:
+                job = manager.submit("user-1", "trip_plan", run)
+            finally:
+                request_id_var.reset(token)
+
+            for _ in range(100):
+                if job.status == "succeeded":
+                    break
+                await asyncio.sleep(0.01)
+            assert job.result == "req-job"
+        finally:
+            await manager.stop()
@@ -159,3 +159,728 @@ class TestTripPlannerTeam:
 
         instructions_text = " ".join(budgeter.instructions).lower()
         assert "cost" in instructions_text or "budget" in instructions_text
+
+
+def _streaming_agent(name: str, chunks: list[str]):
+    """Fake agent whose arun(stream=True) yields the given chunks."""
+    agent = MagicMock()
+    agent.name = name
+
+    async def _gen():
+        for chunk in chunks:
+            yield MagicMock(content=chunk)
+
+    agent.arun = AsyncMock(side_effect=lambda *a, **kw: _gen())
+    return agent
+
+
+class TestTeamShimStreaming:
+    """Tests for TeamShim.astream progress events."""
+
+    @pytest.mark.asyncio
+    async def test_astream_emits_progress_and_deltas(self):
+        """Each agent reports start, token deltas and completion in order."""
+        from agents.trip_planner import TeamShim
+
+        team = TeamShim(
+            name="T",
+            agents=[_streaming_agent("Researcher", ["Bali ", "facts"]), _streaming_agent("Planner", ["Day 1"])],
+            instructions=[],
+        )
+
+        events = [e async for e in team.astream("plan")]
+
+        assert [(e["event"], e.get("agent")) for e in events] == [
+            ("agent_started", "Researcher"),
+            ("delta", "Researcher"),
+            ("delta", "Researcher"),
+            ("agent_completed", "Researcher"),
+            ("agent_started", "Planner"),
+            ("delta", "Planner"),
+            ("agent_completed", "Planner"),
+            ("team_completed", None),
+        ]
+        assert events[-1]["content"] == "Researcher:\nBali facts\n\nPlanner:\nDay 1"
+
+    @pytest.mark.asyncio
+    async def test_astream_isolates_agent_failure(self):
+        """A failing agent is reported and the rest of the team still runs."""
+        from agents.trip_planner import TeamShim
+
+        broken = MagicMock()
+        broken.name = "Researcher"
+        broken.arun = AsyncMock(side_effect=RuntimeError("search down"))
+        team = TeamShim(name="T", agents=[broken, _streaming_agent("Planner", ["ok"])], instructions=[])
+
+        events = [e async for e in team.astream("plan")]
+
+        assert {"event": "agent_failed", "agent": "Researcher"} in events
+        assert "Planner:\nok" in events[-1]["content"]
+
+    @pytest.mark.asyncio
+    async def test_stream_trip_plan_ends_with_result(self, mock_trip_data):
+        """stream_trip_plan finishes with the same payload plan_trip returns."""
+        from agents.trip_planner import TeamShim
+
+        team = TeamShim(name="T", agents=[_streaming_agent("Planner", ["Day 1"])], instructions=[])
+        with patch("agents.trip_planner.trip_planner_team", team):
+            from agents.trip_planner import stream_trip_plan
+
+            events = [e async for e in stream_trip_plan(
+                destination=mock_trip_data["destination"],
+                duration_days=mock_trip_data["duration_days"],
+            )]
+
+        assert events[-1]["event"] == "result"
+        assert events[-1]["data"]["destination"] == "Bali, Indonesia"
+        assert events[-1]["data"]["plan"] == "Planner:\nDay 1"
+
+
+class TestPlanCache:
+    """Tests for normalized-request caching of team runs."""
+
+    def test_normalization_groups_equivalent_requests(self):
+        """Case, accents, interest order and nearby budgets share a key."""
+        from agents.trip_planner import normalize_trip_request
+
+        a = normalize_trip_request("  Bali,  Indonésia ", 5, 2000, ["Food", "temples"], "Balanced")
+        b = normalize_trip_request("bali, indonesia", 5, 2100, ["temples", "food "], "balanced")
+        c = normalize_trip_request("bali, indonesia", 5, 4000, ["temples", "food"], "balanced")
+        d = normalize_trip_request("bali, indonesia", 7, 2000, ["temples", "food"], "balanced")
+
+        assert a == b
+        assert a != c
+        assert a != d
+
+    @pytest.mark.asyncio
+    async def test_repeat_request_served_from_cache(self, mock_trip_data):
+        """A second equivalent request does not re-run the team."""
+        from types import SimpleNamespace
+        from agents.trip_planner import plan_trip, plan_cache
+
+        with patch("agents.trip_planner.trip_planner_team") as mock_team:
+            mock_team.arun = AsyncMock(
+                return_value=SimpleNamespace(content="Cached plan", failed_agents=[])
+            )
+            first = await plan_trip(destination="Bali", duration_days=5, interests=["food"])
+            second = await plan_trip(destination="BALI", duration_days=5, interests=["Food"])
+
+        assert mock_team.arun.call_count == 1
+        assert first["plan"] == second["plan"] == "Cached plan"
+        assert plan_cache.stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_single_flight(self):
+        """Concurrent identical requests wait on one team run."""
+        import asyncio
+        from types import SimpleNamespace
+        from agents.trip_planner import plan_trip, plan_cache
+
+        release = asyncio.Event()
+
+        async def slow_run(prompt, given=None, latency_budget=None, prompts=None):
+            await release.wait()
+            return SimpleNamespace(content="Shared plan", failed_agents=[])
+
+        with patch("agents.trip_planner.trip_planner_team") as mock_team:
+            mock_team.arun = AsyncMock(side_effect=slow_run)
+            tasks = [
+                asyncio.create_task(plan_trip(destination="Tokyo", duration_days=3))
+                for _ in range(5)
+            ]
+            await asyncio.sleep(0.01)
+            release.set()
+            results = await asyncio.gather(*tasks)
+
+        assert mock_team.arun.call_count == 1
+        assert all(r["plan"] == "Shared plan" for r in results)
+        assert plan_cache.stats()["coalesced"] == 4
+
+    @pytest.mark.asyncio
+    async def test_partial_failures_not_cached(self):
+        """Runs where an agent failed are retried next time."""
+        from types import SimpleNamespace
+        from agents.trip_planner import plan_trip
+
+        with patch("agents.trip_planner.trip_planner_team") as mock_team:
+            mock_team.arun = AsyncMock(
+                return_value=SimpleNamespace(content="Researcher error", failed_agents=["Researcher"])
+            )
+            await plan_trip(destination="Rome", duration_days=2)
+            await plan_trip(destination="Rome", duration_days=2)
+
+        assert mock_team.arun.call_count == 2
+
+
+def _timed_agent(name: str, delay: float, log: list):
+    """Fake agent that records (name, prompt, start, end) and answers after `delay`."""
+    import asyncio
+    import time
+
+    agent = MagicMock()
+    agent.name = name
+
+    async def _run(prompt, **kwargs):
+        started = time.monotonic()
+        await asyncio.sleep(delay)
+        log.append((name, prompt, started, time.monotonic()))
+        return MagicMock(content=f"{name} says hi")
+
+    agent.arun = AsyncMock(side_effect=_run)
+    return agent
+
+
+class TestTeamShimModes:
+    """Tests for parallel and dependency-aware (dag) team execution."""
+
+    @pytest.mark.asyncio
+    async def test_parallel_runs_agents_concurrently(self):
+        """Independent agents overlap, and the transcript keeps declaration order."""
+        from agents.trip_planner import TeamShim
+
+        log = []
+        team = TeamShim(
+            name="T",
+            agents=[_timed_agent("Researcher", 0.05, log), _timed_agent("Budgeter", 0.01, log)],
+            instructions=[],
+            mode="parallel",
+        )
+
+        response = await team.arun("plan")
+
+        starts = [started for _, _, started, _ in log]
+        ends = [ended for _, _, _, ended in log]
+        assert max(starts) < min(ends)
+        assert response.content == "Researcher:\nResearcher says hi\n\nBudgeter:\nBudgeter says hi"
+        assert response.failed_agents == []
+
+    @pytest.mark.asyncio
+    async def test_dag_passes_upstream_output_to_dependents(self):
+        """A dependent agent starts after its inputs and sees their output in its prompt."""
+        from agents.trip_planner import TeamShim
+
+        log = []
+        team = TeamShim(
+            name="T",
+            agents=[
+                _timed_agent("Researcher", 0.02, log),
+                _timed_agent("Planner", 0, log),
+                _timed_agent("Budgeter", 0.02, log),
+            ],
+            instructions=[],
+            mode="dag",
+            depends_on={"Planner": ["Researcher", "Budgeter"]},
+        )
+
+        response = await team.arun("plan")
+
+        runs = {name: (prompt, started, ended) for name, prompt, started, ended in log}
+        planner_prompt, planner_started, _ = runs["Planner"]
+        assert planner_started >= max(runs["Researcher"][2], runs["Budgeter"][2])
+        assert runs["Researcher"][0] == runs["Budgeter"][0] == "plan"
+        assert "Researcher output:\nResearcher says hi" in planner_prompt
+        assert "Budgeter output:\nBudgeter says hi" in planner_prompt
+        assert response.content.startswith("Researcher:")
+
+    @pytest.mark.asyncio
+    async def test_dag_isolates_upstream_failure(self):
+        """A failed input is reported, and its dependents still run without it."""
+        from agents.trip_planner import TeamShim
+
+        log = []
+        broken = MagicMock()
+        broken.name = "Researcher"
+        broken.arun = AsyncMock(side_effect=RuntimeError("search down"))
+        team = TeamShim(
+            name="T",
+            agents=[broken, _timed_agent("Planner", 0, log)],
+            instructions=[],
+            mode="dag",
+            depends_on={"Planner": ["Researcher"]},
+        )
+
+        response = await team.arun("plan")
+
+        assert response.failed_agents == ["Researcher"]
+        assert "Researcher error: search down" in response.content
+        assert "Researcher output unavailable" in log[0][1]
+
+    @pytest.mark.asyncio
+    async def test_admission_rejection_sheds_the_team(self):
+        """Overload in one concurrent agent cancels the rest of the run."""
+        from agents.admission import AdmissionRejected
+        from agents.trip_planner import TeamShim
+
+        log = []
+        busy = MagicMock()
+        busy.name = "Budgeter"
+        busy.arun = AsyncMock(side_effect=AdmissionRejected("gpt-4o-mini", 3))
+        team = TeamShim(
+            name="T",
+            agents=[_timed_agent("Researcher", 5, log), busy],
+            instructions=[],
+            mode="parallel",
+        )
+
+        with pytest.raises(AdmissionRejected):
+            await team.arun("plan")
+        assert log == []
+
+    @pytest.mark.asyncio
+    async def test_dag_astream_interleaves_and_orders_transcript(self):
+        """Streaming in dag mode starts the dependent only after its inputs complete."""
+        from agents.trip_planner import TeamShim
+
+        team = TeamShim(
+            name="T",
+            agents=[
+                _streaming_agent("Researcher", ["facts"]),
+                _streaming_agent("Planner", ["Day 1"]),
+                _streaming_agent("Budgeter", ["$100"]),
+            ],
+            instructions=[],
+            mode="dag",
+            depends_on={"Planner": ["Researcher", "Budgeter"]},
+        )
+
+        events = [e async for e in team.astream("plan")]
+
+        order = [(e["event"], e.get("agent")) for e in events]
+        planner_started = order.index(("agent_started", "Planner"))
+        assert order.index(("agent_completed", "Researcher")) < planner_started
+        assert order.index(("agent_completed", "Budgeter")) < planner_started
+        assert events[-1]["content"] == "Researcher:\nfacts\n\nPlanner:\nDay 1\n\nBudgeter:\n$100"
+        assert events[-1]["failed_agents"] == []
+
+    def test_rejects_cycles_and_unknown_modes(self):
+        """Misconfigured teams fail at construction instead of hanging a request."""
+        from agents.trip_planner import TeamShim
+
+        with pytest.raises(ValueError, match="cycle"):
+            TeamShim(name="T", agents=[], instructions=[], mode="dag", depends_on={"A": ["B"], "B": ["A"]})
+        with pytest.raises(ValueError, match="mode"):
+            TeamShim(name="T", agents=[], instructions=[], mode="swarm")
+
+    def test_trip_team_runs_planner_after_research_and_budget(self):
+        """The trip team needs two model round trips, not three."""
+        from agents.trip_planner import build_trip_planner_team
+
+        team = build_trip_planner_team()
+
+        assert team.mode == "dag"
+        assert team.depends_on == {"Planner": ["Researcher", "Budgeter"]}
+
+
+class TestTeamShimDeadlines:
+    """Tests for latency budgets, per-agent timeouts and partial team results."""
+
+    @pytest.mark.asyncio
+    async def test_slow_agent_skipped_and_dependent_still_runs(self):
+        """An agent that misses its deadline is cancelled; the rest of the plan still comes back."""
+        import time
+        from agents.trip_planner import TeamShim
+
+        log = []
+        team = TeamShim(
+            name="T",
+            agents=[
+                _timed_agent("Researcher", 5, log),
+                _timed_agent("Budgeter", 0, log),
+                _timed_agent("Planner", 0, log),
+            ],
+            instructions=[],
+            mode="dag",
+            depends_on={"Planner": ["Researcher", "Budgeter"]},
+        )
+
+        started = time.monotonic()
+        response = await team.arun("plan", latency_budget=0.2)
+
+        assert time.monotonic() - started < 1
+        assert response.skipped_agents == ["Researcher"]
+        assert response.failed_agents == []
+        assert "Researcher skipped: out of time" in response.content
+        assert "Planner says hi" in response.content
+        assert "Researcher output unavailable" in [prompt for name, prompt, *_ in log if name == "Planner"][0]
+
+    @pytest.mark.asyncio
+    async def test_budget_split_across_dependency_levels(self):
+        """A first stage cannot spend the dependent stage's share of the budget."""
+        from agents.trip_planner import TeamShim
+
+        log = []
+        team = TeamShim(
+            name="T",
+            agents=[_timed_agent("Researcher", 0.3, log), _timed_agent("Planner", 0, log)],
+            instructions=[],
+        )
+
+        response = await team.arun("plan", latency_budget=0.4)
+
+        # Sequential: Researcher gets the first half (0.2s) and is cut; Planner runs in the second
+        assert response.skipped_agents == ["Researcher"]
+        assert [name for name, *_ in log] == ["Planner"]
+
+    @pytest.mark.asyncio
+    async def test_agent_timeout_applies_without_budget(self):
+        """The per-agent cap bounds a hung agent even when the caller sets no budget."""
+        from agents.trip_planner import TeamShim
+
+        log = []
+        team = TeamShim(
+            name="T",
+            agents=[_timed_agent("Researcher", 5, log), _timed_agent("Budgeter", 0, log)],
+            instructions=[],
+            mode="parallel",
+            agent_timeout=0.05,
+        )
+
+        response = await team.arun("plan")
+
+        assert response.skipped_agents == ["Researcher"]
+        assert response.outputs["Budgeter"] == "Budgeter says hi"
+
+    @pytest.mark.asyncio
+    async def test_astream_reports_skipped_agent_with_partial_text(self):
+        """Streaming emits agent_skipped and keeps what the agent wrote before the deadline."""
+        import asyncio
+        from agents.trip_planner import TeamShim
+
+        slow = MagicMock()
+        slow.name = "Researcher"
+
+        async def _gen():
+            yield MagicMock(content="Early facts")
+            await asyncio.sleep(5)
+            yield MagicMock(content=" never sent")
+
+        slow.arun = AsyncMock(side_effect=lambda *a, **kw: _gen())
+        team = TeamShim(
+            name="T",
+            agents=[slow, _streaming_agent("Budgeter", ["$100"])],
+            instructions=[],
+            mode="parallel",
+        )
+
+        events = [e async for e in team.astream("plan", latency_budget=0.1)]
+
+        skipped = [e for e in events if e["event"] == "agent_skipped"]
+        assert [e["agent"] for e in skipped] == ["Researcher"]
+        assert events[-1]["skipped_agents"] == ["Researcher"]
+        assert "Early facts" in events[-1]["content"]
+        assert "never sent" not in events[-1]["content"]
+
+    @pytest.mark.asyncio
+    async def test_partial_plan_flagged_and_not_cached(self):
+        """plan_trip marks budget-cut plans partial and does not cache them."""
+        from types import SimpleNamespace
+        from agents.trip_planner import plan_trip, plan_cache
+
+        with patch("agents.trip_planner.trip_planner_team") as mock_team:
+            mock_team.arun = AsyncMock(return_value=SimpleNamespace(
+                content="Planner:\nDay 1", failed_agents=[], skipped_agents=["Researcher"], outputs={},
+            ))
+            result = await plan_trip(destination="Oslo", duration_days=2, latency_budget=3)
+
+        assert result["partial"] is True
+        assert result["skipped_stages"] == ["Researcher"]
+        assert 0 < mock_team.arun.call_args.kwargs["latency_budget"] <= 3
+        assert plan_cache.stats()["entries"] == 0
+
+    @pytest.mark.asyncio
+    async def test_out_of_time_researcher_not_shared(self):
+        """A Researcher cut by the budget leaves the shared research cache empty."""
+        from agents.research import research_cache
+        from agents.trip_planner import TeamShim, plan_trip
+
+        log = []
+        team = TeamShim(
+            name="T",
+            agents=[_timed_agent("Researcher", 5, log), _timed_agent("Planner", 0, log)],
+            instructions=[],
+        )
+        stored = research_cache.stats()["stored"]
+        with patch("agents.trip_planner.trip_planner_team", team):
+            result = await plan_trip(destination="Oslo", duration_days=2, latency_budget=0.2)
+
+        assert result["skipped_stages"] == ["Researcher"]
+        assert result["research"] is None
+        assert await research_cache.get("oslo", 0) is None
+        assert research_cache.stats()["stored"] == stored
+
+
+def _planner_replies(*replies):
+    """Fake structured planner whose successive runs return `replies`."""
+    agent = MagicMock()
+    agent.name = "Planner"
+    agent.arun = AsyncMock(side_effect=[MagicMock(content=reply) for reply in replies])
+    return agent
+
+
+def _itinerary_json(days: int, **overrides) -> str:
+    import json
+
+    data = {
+        "destination": "Lisbon",
+        "duration_days": days,
+        "total_budget": "$900",
+        "best_time_to_visit": "Spring",
+        "days": [
+            {"day_number": n, "theme": "Old town", "activities": [
+                {"time": "10:00", "title": "Tram 28", "description": "Ride", "duration_minutes": 60,
+                 "location": "Alfama", "cost_estimate": "3 EUR"},
+            ]}
+            for n in range(1, days + 1)
+        ],
+    }
+    data.update(overrides)
+    return json.dumps(data)
+
+
+class TestStructuredSinglePass:
+    """Tests for single-pass structured plans (no TripFormatter call)."""
+
+    @pytest.mark.asyncio
+    async def test_planner_json_repaired_without_formatter(self):
+        """Minor schema slips are fixed locally; no fourth model call is made."""
+        from agents.trip_planner import TeamShim, TripItinerary, plan_trip_structured
+
+        planner = _planner_replies(_itinerary_json(2))
+        team = TeamShim(name="T", agents=[_streaming_agent("Researcher", []), planner], instructions=[])
+        with patch("agents.trip_planner.structured_trip_team", team), \
+             patch("agents.trip_planner.build_trip_formatter") as formatter:
+            itinerary = await plan_trip_structured(destination="Lisbon", duration_days=2)
+
+        assert isinstance(itinerary, TripItinerary)
+        assert itinerary.total_budget == 900.0
+        assert itinerary.days[0].activities[0].cost_estimate == 3.0
+        formatter.assert_not_called()
+        assert planner.arun.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_plan_with_skipped_member_not_cached(self):
+        """A structured plan missing an out-of-time member is returned but not cached."""
+        from agents.trip_planner import TeamShim, plan_cache, plan_trip_structured
+
+        team = TeamShim(
+            name="T",
+            agents=[_timed_agent("Researcher", 5, []), _planner_replies(_itinerary_json(2))],
+            instructions=[],
+            mode="parallel",
+            agent_timeout=0.05,
+        )
+        with patch("agents.trip_planner.structured_trip_team", team):
+            itinerary = await plan_trip_structured(destination="Lisbon", duration_days=2)
+
+        assert len(itinerary.days) == 2
+        assert plan_cache.stats()["entries"] == 0
+
+    @pytest.mark.asyncio
+    async def test_hard_failure_reasks_planner(self):
+        """Too few days cannot be repaired locally, so the Planner is asked once more."""
+        from agents.trip_planner import TeamShim, plan_trip_structured
+
+        planner = _planner_replies(_itinerary_json(1), _itinerary_json(3))
+        team = TeamShim(name="T", agents=[planner], instructions=[])
+        with patch("agents.trip_planner.structured_trip_team", team), \
+             patch("agents.trip_planner.structured_planner", planner):
+            itinerary = await plan_trip_structured(destination="Lisbon", duration_days=3)
+
+        assert len(itinerary.days) == 3
+        assert planner.arun.call_count == 2
+        assert "expected 3 days, got 1" in planner.arun.call_args[0][0]
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_reasks(self):
+        """Repeated hard failures raise instead of returning a broken itinerary."""
+        from agents.repair import ItineraryRepairError
+        from agents.trip_planner import TeamShim, plan_trip_structured
+
+        planner = _planner_replies("not json", "still not json")
+        team = TeamShim(name="T", agents=[planner], instructions=[])
+        with patch("agents.trip_planner.structured_trip_team", team), \
+             patch("agents.trip_planner.structured_planner", planner), \
+             pytest.raises(ItineraryRepairError):
+            await plan_trip_structured(destination="Lisbon", duration_days=2)
+
+    def test_structured_planner_prompt_braces_are_literal(self):
+        """The JSON schema in the instructions must not be treated as a format template."""
+        from agents.trip_planner import build_structured_planner
+
+        agent = build_structured_planner()
+
+        assert agent.format_state_in_messages is False
+        assert agent.model.response_format == {"type": "json_object"}
+        assert "best_time_to_visit" in " ".join(agent.instructions)
+
+
+def _outline_json(days: int) -> str:
+    import json
+
+    return json.dumps({
+        "total_budget": 3000,
+        "best_time_to_visit": "Spring",
+        "days": [{"day_number": n, "theme": f"Theme {n}", "area": "Alfama"} for n in range(1, days + 1)],
+        "packing_tips": ["Comfortable shoes"],
+    })
+
+
+async def _single_chunk(reply):
+    yield reply
+
+
+def _chunk_planner(delay: float = 0):
+    """Fake structured planner that answers each chunk prompt with the number of days it asks for."""
+    import asyncio
+    import re
+
+    agent = MagicMock()
+    agent.name = "Planner"
+
+    async def _run(prompt, stream=False, **kwargs):
+        await asyncio.sleep(delay)
+        count = int(re.search(r"TripItinerary of (\d+) days", prompt).group(1))
+        reply = MagicMock(content=_itinerary_json(count, local_tips=["Buy a Viva card"]))
+        return _single_chunk(reply) if stream else reply
+
+    agent.arun = AsyncMock(side_effect=_run)
+    return agent
+
+
+class TestChunkedStructuredPlans:
+    """Tests for long structured plans written in concurrent day ranges."""
+
+    def test_day_ranges_are_even_and_contiguous(self):
+        from agents.trip_planner import day_ranges
+
+        assert day_ranges(5, 5) == [(1, 5)]
+        assert day_ranges(7, 5) == [(1, 4), (5, 7)]
+        assert day_ranges(14, 5) == [(1, 5), (6, 10), (11, 14)]
+        assert day_ranges(30, 5) == [(n, n + 4) for n in range(1, 31, 5)]
+
+    @pytest.mark.asyncio
+    async def test_long_trip_written_in_concurrent_chunks(self):
+        """A 14-day plan takes about as long as one chunk and is numbered 1..14."""
+        import time
+        from agents.trip_planner import TeamShim, plan_trip_structured
+
+        outline = _planner_replies(_outline_json(14))
+        chunks = _chunk_planner(delay=0.1)
+        team = TeamShim(name="T", agents=[_streaming_agent("Researcher", []), outline], instructions=[])
+        with patch("agents.trip_planner.outline_trip_team", team), \
+             patch("agents.trip_planner.structured_planner", chunks), \
+             patch("agents.trip_planner.STRUCTURED_PLAN_CHUNK_DAYS", 5):
+            started = time.monotonic()
+            itinerary = await plan_trip_structured(destination="Lisbon", duration_days=14)
+            elapsed = time.monotonic() - started
+
+        assert elapsed < 0.25
+        assert chunks.arun.call_count == 3
+        assert [day.day_number for day in itinerary.days] == list(range(1, 15))
+        assert itinerary.duration_days == 14
+        assert itinerary.total_budget == 3000
+        assert itinerary.packing_tips == ["Comfortable shoes"]
+        assert itinerary.local_tips == ["Buy a Viva card"]
+        prompts = [call.args[0] for call in chunks.arun.call_args_list]
+        assert any("Write only days 11 to 14" in prompt for prompt in prompts)
+        assert all("Day 9: Theme 9 (Alfama)" in prompt for prompt in prompts)
+
+    @pytest.mark.asyncio
+    async def test_short_trip_stays_single_pass(self):
+        from agents.trip_planner import TeamShim, plan_trip_structured
+
+        planner = _planner_replies(_itinerary_json(3))
+        team = TeamShim(name="T", agents=[planner], instructions=[])
+        with patch("agents.trip_planner.structured_trip_team", team), \
+             patch("agents.trip_planner.outline_trip_team") as outline_team, \
+             patch("agents.trip_planner.STRUCTURED_PLAN_CHUNK_DAYS", 5):
+            itinerary = await plan_trip_structured(destination="Lisbon", duration_days=3)
+
+        assert len(itinerary.days) == 3
+        outline_team.arun.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_bad_outline_still_plans_and_short_chunk_is_reasked(self):
+        """Chunks are written without an unusable outline; a chunk that is too short is re-asked on its own."""
+        from agents.trip_planner import TeamShim, plan_trip_structured
+
+        chunks = _chunk_planner()
+        short_once = [MagicMock(content=_itinerary_json(1))]
+        default_run = chunks.arun.side_effect
+
+        async def _run(prompt, **kwargs):
+            if "Write only days 1 to" in prompt and short_once:
+                return short_once.pop()
+            return await default_run(prompt, **kwargs)
+
+        chunks.arun.side_effect = _run
+        team = TeamShim(name="T", agents=[_planner_replies("no outline today")], instructions=[])
+        with patch("agents.trip_planner.outline_trip_team", team), \
+             patch("agents.trip_planner.structured_planner", chunks), \
+             patch("agents.trip_planner.STRUCTURED_PLAN_CHUNK_DAYS", 4):
+            itinerary = await plan_trip_structured(destination="Lisbon", duration_days=8)
+
+        assert [day.day_number for day in itinerary.days] == list(range(1, 9))
+        assert chunks.arun.call_count == 3
+        # No outline and no budget: the total is the sum of the activity costs
+        assert itinerary.total_budget == 8 * 3.0
+
+
+class TestStructuredStreaming:
+    """Tests for streaming validated days of a structured plan."""
+
+    @pytest.mark.asyncio
+    async def test_days_streamed_before_planner_finishes(self):
+        """Each day is sent once its JSON closes, ahead of the final itinerary."""
+        from agents.trip_planner import TeamShim, stream_trip_plan_structured
+
+        reply = _itinerary_json(3)
+        pieces = [reply[i:i + 40] for i in range(0, len(reply), 40)]
+        planner = _streaming_agent("Planner", pieces)
+        team = TeamShim(name="T", agents=[_streaming_agent("Researcher", ["facts"]), planner], instructions=[])
+        with patch("agents.trip_planner.structured_trip_team", team):
+            events = [e async for e in stream_trip_plan_structured(destination="Lisbon", duration_days=3)]
+
+        names = [(e["event"], e.get("agent")) for e in events]
+        days = [e["data"] for e in events if e["event"] == "day"]
+        assert [day["day_number"] for day in days] == [1, 2, 3]
+        assert days[0]["activities"][0]["cost_estimate"] == 3.0
+        assert names.index(("day", None)) < names.index(("agent_completed", "Planner"))
+        assert ("delta", "Researcher") not in names
+        assert events[-1]["event"] == "result"
+        assert events[-1]["data"]["days"] == days
+
+    @pytest.mark.asyncio
+    async def test_cached_plan_streams_days_at_once(self):
+        from agents.trip_planner import TeamShim, plan_cache, stream_trip_plan_structured
+
+        planner = _streaming_agent("Planner", [_itinerary_json(2)])
+        team = TeamShim(name="T", agents=[planner], instructions=[])
+        with patch("agents.trip_planner.structured_trip_team", team):
+            first = [e async for e in stream_trip_plan_structured(destination="Lisbon", duration_days=2)]
+            before = plan_cache.stats()
+            second = [e async for e in stream_trip_plan_structured(destination="lisbon", duration_days=2)]
+            after = plan_cache.stats()
+
+        assert planner.arun.call_count == 1
+        # The cached stream is served from a single lookup, counted as one hit
+        assert after["hits"] - before["hits"] == 1
+        assert after["misses"] == before["misses"]
+        assert [e["event"] for e in second] == ["day", "day", "result"]
+        assert second[-1] == first[-1]
+
+    @pytest.mark.asyncio
+    async def test_chunked_trip_streams_days_with_trip_numbers(self):
+        """Day ranges written concurrently report days numbered within the whole trip."""
+        from agents.trip_planner import TeamShim, stream_trip_plan_structured
+
+        team = TeamShim(name="T", agents=[_streaming_agent("Planner", [_outline_json(8)])], instructions=[])
+        with patch("agents.trip_planner.outline_trip_team", team), \
+             patch("agents.trip_planner.structured_planner", _chunk_planner()), \
+             patch("agents.trip_planner.STRUCTURED_PLAN_CHUNK_DAYS", 4):
+            events = [e async for e in stream_trip_plan_structured(destination="Lisbon", duration_days=8)]
+
+        streamed = sorted(e["data"]["day_number"] for e in events if e["event"] == "day")
+        assert streamed == list(range(1, 9))
+        assert events[-1]["event"] == "result"
+        assert [day["day_number"] for day in events[-1]["data"]["days"]] == list(range(1, 9))
@@ -0,0 +1,15 @@
+-- Keyset pagination index for agent conversation history.
+-- GET /api/conversations/{user_id} pages newest-first on (created_at, id);
+-- this index serves each page as a bounded range scan regardless of depth.
+-- It also covers user_id lookups, so the single-column index is dropped.
+
+DO $$
+BEGIN
+  IF to_regclass('public.agent_conversations') IS NOT NULL THEN
+    CREATE INDEX IF NOT EXISTS idx_agent_conversations_user_created
+      ON public.agent_conversations(user_id, created_at DESC, id DESC);
+    DROP INDEX IF EXISTS public.idx_agent_conversations_user;
+    COMMENT ON INDEX public.idx_agent_conversations_user_created IS
+      'Supports keyset-paginated conversation history per user';
+  END IF;
+END $$;
@@ -0,0 +1,18 @@
+-- Shared destination research for the trip planner agents.
+-- One row per (canonical destination, travel month); month 0 means unspecified.
+-- The agents service reads rows younger than its TTL and upserts fresh research,
+-- so repeat destinations skip the Researcher stage across users and restarts.
+
+CREATE TABLE IF NOT EXISTS public.agent_research_cache (
+    destination TEXT NOT NULL,
+    travel_month SMALLINT NOT NULL DEFAULT 0 CHECK (travel_month BETWEEN 0 AND 12),
+    content TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (destination, travel_month)
+);
+
+-- Service access only: no policies
+ALTER TABLE public.agent_research_cache ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE public.agent_research_cache IS
+  'Researcher agent output shared across trip plans, keyed by canonical destination and travel month';
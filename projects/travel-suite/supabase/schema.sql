@@ -786,7 +786,7 @@ CREATE TABLE IF NOT EXISTS public.agent_conversations (
 ALTER TABLE public.agent_conversations ENABLE ROW LEVEL SECURITY;
 
 -- Index for fast lookups
-CREATE INDEX IF NOT EXISTS idx_agent_conversations_user ON public.agent_conversations(user_id);
+CREATE INDEX IF NOT EXISTS idx_agent_conversations_user_created ON public.agent_conversations(user_id, created_at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_agent_conversations_session ON public.agent_conversations(session_id);
 CREATE INDEX IF NOT EXISTS idx_agent_conversations_agent ON public.agent_conversations(agent_name);
 
@@ -809,6 +809,18 @@ CREATE POLICY "Admins can view all conversations"
         )
     );
 
+-- Destination research shared across trip plans (written by the agents service)
+CREATE TABLE IF NOT EXISTS public.agent_research_cache (
+    destination TEXT NOT NULL,
+    travel_month SMALLINT NOT NULL DEFAULT 0 CHECK (travel_month BETWEEN 0 AND 12),
+    content TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (destination, travel_month)
+);
+
+-- Service access only: no policies
+ALTER TABLE public.agent_research_cache ENABLE ROW LEVEL SECURITY;
+
 -- Scheduled notification queue (for background workers)
 CREATE TABLE IF NOT EXISTS public.notification_queue (
     id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,